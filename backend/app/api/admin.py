@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Query
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Query, Header, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, desc, and_
 from typing import List, Optional
@@ -11,8 +11,10 @@ from app.api.deps import get_current_admin
 from app.schemas.store import SellerWithStoreResponse, StoreResponse
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
 from app.core.config import settings
-from app.models.order import Order, OrderItem # Import Order Model
+from app.models.order import Order, OrderItem, OrderStatus # Import Order Model
 from sqlalchemy.orm import joinedload
+from app.services import catalog_cache, suggest_index, idempotency, order_status
+from app.core import cache
 
 # Cấu hình Email
 mail_conf = ConnectionConfig(
@@ -184,6 +186,9 @@ def approve_seller(
     user.is_active = True
     store.is_active = True 
     db.commit()
+    # Sản phẩm của store vừa được duyệt bắt đầu hiện trên sàn
+    catalog_cache.invalidate_store(store.id)
+    suggest_index.upsert_store(db, store)
 
     send_email_notification(
         background_tasks, user.email, 
@@ -208,11 +213,15 @@ def reject_seller(
     email = user.email
     name = user.full_name
 
+    store_id = store.id if store else None
     if store:
         db.delete(store)
     
     user.is_approved = False
     db.commit()
+    catalog_cache.invalidate_store(store_id)
+    if store_id is not None:
+        suggest_index.remove_store(store_id)
 
     send_email_notification(
         background_tasks, email, 
@@ -222,6 +231,15 @@ def reject_seller(
     return {"message": "Đã từ chối và xóa hồ sơ"}
 
 
+# =================================================================
+# 4. THEO DÕI CACHE
+# =================================================================
+@router.get("/cache/stats")
+def get_cache_stats(current_admin: User = Depends(get_current_admin)):
+    """Số lần hit / miss / invalidate của cache catalog (tính theo process hiện tại)."""
+    return cache.stats()
+
+
 # HELPER GỬI MAIL
 def send_email_notification(bg_tasks, email, subject, body):
     if not settings.MAIL_USERNAME:
@@ -309,15 +327,24 @@ def get_admin_orders(
 @router.put("/orders/{order_id}/confirm-payment")
 def confirm_qr_payment(
     order_id: int,
+    response: Response,
     current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER),
 ):
     """
     Dành cho đơn hàng QR Banking đang PENDING.
     Admin bấm xác nhận -> Status chuyển thành CONFIRMED.
     Lúc này Seller sẽ thấy đơn hàng ở trạng thái "Chờ xác nhận" để chuẩn bị hàng.
     """
-    order = db.query(Order).filter(Order.id == order_id).first()
+    # 🔁 Admin bấm lại / mạng chập chờn gửi lại -> trả kết quả lần đầu
+    idem = idempotency.begin(db, "confirm_qr_payment", current_admin.id, idempotency_key, {"order_id": order_id})
+    if idem.replay is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+        return idem.replay
+
+    # Khóa dòng đơn: 2 lần xác nhận đồng thời không cùng vượt qua kiểm tra PENDING
+    order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
     
     if not order:
         raise HTTPException(status_code=404, detail="Không tìm thấy đơn hàng")
@@ -330,11 +357,14 @@ def confirm_qr_payment(
         raise HTTPException(status_code=400, detail="Đơn hàng này không ở trạng thái chờ thanh toán")
 
     # Cập nhật trạng thái
-    order.status = "CONFIRMED"
-    db.commit()
-    
-    return {
+    # Hàng đang giữ cho đơn QR được trừ hẳn vào tồn kho + cập nhật bộ đếm của store
+    order_status.change_status(db, order, OrderStatus.CONFIRMED.value)
+    result = {
         "message": "Đã xác nhận thanh toán thành công",
         "order_id": order.id,
         "new_status": "CONFIRMED"
-    }
\ No newline at end of file
+    }
+    idempotency.complete(db, idem, result)
+    db.commit()
+    
+    return result
\ No newline at end of file
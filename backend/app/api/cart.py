@@ -1,13 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager
 from decimal import Decimal
 
 from app.core.database import get_db
 from app.models.users import User
 from app.models.cart import Cart, CartItem
 from app.models.product import Product  # ✅ chỉ dùng Product
-from app.schemas.cart import CartItemAdd, CartItemUpdate, CartResponse, CartItemResponse
+from app.schemas.cart import (
+    CartItemAdd, CartItemUpdate, CartResponse, CartItemResponse, CartSummaryResponse, CartBatchUpdate,
+)
 from app.api.deps import get_current_user
+from app.services import cart_summary
 
 router = APIRouter()
 
@@ -28,8 +31,11 @@ def _product_price(product: Product) -> Decimal:
     return Decimal(str(val))
 
 def _product_stock(product: Product):
-    # None => coi như không giới hạn tồn
-    return getattr(product, "stock", None)
+    # None => coi như không giới hạn tồn; có tồn thì trừ phần đang giữ cho đơn QR chờ thanh toán
+    stock = getattr(product, "stock", None)
+    if stock is None:
+        return None
+    return stock - (getattr(product, "reserved_stock", 0) or 0)
 
 @router.get("/", response_model=CartResponse)
 def get_cart(
@@ -38,13 +44,21 @@ def get_cart(
 ):
     cart = get_or_create_cart(db, current_user.id)
 
+    # 1 câu JOIN: dòng giỏ + sản phẩm + store (thay vì 1 query sản phẩm cho mỗi dòng)
+    cart_items = (
+        db.query(CartItem)
+        .join(CartItem.product)
+        .filter(CartItem.cart_id == cart.id)
+        .options(contains_eager(CartItem.product).joinedload(Product.store))
+        .order_by(CartItem.id)
+        .all()
+    )
+
     items = []
     subtotal = Decimal("0")
 
-    for item in cart.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if not product:
-            continue
+    for item in cart_items:
+        product = item.product
 
         line_total = Decimal(str(item.price_at_add)) * item.quantity
         subtotal += line_total
@@ -60,12 +74,23 @@ def get_cart(
             quantity=item.quantity,
             line_total=line_total,
             in_stock=in_stock,
+            image_url=product.display_image_url or product.image_url,
+            store_id=product.store_id,
+            store_name=product.store.store_name if product.store else None,
             variant_id=None,
             variant_name=None,
         ))
 
     return CartResponse(cart_id=cart.id, items=items, subtotal=subtotal)
 
+# GET /api/cart/summary : badge giỏ hàng trên header (cache theo user)
+@router.get("/summary", response_model=CartSummaryResponse)
+def get_cart_summary(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return cart_summary.get_summary(db, current_user.id)
+
 @router.post("/items")
 def add_to_cart(
     item_in: CartItemAdd,
@@ -116,6 +141,7 @@ def add_to_cart(
         existing_item.price_at_add = price_now
         db.commit()
         db.refresh(existing_item)
+        cart_summary.invalidate(current_user.id)
         return {"message": "Updated", "cart_item_id": existing_item.id}
 
     new_item = CartItem(
@@ -128,6 +154,7 @@ def add_to_cart(
     db.add(new_item)
     db.commit()
     db.refresh(new_item)
+    cart_summary.invalidate(current_user.id)
     return {"message": "Added", "cart_item_id": new_item.id}
 
 @router.put("/items/{cart_item_id}")
@@ -156,6 +183,7 @@ def update_cart_item(
     cart_item.quantity = item_in.quantity
     cart_item.price_at_add = _product_price(product)
     db.commit()
+    cart_summary.invalidate(current_user.id)
     return {"message": "Updated"}
 
 @router.delete("/items/{cart_item_id}")
@@ -174,4 +202,91 @@ def delete_cart_item(
 
     db.delete(cart_item)
     db.commit()
+    cart_summary.invalidate(current_user.id)
     return {"message": "Deleted"}
+
+# PATCH /api/cart/items : áp nhiều thao tác add / update / remove trong 1 transaction
+@router.patch("/items", response_model=CartResponse)
+def batch_update_cart(
+    batch: CartBatchUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Dùng cho "chuyển cả wishlist vào giỏ", nút +/- số lượng gửi gộp...
+    Chỉ 1 câu đọc các dòng giỏ, 1 câu đọc toàn bộ sản phẩm liên quan và 1 lần commit.
+    Thao tác nào lỗi thì cả lô không được lưu. Trả về giỏ hàng sau khi cập nhật.
+    """
+    cart = get_or_create_cart(db, current_user.id)
+
+    # 1. Các dòng hiện có của giỏ
+    existing = db.query(CartItem).filter(CartItem.cart_id == cart.id).all()
+    by_item_id = {it.id: it for it in existing}
+    by_product = {it.product_id: it for it in existing}
+
+    def find_line(index: int, op) -> CartItem:
+        line = by_item_id.get(op.cart_item_id) if op.cart_item_id is not None else by_product.get(op.product_id)
+        if line is None:
+            raise HTTPException(status_code=404, detail=f"Thao tác #{index + 1}: không tìm thấy item trong cart")
+        return line
+
+    # 2. Nạp 1 lần mọi sản phẩm được nhắc tới
+    product_ids = {op.product_id for op in batch.operations if op.product_id is not None}
+    product_ids |= {by_item_id[op.cart_item_id].product_id for op in batch.operations
+                    if op.cart_item_id is not None and op.cart_item_id in by_item_id}
+    products = {}
+    if product_ids:
+        products = {p.id: p for p in db.query(Product).filter(Product.id.in_(product_ids)).all()}
+
+    # 3. Áp thao tác theo đúng thứ tự gửi lên
+    touched = {}  # product_id -> dòng giỏ cần kiểm tra tồn kho
+    for index, op in enumerate(batch.operations):
+        if op.op == "add":
+            if op.product_id is None:
+                raise HTTPException(status_code=422, detail=f"Thao tác #{index + 1}: thiếu product_id")
+            product = products.get(op.product_id)
+            if not product or (getattr(product, "is_active", True) is False):
+                raise HTTPException(status_code=404, detail=f"Thao tác #{index + 1}: sản phẩm không tồn tại hoặc đã ngừng bán")
+
+            line = by_product.get(op.product_id)
+            if line is None:
+                line = CartItem(cart_id=cart.id, product_id=op.product_id, variant_id=None, quantity=0)
+                db.add(line)
+                by_product[op.product_id] = line
+            line.quantity = (line.quantity or 0) + (op.quantity or 1)
+            line.price_at_add = _product_price(product)
+            touched[op.product_id] = line
+
+        elif op.op == "update":
+            if op.quantity is None:
+                raise HTTPException(status_code=422, detail=f"Thao tác #{index + 1}: thiếu quantity")
+            line = find_line(index, op)
+            product = products.get(line.product_id)
+            if not product:
+                raise HTTPException(status_code=404, detail=f"Thao tác #{index + 1}: sản phẩm không tồn tại")
+            line.quantity = op.quantity
+            line.price_at_add = _product_price(product)
+            touched[line.product_id] = line
+
+        else:  # remove
+            line = find_line(index, op)
+            by_product.pop(line.product_id, None)
+            if line.id is not None:
+                by_item_id.pop(line.id, None)
+                db.delete(line)
+            else:
+                db.expunge(line)  # dòng vừa add trong cùng lô
+            touched.pop(line.product_id, None)
+
+    # 4. Kiểm tra tồn kho theo số lượng CUỐI CÙNG của từng dòng
+    for product_id, line in touched.items():
+        stock = _product_stock(products[product_id])
+        if stock is not None and stock < line.quantity:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Sản phẩm '{products[product_id].name}' không đủ tồn kho. Hiện có: {stock}",
+            )
+
+    db.commit()
+    cart_summary.invalidate(current_user.id)
+    return get_cart(current_user=current_user, db=db)
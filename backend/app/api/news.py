@@ -19,6 +19,7 @@ from apscheduler.triggers.cron import CronTrigger
 from newspaper import Config
 from tenacity import retry, stop_after_attempt, wait_exponential
 from app.core.database import get_db, SessionLocal
+from app.services import suggest_index
 from app.models.news import News
 
 router = APIRouter()
@@ -134,6 +135,7 @@ def process_single_article(article_url, source_name, config):
         try:
             db.add(new_news)
             db.commit()
+            suggest_index.upsert_news(new_news)
             print(f"   ✅ SAVED: {article.title[:20]}...")
             return 1
         except IntegrityError:
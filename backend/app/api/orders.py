@@ -1,15 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Response
 from sqlalchemy.orm import Session
+from sqlalchemy import func, select, tuple_
 from decimal import Decimal, ROUND_HALF_UP
+from datetime import datetime
+from typing import Union
 import os
 from urllib.parse import quote
 
 from app.core.database import get_db
+from app.core.pagination import encode_cursor, decode_cursor
 from app.models.cart import Cart, CartItem
 from app.models.order import Order, OrderItem, OrderStatus
 from app.models.product import Product
 from app.models.store import Store
-from app.schemas.order import OrderCreate, OrderOut, OrderItemOut
+from app.schemas.order import OrderCreate, OrderOut, OrderItemOut, OrderSummaryOut, OrderPageResponse
+from app.services import order_status, cart_summary, inventory, idempotency
 
 try:
     from app.api.deps import get_current_user
@@ -32,125 +37,178 @@ def _user_display_name(user) -> str:
     return name or "Khách vãng lai"
 
 
-@router.get("/", response_model=list[OrderOut])
+def _load_order_items(db: Session, order_ids: list[int]) -> dict[int, list[OrderItemOut]]:
+    """Item của nhiều đơn + tên sản phẩm + tên shop trong 1 câu JOIN."""
+    if not order_ids:
+        return {}
+    rows = (
+        db.query(
+            OrderItem.order_id,
+            OrderItem.product_id,
+            OrderItem.quantity,
+            OrderItem.price,
+            Product.name,
+            func.coalesce(OrderItem.store_id, Product.store_id),
+            Store.store_name,
+        )
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .outerjoin(Store, Store.id == func.coalesce(OrderItem.store_id, Product.store_id))
+        .filter(OrderItem.order_id.in_(order_ids))
+        .order_by(OrderItem.order_id, OrderItem.id)
+        .all()
+    )
+
+    items_by_order: dict[int, list[OrderItemOut]] = {}
+    for order_id, product_id, quantity, price, pname, sid, sname in rows:
+        unit = Decimal(str(price or "0"))
+        qty = int(quantity or 0)
+        items_by_order.setdefault(int(order_id), []).append(
+            OrderItemOut(
+                product_id=int(product_id) if product_id is not None else 0,
+                product_name=pname or f"Sản phẩm #{product_id}",
+                store_id=int(sid) if sid is not None else None,
+                store_name=(sname or "") if sid is not None else None,
+                quantity=qty,
+                price=_q2(unit),
+                line_total=_q2(unit * qty),
+            )
+        )
+    return items_by_order
+
+
+def _to_order_out(o: Order, out_items: list[OrderItemOut], user) -> OrderOut:
+    subtotal = _q2(sum((it.line_total for it in out_items), Decimal("0")))
+    shipping_fee = SHIPPING_FEE if subtotal > 0 else Decimal("0")
+    tax = _q2(subtotal * TAX_RATE)
+    total_amount = _q2(subtotal + shipping_fee + tax)
+
+    return OrderOut(
+        order_id=int(o.id),
+        user_id=int(o.user_id),
+        customer_name=_user_display_name(user),
+        customer_phone=getattr(user, "phone_number", None),
+        status=o.status,
+        payment_method=o.payment_method or "",
+        shipping_address=o.shipping_address or "",
+        created_at=o.created_at,
+        subtotal=subtotal,
+        shipping_fee=shipping_fee,
+        tax=tax,
+        total_amount=total_amount,
+        items=out_items,
+    )
+
+
+@router.get("/", response_model=Union[list[OrderOut], OrderPageResponse])
 def list_my_orders(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=200),
+    status: str | None = Query(None, description="Lọc theo trạng thái: PENDING, CONFIRMED, SHIPPING, COMPLETED, CANCELLED"),
+    cursor: str | None = Query(
+        None,
+        description="Phân trang keyset: gửi cursor rỗng (?cursor=) cho trang đầu, sau đó gửi lại next_cursor",
+    ),
+    expand: str | None = Query(None, description="expand=items để kèm chi tiết từng sản phẩm (chế độ cursor)"),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
     """
     List đơn hàng của user đang đăng nhập.
-    GET /api/orders/?skip=0&limit=20
+    GET /api/orders/?skip=0&limit=20                 -> list đầy đủ như cũ (offset)
+    GET /api/orders/?cursor=&limit=20&status=...     -> {items (bản rút gọn), next_cursor}
     """
-    orders = (
-        db.query(Order)
-        .filter(Order.user_id == current_user.id)
-        .order_by(Order.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-    if not orders:
-        return []
-
-    order_ids = [o.id for o in orders]
-    items = db.query(OrderItem).filter(OrderItem.order_id.in_(order_ids)).all()
-
-    # group items by order_id
-    items_by_order: dict[int, list[OrderItem]] = {}
-    product_ids = set()
-    store_ids = set()
-
-    for it in items:
-        items_by_order.setdefault(int(it.order_id), []).append(it)
-        if it.product_id is not None:
-            product_ids.add(int(it.product_id))
-        if getattr(it, "store_id", None) is not None:
-            store_ids.add(int(it.store_id))
-
-    products = db.query(Product).filter(Product.id.in_(list(product_ids))).all() if product_ids else []
-    product_map = {int(p.id): p for p in products}
-
-    # add store_id from products too
-    for p in products:
-        sid = getattr(p, "store_id", None)
-        if sid is not None:
-            store_ids.add(int(sid))
-
-    stores = db.query(Store).filter(Store.id.in_(list(store_ids))).all() if store_ids else []
-    store_map = {int(s.id): (s.store_name or "") for s in stores}
-
-    out: list[OrderOut] = []
-    for o in orders:
-        o_items = items_by_order.get(int(o.id), [])
-
-        subtotal = Decimal("0")
-        out_items: list[OrderItemOut] = []
-
-        for it in o_items:
-            p = product_map.get(int(it.product_id)) if it.product_id is not None else None
-            pname = (p.name if p else None) or f"Sản phẩm #{it.product_id}"
-
-            sid = getattr(it, "store_id", None)
-            if sid is None and p is not None:
-                sid = getattr(p, "store_id", None)
-            sid_int = int(sid) if sid is not None else None
-            sname = store_map.get(sid_int) if sid_int is not None else None
-
-            unit = Decimal(str(it.price or "0"))
-            qty = int(it.quantity or 0)
-            line = unit * qty
-            subtotal += line
-
-            out_items.append(
-                OrderItemOut(
-                    product_id=int(it.product_id) if it.product_id is not None else 0,
-                    product_name=pname,
-                    store_id=sid_int,
-                    store_name=sname,
-                    quantity=qty,
-                    price=_q2(unit),
-                    line_total=_q2(line),
-                )
-            )
+    query = db.query(Order).filter(Order.user_id == current_user.id)
+    if status:
+        query = query.filter(Order.status == status.upper())
+    # Cùng thứ tự với index (user_id, [status,] created_at, id)
+    query = query.order_by(Order.created_at.desc(), Order.id.desc())
+
+    # Chế độ cũ: offset/limit, trả về list OrderOut đầy đủ item
+    if cursor is None:
+        orders = query.offset(skip).limit(limit).all()
+        items_by_order = _load_order_items(db, [o.id for o in orders])
+        return [_to_order_out(o, items_by_order.get(int(o.id), []), current_user) for o in orders]
+
+    # Chế độ cursor: trang N tốn như trang 1 (không OFFSET)
+    if cursor:
+        payload = decode_cursor(cursor)
+        try:
+            last_created = datetime.fromisoformat(payload["k"])
+            last_id = int(payload["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
+        query = query.filter(tuple_(Order.created_at, Order.id) < tuple_(last_created, last_id))
+
+    with_items = expand == "items"
+    if with_items:
+        orders = query.limit(limit + 1).all()
+        rows = [(o, None, None, None) for o in orders]
+    else:
+        # Bản rút gọn: số dòng / tổng số lượng / tên sản phẩm đầu tiên lấy bằng subquery
+        # tương quan theo index order_items.order_id, không nạp từng item
+        item_count = (
+            select(func.count(OrderItem.id)).where(OrderItem.order_id == Order.id).scalar_subquery()
+        )
+        total_qty = (
+            select(func.coalesce(func.sum(OrderItem.quantity), 0))
+            .where(OrderItem.order_id == Order.id).scalar_subquery()
+        )
+        first_name = (
+            select(Product.name)
+            .join(OrderItem, OrderItem.product_id == Product.id)
+            .where(OrderItem.order_id == Order.id)
+            .order_by(OrderItem.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        rows = query.add_columns(item_count, total_qty, first_name).limit(limit + 1).all()
 
-        subtotal = _q2(subtotal)
-        shipping_fee = SHIPPING_FEE if subtotal > 0 else Decimal("0")
-        tax = _q2(subtotal * TAX_RATE)
-        total_amount = _q2(subtotal + shipping_fee + tax)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
 
-        out.append(
-            OrderOut(
+    if with_items:
+        items_by_order = _load_order_items(db, [o.id for o, *_ in rows])
+        page = [_to_order_out(o, items_by_order.get(int(o.id), []), current_user) for o, *_ in rows]
+    else:
+        page = [
+            OrderSummaryOut(
                 order_id=int(o.id),
-                user_id=int(o.user_id),
-                customer_name=_user_display_name(current_user),
-                customer_phone=getattr(current_user, "phone_number", None),
                 status=o.status,
                 payment_method=o.payment_method or "",
-                shipping_address=o.shipping_address or "",
                 created_at=o.created_at,
-                subtotal=subtotal,
-                shipping_fee=shipping_fee,
-                tax=tax,
-                total_amount=total_amount,
-                items=out_items,
+                total_amount=_q2(Decimal(str(o.total_amount or "0"))),
+                item_count=int(cnt or 0),
+                total_quantity=int(qty or 0),
+                first_product_name=pname,
             )
-        )
+            for o, cnt, qty, pname in rows
+        ]
 
-    return out
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1][0]
+        next_cursor = encode_cursor({"k": last.created_at, "id": last.id})
+    return OrderPageResponse(items=page, next_cursor=next_cursor)
 
 
 @router.post("/", response_model=OrderOut)
 def create_order(
     order_in: OrderCreate,
+    response: Response,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
+    idempotency_key: str | None = Header(None, alias=idempotency.HEADER),
 ):
     shipping_address = (order_in.shipping_address or "").strip()
     if len(shipping_address) < 5:
         raise HTTPException(status_code=400, detail="Địa chỉ giao hàng không hợp lệ")
 
+    # 🔁 Client gửi lại cùng Idempotency-Key -> trả đúng đơn đã tạo, không chạy lại checkout
+    idem = idempotency.begin(db, "create_order", current_user.id, idempotency_key, order_in)
+    if idem.replay is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+        return idem.replay
+
     cart = db.query(Cart).filter(Cart.user_id == current_user.id).first()
     if not cart:
         raise HTTPException(status_code=400, detail="Giỏ hàng trống")
@@ -159,27 +217,32 @@ def create_order(
     if not cart_items:
         raise HTTPException(status_code=400, detail="Giỏ hàng trống")
 
-    subtotal = Decimal("0")
-    prepared: list[tuple[Product, int, Decimal]] = []  # (product, qty, unit_price)
-    store_ids = set()
-
+    # Tổng số lượng theo sản phẩm (phòng khi giỏ có 2 dòng cùng sản phẩm)
+    quantities: dict[int, int] = {}
     for it in cart_items:
         qty = int(it.quantity or 0)
         if qty <= 0:
             raise HTTPException(status_code=400, detail="Số lượng không hợp lệ")
+        quantities[it.product_id] = quantities.get(it.product_id, 0) + qty
 
-        product = (
-            db.query(Product)
-            .filter(Product.id == it.product_id)
-            .with_for_update()
-            .first()
-        )
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Không tìm thấy sản phẩm id={it.product_id}")
+    # 🔒 Khóa mọi sản phẩm trong 1 câu, theo thứ tự id -> không deadlock giữa các checkout
+    locked = inventory.lock_products(db, quantities.keys())
+    for pid in quantities:
+        if pid not in locked:
+            raise HTTPException(status_code=404, detail=f"Không tìm thấy sản phẩm id={pid}")
+
+    shortages = inventory.find_shortages(locked, quantities)
+    if shortages:
+        lines = ", ".join(f"'{s['name']}' (còn {s['available']})" for s in shortages)
+        raise HTTPException(status_code=400, detail=f"Không đủ tồn kho: {lines}")
+
+    subtotal = Decimal("0")
+    prepared: list[tuple[Product, int, Decimal]] = []  # (product, qty, unit_price)
+    store_ids = set()
 
-        stock = int(getattr(product, "stock", 0) or 0)
-        if stock < qty:
-            raise HTTPException(status_code=400, detail=f"Sản phẩm '{product.name}' không đủ tồn kho (còn {stock})")
+    for it in cart_items:
+        qty = int(it.quantity or 0)
+        product = locked[it.product_id]
 
         # lấy giá tại thời điểm add-to-cart (nếu có), fallback về product.price
         price_at_add = getattr(it, "price_at_add", None)
@@ -221,10 +284,18 @@ def create_order(
     db.add(new_order)
     db.flush()
 
+    # COD: trừ tồn ngay | QR: chỉ giữ hàng có hạn, trừ khi admin xác nhận thanh toán
+    # (cả 2 đều là 1 câu UPDATE ... FROM (VALUES ...) WHERE còn đủ hàng)
+    if initial_status == OrderStatus.PENDING.value:
+        failed = inventory.reserve_stock(db, new_order.id, quantities)
+    else:
+        failed = inventory.decrement_stock(db, quantities)
+    if failed:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Tồn kho vừa thay đổi, vui lòng thử lại")
+
     out_items: list[OrderItemOut] = []
     for product, qty, unit_price in prepared:
-        product.stock = int(getattr(product, "stock", 0) or 0) - qty
-
         sid = int(getattr(product, "store_id", 0) or 0) if getattr(product, "store_id", None) is not None else None
         sname = store_map.get(sid) if sid is not None else None
 
@@ -252,10 +323,12 @@ def create_order(
     # clear cart
     db.query(CartItem).filter(CartItem.cart_id == cart.id).delete()
 
-    db.commit()
+    order_status.on_order_placed(db, new_order, store_ids)
+
+    db.flush()
     db.refresh(new_order)
 
-    return OrderOut(
+    out = OrderOut(
         order_id=int(new_order.id),
         user_id=int(new_order.user_id),
         customer_name=_user_display_name(current_user),
@@ -270,6 +343,12 @@ def create_order(
         total_amount=total_amount,
         items=out_items,
     )
+    # Response được lưu cùng transaction với đơn hàng
+    idempotency.complete(db, idem, out)
+    db.commit()
+    cart_summary.invalidate(current_user.id)
+
+    return out
 
 
 @router.get("/{order_id}", response_model=OrderOut)
@@ -286,74 +365,8 @@ def get_order(
     if not order:
         raise HTTPException(status_code=404, detail="Không tìm thấy đơn hàng")
 
-    items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-
-    product_ids = list({int(it.product_id) for it in items if it.product_id is not None})
-    products = db.query(Product).filter(Product.id.in_(product_ids)).all() if product_ids else []
-    product_map = {int(p.id): p for p in products}
-
-    store_ids = set()
-    for it in items:
-        sid = getattr(it, "store_id", None)
-        if sid is not None:
-            store_ids.add(int(sid))
-        p = product_map.get(int(it.product_id)) if it.product_id is not None else None
-        if p is not None and getattr(p, "store_id", None) is not None:
-            store_ids.add(int(p.store_id))
-
-    stores = db.query(Store).filter(Store.id.in_(list(store_ids))).all() if store_ids else []
-    store_map = {int(s.id): (s.store_name or "") for s in stores}
-
-    subtotal = Decimal("0")
-    out_items: list[OrderItemOut] = []
-
-    for it in items:
-        p = product_map.get(int(it.product_id)) if it.product_id is not None else None
-        pname = (p.name if p else None) or f"Sản phẩm #{it.product_id}"
-
-        sid = getattr(it, "store_id", None)
-        if sid is None and p is not None:
-            sid = getattr(p, "store_id", None)
-        sid_int = int(sid) if sid is not None else None
-        sname = store_map.get(sid_int) if sid_int is not None else None
-
-        unit = Decimal(str(it.price or "0"))
-        qty = int(it.quantity or 0)
-        line = unit * qty
-        subtotal += line
-
-        out_items.append(
-            OrderItemOut(
-                product_id=int(it.product_id) if it.product_id is not None else 0,
-                product_name=pname,
-                store_id=sid_int,
-                store_name=sname,
-                quantity=qty,
-                price=_q2(unit),
-                line_total=_q2(line),
-            )
-        )
-
-    subtotal = _q2(subtotal)
-    shipping_fee = SHIPPING_FEE if subtotal > 0 else Decimal("0")
-    tax = _q2(subtotal * TAX_RATE)
-    total_amount = _q2(subtotal + shipping_fee + tax)
-
-    return OrderOut(
-        order_id=int(order.id),
-        user_id=int(order.user_id),
-        customer_name=_user_display_name(current_user),
-        customer_phone=getattr(current_user, "phone_number", None),
-        status=order.status,
-        payment_method=order.payment_method or "",
-        shipping_address=order.shipping_address or "",
-        created_at=order.created_at,
-        subtotal=subtotal,
-        shipping_fee=shipping_fee,
-        tax=tax,
-        total_amount=total_amount,
-        items=out_items,
-    )
+    items_by_order = _load_order_items(db, [order.id])
+    return _to_order_out(order, items_by_order.get(int(order.id), []), current_user)
 
 
 @router.get("/{order_id}/qr")
@@ -1,132 +1,324 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, desc, asc
-from typing import List, Optional
+from sqlalchemy.orm import Session, joinedload, selectinload, contains_eager
+from sqlalchemy import desc, asc, tuple_, and_
+from typing import List, Optional, Union
+from datetime import datetime
+from decimal import Decimal
 from pydantic import BaseModel
 
 from app.core.database import get_db
-from app.models.product import Product
+from app.core.pagination import encode_cursor, decode_cursor
+from app.models.product import Product, PRICE_SORT_KEY
 from app.models.store import Store
-from app.models.review import Review
+from app.models.recommendation import ProductRecommendation
+from app.services.product_search import build_search
+from app.services import product_facets
+from app.services.catalog_cache import PRODUCT_LIST, LIST_TTL, DETAIL_TTL, product_ns
+from app.core import cache
+from app.schemas.product import ProductListResponse, to_list_item
 
 router = APIRouter()
 
 # --- 1. SCHEMA ---
-class ProductListResponse(BaseModel):
-    id: int
-    name: str
-    slug: Optional[str] = None
-    category: Optional[str] = None
-    description: Optional[str] = None
-    price: float = 0
-    market_price: float = 0
-    image_url: Optional[str] = None
-    rating_average: float = 0.0
-    review_count: int = 0
-    store_name: Optional[str] = None
-    is_active: bool
-
-    class Config:
-        from_attributes = True
-
-# --- 2. API ENDPOINT ---
-@router.get("/", response_model=List[ProductListResponse])
+# Response của chế độ cursor: kèm next_cursor để lấy trang kế tiếp (None = hết)
+class ProductPageResponse(BaseModel):
+    items: List[ProductListResponse]
+    next_cursor: Optional[str] = None
+
+# --- 2. SẮP XẾP ---
+# sort -> (biểu thức khóa, giảm dần?, hàm đọc lại giá trị khóa từ cursor)
+# Mọi kiểu sắp xếp đều dùng thêm Product.id làm tiebreaker để thứ tự ổn định.
+SORT_OPTIONS = {
+    "price-asc": (PRICE_SORT_KEY, False, Decimal),
+    "price-desc": (PRICE_SORT_KEY, True, Decimal),
+    "newest": (Product.created_at, True, datetime.fromisoformat),
+}
+DEFAULT_SORT = "id-desc"
+# Giới hạn số ID cho /batch
+MAX_BATCH_IDS = 200
+# Xếp theo độ liên quan: chỉ có nghĩa khi có `search` (khóa = điểm rank)
+RELEVANCE_SORT = "relevance"
+
+
+def _sort_spec(sort_name: str, rank_expr=None):
+    if sort_name == RELEVANCE_SORT:
+        return rank_expr, True, float
+    if sort_name in SORT_OPTIONS:
+        return SORT_OPTIONS[sort_name]
+    return Product.id, True, int
+
+
+def _apply_sort(query, sort_name: str, rank_expr=None):
+    key, descending, _ = _sort_spec(sort_name, rank_expr)
+    direction = desc if descending else asc
+    if key is Product.id:
+        return query.order_by(direction(Product.id))
+    return query.order_by(direction(key), direction(Product.id))
+
+
+def _apply_cursor(query, sort_name: str, cursor: str, rank_expr=None):
+    payload = decode_cursor(cursor)
+    if payload.get("s") != sort_name:
+        raise HTTPException(status_code=400, detail="Cursor không khớp với kiểu sắp xếp hiện tại")
+
+    key, descending, parse = _sort_spec(sort_name, rank_expr)
+    try:
+        last_id = int(payload["id"])
+        last_key = parse(payload["k"])
+    except (KeyError, TypeError, ValueError, ArithmeticError):
+        raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
+
+    if key is Product.id:
+        return query.filter(Product.id < last_id if descending else Product.id > last_id)
+
+    # So sánh theo bộ (khóa, id) -> Postgres dùng được index (khóa, id)
+    if descending:
+        return query.filter(tuple_(key, Product.id) < tuple_(last_key, last_id))
+    return query.filter(tuple_(key, Product.id) > tuple_(last_key, last_id))
+
+
+# --- 3. BỘ LỌC ---
+def _catalog_conditions(
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    origin: Optional[str] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+):
+    """
+    Trả về (điều kiện chung, điều kiện theo từng facet, biểu thức rank tìm kiếm).
+    Dùng chung cho danh sách sản phẩm và API đếm facet để 2 bên luôn khớp nhau.
+    """
+    base = [Product.is_active == True, Store.is_active == True]
+
+    # 🔎 Full-text (tên, mô tả, thương hiệu, tags, thông số) + trigram chịu lỗi chính tả
+    rank_expr = None
+    search_clause = build_search(search) if search else None
+    if search_clause is not None:
+        condition, rank_expr = search_clause
+        base.append(condition)
+
+    price_conds = []
+    if min_price is not None:
+        price_conds.append(PRICE_SORT_KEY >= min_price)
+    if max_price is not None:
+        price_conds.append(PRICE_SORT_KEY <= max_price)
+
+    facets = {
+        "category": Product.category == category if category and category != "Tất cả" else None,
+        "brand": Product.brand == brand if brand else None,
+        "origin": Product.origin == origin if origin else None,
+        "price": and_(*price_conds) if price_conds else None,
+    }
+    return base, facets, rank_expr
+
+
+# --- 4. API ENDPOINT ---
+@router.get("/", response_model=Union[List[ProductListResponse], ProductPageResponse])
 def get_products(
     db: Session = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     search: Optional[str] = None,
     category: Optional[str] = None,
-    sort: Optional[str] = None  # price-asc, price-desc, newest
+    brand: Optional[str] = None,
+    origin: Optional[str] = None,
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    sort: Optional[str] = None,  # price-asc, price-desc, newest, relevance
+    cursor: Optional[str] = Query(
+        None,
+        description="Phân trang keyset: gửi cursor rỗng (?cursor=) cho trang đầu, sau đó gửi lại next_cursor",
+    ),
 ):
-    review_stats_sq = (
-        db.query(
-            Review.product_id.label("product_id"),
-            func.count(Review.id).label("review_count"),
-            func.avg(Review.rating).label("rating_average"),
-        )
-        .group_by(Review.product_id)
-        .subquery()
+    # ⚡ Cache theo bộ tham số đã chuẩn hóa; bị xóa khi seller/admin thay đổi catalog
+    params = {
+        "skip": skip if cursor is None else None,
+        "limit": limit,
+        "search": " ".join(search.split()).lower() if search else None,
+        "category": None if category == "Tất cả" else category or None,
+        "brand": brand or None,
+        "origin": origin or None,
+        "min_price": min_price,
+        "max_price": max_price,
+        "sort": sort,
+        "cursor": cursor,
+    }
+    return cache.get_or_set(
+        PRODUCT_LIST, params,
+        lambda: _list_products(db, skip, limit, search, category, brand, origin, min_price, max_price, sort, cursor),
+        ttl=LIST_TTL,
     )
 
+
+def _list_products(db: Session, skip, limit, search, category, brand, origin, min_price, max_price, sort, cursor):
+    # rating_average / review_count đã được duy trì sẵn trên bảng products
+    # (xem app/services/review_stats.py) -> không cần GROUP BY bảng reviews nữa
+    base_conds, facet_conds, rank_expr = _catalog_conditions(
+        search, category, brand, origin, min_price, max_price
+    )
     query = (
-        db.query(
-            Product,
-            review_stats_sq.c.review_count,
-            review_stats_sq.c.rating_average
-        )
+        db.query(Product)
         .join(Store)
-        .outerjoin(review_stats_sq, review_stats_sq.c.product_id == Product.id)
-        .filter(Product.is_active == True, Store.is_active == True)
-        # ✅ Load thêm Product.images để lấy ảnh từ bảng phụ nếu image_url chính bị trống
-        .options(joinedload(Product.store), joinedload(Product.images)) 
+        .filter(*base_conds, *[c for c in facet_conds.values() if c is not None])
+        # Chỉ JOIN store (many-to-one, không nhân dòng); gallery không cần cho trang danh sách
+        .options(joinedload(Product.store))
     )
 
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(Product.name.ilike(search_term))
+    if sort == RELEVANCE_SORT and rank_expr is not None:
+        sort_name = RELEVANCE_SORT
+    else:
+        sort_name = sort if sort in SORT_OPTIONS else DEFAULT_SORT
+    query = _apply_sort(query, sort_name, rank_expr)
+
+    # Chế độ cũ: offset/limit, trả về list như trước
+    if cursor is None:
+        rows = query.offset(skip).limit(limit).all()
+        return [to_list_item(prod) for prod in rows]
 
-    if category and category != "Tất cả":
-        query = query.filter(Product.category == category)
+    # Chế độ cursor: trang N tốn như trang 1 (không OFFSET)
+    if cursor:
+        query = _apply_cursor(query, sort_name, cursor, rank_expr)
 
-    if sort == "price-asc":
-        query = query.order_by(asc(Product.price))
-    elif sort == "price-desc":
-        query = query.order_by(desc(Product.price))
-    elif sort == "newest":
-        query = query.order_by(desc(Product.created_at))
-    else:
-        query = query.order_by(desc(Product.id))
-
-    rows = query.offset(skip).limit(limit).all()
-
-    results: List[ProductListResponse] = []
-    for prod, real_review_count, real_rating_average in rows:
-        safe_slug = prod.slug or f"product-{prod.id}"
-        
-        # ✅ FIX LỖI ẢNH: Ưu tiên bảng chính, nếu không có thì lấy ảnh đầu tiên trong bảng phụ
-        display_image = prod.image_url
-        if not display_image and prod.images:
-            display_image = prod.images[0].image_url
-
-        results.append(ProductListResponse(
-            id=prod.id,
-            name=prod.name,
-            slug=safe_slug,
-            category=prod.category,
-            description=prod.description,
-            price=float(prod.price or 0),
-            market_price=float(prod.market_price or 0),
-            image_url=display_image, # Sử dụng ảnh đã được kiểm tra logic
-            rating_average=float(real_rating_average or 0.0),
-            review_count=int(real_review_count or 0),
-            store_name=prod.store.store_name if prod.store else "Unknown",
-            is_active=prod.is_active
-        ))
-
-    return results
+    # Lấy kèm giá trị khóa sắp xếp để dựng next_cursor
+    sort_key, _, _ = _sort_spec(sort_name, rank_expr)
+    rows = query.add_columns(sort_key.label("sort_key")).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more and rows:
+        last_prod, last_key = rows[-1]
+        next_cursor = encode_cursor({"s": sort_name, "k": last_key, "id": last_prod.id})
+
+    return ProductPageResponse(items=[to_list_item(prod) for prod, _ in rows], next_cursor=next_cursor)
+
+
+# GET /api/products/facets  (phải khai báo TRƯỚC /{product_id})
+@router.get("/facets")
+def get_product_facets(
+    db: Session = Depends(get_db),
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    origin: Optional[str] = None,
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+):
+    """
+    Số lượng sản phẩm theo danh mục / thương hiệu / xuất xứ / khoảng giá
+    cho bộ lọc hiện tại (cùng tham số với GET /api/products).
+    """
+    base_conds, facet_conds, _ = _catalog_conditions(
+        search, category, brand, origin, min_price, max_price
+    )
+    cache_key = (
+        " ".join(search.split()).lower() if search else None,
+        None if category == "Tất cả" else category,
+        brand or None,
+        origin or None,
+        min_price,
+        max_price,
+    )
+    return product_facets.compute_facets(db, base_conds, facet_conds, cache_key=cache_key)
+
+
+# GET /api/products/batch?ids=1,2,3  (phải khai báo TRƯỚC /{product_id})
+@router.get("/batch")
+def get_products_batch(
+    ids: str = Query(..., description=f"Danh sách ID cách nhau bởi dấu phẩy, tối đa {MAX_BATCH_IDS}"),
+    db: Session = Depends(get_db),
+):
+    """
+    Lấy chi tiết nhiều sản phẩm trong 1 request (giỏ hàng, đã xem gần đây, so sánh...).
+    Số câu query cố định (sản phẩm + store, gallery) dù xin bao nhiêu ID.
+    Giữ đúng thứ tự ID gửi lên; ID không tồn tại trả về trong `missing`.
+    """
+    try:
+        requested = [int(x) for x in ids.split(",") if x.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Danh sách ID không hợp lệ")
+
+    # Bỏ trùng nhưng giữ thứ tự xuất hiện đầu tiên
+    requested = list(dict.fromkeys(requested))
+    if not requested:
+        raise HTTPException(status_code=400, detail="Cần ít nhất 1 ID sản phẩm")
+    if len(requested) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"Tối đa {MAX_BATCH_IDS} sản phẩm mỗi lần")
+
+    products = (
+        db.query(Product)
+        .options(joinedload(Product.store), selectinload(Product.images))
+        .filter(Product.id.in_(requested))
+        .all()
+    )
+    by_id = {p.id: p for p in products}
+
+    return {
+        "items": [_product_detail_dict(by_id[pid]) for pid in requested if pid in by_id],
+        "missing": [pid for pid in requested if pid not in by_id],
+    }
+
+
+# GET /api/products/{id}/related : "Thường được mua cùng" (bảng tính sẵn bởi job)
+@router.get("/{product_id}/related", response_model=List[ProductListResponse])
+def get_related_products(
+    product_id: int,
+    limit: int = Query(8, ge=1, le=20),
+    db: Session = Depends(get_db),
+):
+    return cache.get_or_set(
+        product_ns(product_id), {"related": limit},
+        lambda: _related_products(db, product_id, limit),
+        ttl=DETAIL_TTL,
+    )
+
+
+def _related_products(db: Session, product_id: int, limit: int):
+    # Đọc theo PK (product_id, rank) -> chỉ quét đúng top-K dòng
+    rows = (
+        db.query(Product)
+        .join(ProductRecommendation, ProductRecommendation.related_product_id == Product.id)
+        .join(Store)
+        .filter(
+            ProductRecommendation.product_id == product_id,
+            Product.is_active == True,
+            Store.is_active == True,
+        )
+        .options(contains_eager(Product.store))
+        .order_by(ProductRecommendation.rank)
+        .limit(limit)
+        .all()
+    )
+    return [to_list_item(prod) for prod in rows]
 
 
 @router.get("/{product_id}")
 def get_product_detail(product_id: int, db: Session = Depends(get_db)):
+    return cache.get_or_set(
+        product_ns(product_id), None,
+        lambda: _product_detail(db, product_id),
+        ttl=DETAIL_TTL,
+    )
+
+
+def _product_detail(db: Session, product_id: int):
     product = (
         db.query(Product)
-        # ✅ Load thêm Product.images để lấy toàn bộ ảnh gallery
-        .options(joinedload(Product.store), joinedload(Product.images))
+        # Gallery nạp bằng 1 câu SELECT ... IN riêng thay vì JOIN nhân dòng
+        .options(joinedload(Product.store), selectinload(Product.images))
         .filter(Product.id == product_id)
         .first()
     )
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    return _product_detail_dict(product)
 
-    cnt, avg = (
-        db.query(func.count(Review.id), func.avg(Review.rating))
-        .filter(Review.product_id == product_id)
-        .first()
-    )
 
-    # ✅ FIX LỖI ẢNH: Xử lý tương tự cho trang chi tiết
-    display_image = product.image_url
+def _product_detail_dict(product: Product) -> dict:
+    """Payload chi tiết sản phẩm, dùng chung cho /{product_id} và /batch."""
+    display_image = product.display_image_url or product.image_url
     if not display_image and product.images:
         display_image = product.images[0].image_url
 
@@ -141,8 +333,8 @@ def get_product_detail(product_id: int, db: Session = Depends(get_db)):
         "image_url": display_image,
         # Trả thêm list gallery ảnh cho frontend hiển thị slider ảnh sản phẩm
         "images": [img.image_url for img in product.images], 
-        "rating_average": float(avg or 0.0),
-        "review_count": int(cnt or 0),
+        "rating_average": float(product.rating_average or 0.0),
+        "review_count": int(product.review_count or 0),
         "store_id": product.store_id,
         "store_name": product.store.store_name if product.store else None,
         "unit": product.unit,
@@ -8,11 +8,17 @@ from app.models.users import User
 from app.models.product import Product
 from app.models.order import Order, OrderItem, OrderStatus
 from app.models.review import Review
-from app.schemas.review import ReviewCreate, ReviewResponse
+from app.schemas.review import ReviewCreate, ReviewUpdate, ReviewResponse
 from app.api.deps import get_current_user
+from app.services import review_stats, catalog_cache
 
 router = APIRouter()
 
+def _invalidate_product_cache(db: Session, product_id: int):
+    # Rating hiển thị ở trang sản phẩm, danh sách và trang store
+    store_id = db.query(Product.store_id).filter(Product.id == product_id).scalar()
+    catalog_cache.invalidate_product(product_id, store_id)
+
 # 1. API: Gửi đánh giá (Chỉ dành cho khách đã mua và nhận hàng thành công)
 @router.post("/", response_model=ReviewResponse)
 def create_review(
@@ -29,8 +35,8 @@ def create_review(
     if not order:
         raise HTTPException(status_code=404, detail="Không tìm thấy đơn hàng")
 
-    # Chỉ được đánh giá khi đơn hàng đã giao thành công (DELIVERED)
-    if order.status != "DELIVERED":
+    # Chỉ được đánh giá khi đơn hàng đã giao thành công (COMPLETED, giữ DELIVERED cho dữ liệu cũ)
+    if order.status not in (OrderStatus.COMPLETED.value, "DELIVERED"):
         raise HTTPException(
             status_code=400, 
             detail="Bạn chỉ có thể đánh giá sản phẩm sau khi đơn hàng đã được giao thành công"
@@ -39,11 +45,10 @@ def create_review(
     # Kiểm tra xem sản phẩm có trong đơn hàng này không
     has_product = db.query(OrderItem).filter(
         OrderItem.order_id == order.id,
-        OrderItem.variant_id.in_(
-            db.query(Product.id).filter(Product.id == review_in.product_id) # Đơn giản hóa: check product qua variant
-        )
+        OrderItem.product_id == review_in.product_id
     ).first()
-    # (Lưu ý: Logic check product trong order cần khớp với cách bạn lưu OrderItem)
+    if not has_product:
+        raise HTTPException(status_code=400, detail="Sản phẩm này không có trong đơn hàng")
 
     # Kiểm tra xem user đã đánh giá sản phẩm này cho đơn hàng này chưa
     existing_review = db.query(Review).filter(
@@ -64,8 +69,12 @@ def create_review(
     )
     
     db.add(new_review)
+    db.flush()
+    # Cập nhật rating_average / review_count của sản phẩm trong cùng transaction
+    review_stats.on_review_created(db, new_review)
     db.commit()
     db.refresh(new_review)
+    _invalidate_product_cache(db, new_review.product_id)
     
     return ReviewResponse(
         id=new_review.id,
@@ -91,4 +100,61 @@ def get_product_reviews(product_id: int, db: Session = Depends(get_db)):
             comment=r.comment,
             created_at=r.created_at
         ))
-    return result
\ No newline at end of file
+    return result
+
+# 3. API: Sửa đánh giá của chính mình
+@router.put("/{review_id}", response_model=ReviewResponse)
+def update_review(
+    review_id: int,
+    review_in: ReviewUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    review = db.query(Review).filter(
+        Review.id == review_id,
+        Review.user_id == current_user.id
+    ).with_for_update().first()
+    if not review:
+        raise HTTPException(status_code=404, detail="Không tìm thấy đánh giá")
+
+    old_rating = review.rating
+    update_data = review_in.dict(exclude_unset=True)
+    for field, value in update_data.items():
+        if field == "rating" and value is None:
+            continue
+        setattr(review, field, value)
+
+    review_stats.on_review_rating_changed(db, review, old_rating)
+    db.commit()
+    db.refresh(review)
+    _invalidate_product_cache(db, review.product_id)
+
+    return ReviewResponse(
+        id=review.id,
+        user_id=review.user_id,
+        user_name=current_user.full_name or "Khách hàng",
+        rating=review.rating,
+        comment=review.comment,
+        created_at=review.created_at
+    )
+
+# 4. API: Xóa đánh giá của chính mình
+@router.delete("/{review_id}")
+def delete_review(
+    review_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    review = db.query(Review).filter(
+        Review.id == review_id,
+        Review.user_id == current_user.id
+    ).with_for_update().first()
+    if not review:
+        raise HTTPException(status_code=404, detail="Không tìm thấy đánh giá")
+
+    product_id = review.product_id
+    review_stats.on_review_deleted(db, review)
+    db.delete(review)
+    db.commit()
+    _invalidate_product_cache(db, product_id)
+    return {"message": "Đã xóa đánh giá"}
@@ -1,23 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, BackgroundTasks
+from fastapi.responses import StreamingResponse, FileResponse
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, func, case # ✅ Thêm func
-from typing import List, Tuple, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import case, tuple_
+from typing import List, Tuple, Optional, Union
+from datetime import datetime
+from decimal import Decimal
+import os
+import shutil
+import tempfile
 from pydantic import BaseModel
 
 from app.core.database import get_db
 from app.models.users import User
 from app.models.store import Store
 from app.models.product import Product, ProductImage
-from app.models.order import Order, OrderItem
+from app.models.order import Order, StoreOrder
 from app.models.withdraw import WithdrawRequest
+from app.models.ledger import LedgerEntryType
 from app.schemas.withdraw import WithdrawResponse, WithdrawCreate
 
 from app.schemas.product import (
-    ProductCreate, ProductUpdate, ProductResponse
+    ProductCreate, ProductUpdate, ProductResponse, ProductBulkUpdate,
+    ProductImageReorder, ProductImageResponse
 )
-from app.schemas.order import OrderOut 
+from app.schemas.order import OrderOut, OrderPageResponse
+from app.core.pagination import encode_cursor, decode_cursor
 
 from app.api.deps import get_current_seller
+from app.services import catalog_cache, suggest_index, store_stats, order_status, ledger, sales_rollup, store_orders, jobs, product_import, product_bulk, exports
+from app.services.product_images import sync_display_image, apply_gallery, reorder_gallery
 
 router = APIRouter()
 
@@ -25,6 +37,14 @@ router = APIRouter()
 # 1. PRODUCT APIs (Giữ nguyên)
 # =================================================================
 
+def _commit_product(db: Session) -> None:
+    # SKU là duy nhất trong 1 cửa hàng (index ux_products_store_sku, dùng cho import theo SKU)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="SKU đã tồn tại trong cửa hàng")
+
 @router.post("/products", response_model=ProductResponse)
 def create_product(
     product_in: ProductCreate,
@@ -64,8 +84,12 @@ def create_product(
             )
             db.add(new_img)
     
-    db.commit()
+    sync_display_image(db, new_product, product_in.images or [])
+    store_stats.on_product_active_changed(db, store.id, False, new_product.is_active)
+    _commit_product(db)
     db.refresh(new_product)
+    catalog_cache.invalidate_product(new_product.id, store.id)
+    suggest_index.upsert_product(new_product, store)
     return new_product
 
 @router.get("/products", response_model=List[ProductResponse])
@@ -91,6 +115,7 @@ def update_product(
     if not product:
         raise HTTPException(status_code=404, detail="Không tìm thấy sản phẩm")
     
+    was_active = product.is_active
     update_data = product_in.dict(exclude_unset=True)
     gallery_images = update_data.pop("images", None)
     
@@ -98,14 +123,163 @@ def update_product(
         setattr(product, field, value)
     
     if gallery_images is not None:
-        db.query(ProductImage).filter(ProductImage.product_id == product_id).delete()
-        for index, url in enumerate(gallery_images):
-            db.add(ProductImage(product_id=product_id, image_url=url, display_order=index))
+        # Chỉ chạm ảnh thay đổi: xóa ảnh bị bỏ, thêm ảnh mới, đổi thứ tự ảnh giữ lại
+        apply_gallery(db, product_id, gallery_images)
     
-    db.commit()
+    if "image_url" in update_data or gallery_images is not None:
+        sync_display_image(db, product, gallery_images)
+    store_stats.on_product_active_changed(db, store.id, was_active, product.is_active)
+    _commit_product(db)
     db.refresh(product)
+    catalog_cache.invalidate_product(product.id, store.id)
+    suggest_index.upsert_product(product, store)
     return product
 
+# ✅ SẮP XẾP LẠI GALLERY (chỉ cập nhật display_order, 1 câu UPDATE)
+@router.put("/products/{product_id}/images/order", response_model=List[ProductImageResponse])
+def reorder_product_images(
+    product_id: int,
+    payload: ProductImageReorder,
+    current_user_store: Tuple[User, Store] = Depends(get_current_seller),
+    db: Session = Depends(get_db)
+):
+    current_user, store = current_user_store
+    product = db.query(Product).filter(Product.id == product_id, Product.store_id == store.id).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Không tìm thấy sản phẩm")
+
+    if not reorder_gallery(db, product_id, payload.image_ids):
+        raise HTTPException(status_code=400, detail="Danh sách ảnh không khớp với gallery hiện tại")
+
+    old_display = product.display_image_url
+    sync_display_image(db, product)
+    db.commit()
+
+    # Ảnh đầu gallery đổi -> thumbnail đổi -> xóa cache / cập nhật gợi ý
+    catalog_cache.invalidate_product(product.id, store.id)
+    if product.display_image_url != old_display:
+        suggest_index.upsert_product(product, store)
+
+    return (
+        db.query(ProductImage)
+        .filter(ProductImage.product_id == product_id)
+        .order_by(ProductImage.display_order, ProductImage.id)
+        .all()
+    )
+
+# ✅ CẬP NHẬT GIÁ / TỒN KHO HÀNG LOẠT (1 câu UPDATE ... FROM VALUES)
+@router.patch("/products/bulk")
+def bulk_update_products(
+    payload: ProductBulkUpdate,
+    current_user_store: Tuple[User, Store] = Depends(get_current_seller),
+    db: Session = Depends(get_db)
+):
+    _, store = current_user_store
+    result = product_bulk.apply_updates(db, store.id, payload.items)
+    db.commit()
+    if result["updated"]:
+        catalog_cache.invalidate_products(result["updated"], store.id)
+    return {"updated": len(result["updated"]), "updated_ids": result["updated"], "errors": result["errors"]}
+
+# ✅ IMPORT HÀNG LOẠT TỪ CSV / XLSX (CHẠY NỀN)
+@router.post("/products/import", status_code=202)
+def import_products(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    current_user_store: Tuple[User, Store] = Depends(get_current_seller),
+):
+    _, store = current_user_store
+
+    filename = file.filename or ""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in product_import.ALLOWED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Chỉ chấp nhận file .csv hoặc .xlsx")
+    if ext == ".xlsx" and not jobs.xlsx_supported():
+        raise HTTPException(status_code=400, detail="Máy chủ chưa hỗ trợ file .xlsx, vui lòng dùng .csv")
+
+    # Chép file upload ra file tạm (đọc từng khối), job nền đọc lại từng dòng rồi tự xóa
+    with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
+        shutil.copyfileobj(file.file, tmp)
+
+    store_id, path = store.id, tmp.name
+    job = jobs.create("product_import", store_id)
+    background_tasks.add_task(
+        jobs.run, job, lambda j: product_import.run_import(j, store_id, path, filename)
+    )
+    return {"job_id": job.id, "status": job.status}
+
+# ✅ TIẾN ĐỘ / KẾT QUẢ JOB NỀN (import, export...)
+@router.get("/jobs/{job_id}")
+def get_job(
+    job_id: str,
+    current_user_store: Tuple[User, Store] = Depends(get_current_seller),
+):
+    _, store = current_user_store
+    job = jobs.get(job_id, store.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Không tìm thấy tác vụ")
+    return job.to_dict()
+
+# ✅ TẢI FILE KẾT QUẢ CỦA JOB (export .xlsx)
+@router.get("/jobs/{job_id}/file")
+def download_job_file(
+    job_id: str,
+    current_user_store: Tuple[User, Store] = Depends(get_current_seller),
+):
+    _, store = current_user_store
+    job = jobs.get(job_id, store.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Không tìm thấy tác vụ")
+    if job.status != jobs.DONE or not job.file_path or not os.path.exists(job.file_path):
+        raise HTTPException(status_code=409, detail="File chưa sẵn sàng")
+    return FileResponse(
+        job.file_path,
+        filename=job.result.get("filename") or os.path.basename(job.file_path),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+# =================================================================
+# XUẤT DỮ LIỆU (sản phẩm / đơn hàng / rút tiền)
+# =================================================================
+
+def _export_kind(kind: str) -> str:
+    if kind not in exports.EXPORTS:
+        raise HTTPException(status_code=404, detail="Loại dữ liệu xuất không hợp lệ")
+    return kind
+
+# ✅ CSV: stream thẳng từ server-side cursor, RAM không tăng theo số dòng
+@router.get("/export/{kind}")
+def export_csv(
+    kind: str,
+    status: Optional[str] = Query(None, description="Chỉ áp dụng cho orders"),
+    current_user_store: Tuple[User, Store] = Depends(get_current_seller),
+):
+    _, store = current_user_store
+    kind = _export_kind(kind)
+    return StreamingResponse(
+        exports.stream_csv(kind, store.id, {"status": status}),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{exports.filename(kind, "csv")}"'},
+    )
+
+# ✅ XLSX: chạy nền, poll GET /jobs/{id} rồi tải GET /jobs/{id}/file
+@router.post("/export/{kind}/xlsx", status_code=202)
+def export_xlsx(
+    kind: str,
+    background_tasks: BackgroundTasks,
+    status: Optional[str] = Query(None, description="Chỉ áp dụng cho orders"),
+    current_user_store: Tuple[User, Store] = Depends(get_current_seller),
+):
+    _, store = current_user_store
+    kind = _export_kind(kind)
+    if not jobs.xlsx_supported():
+        raise HTTPException(status_code=400, detail="Máy chủ chưa hỗ trợ xuất .xlsx, vui lòng dùng CSV")
+
+    store_id, params = store.id, {"status": status}
+    job = jobs.create(f"export_{kind}", store_id)
+    background_tasks.add_task(jobs.run, job, lambda j: exports.run_xlsx_export(j, kind, store_id, params))
+    return {"job_id": job.id, "status": job.status}
+
 @router.delete("/products/{product_id}")
 def delete_product(
     product_id: int,
@@ -116,8 +290,11 @@ def delete_product(
     product = db.query(Product).filter(Product.id == product_id, Product.store_id == store.id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Không tìm thấy sản phẩm")
+    store_stats.on_product_active_changed(db, store.id, product.is_active, False)
     db.delete(product)
     db.commit()
+    catalog_cache.invalidate_product(product_id, store.id)
+    suggest_index.remove(suggest_index.PRODUCT, product_id)
     return {"message": "Đã xóa sản phẩm thành công"}
 
 # =================================================================
@@ -138,96 +315,93 @@ def get_seller_info(current_user_store: Tuple[User, Store] = Depends(get_current
 # 3. ORDER APIs
 # =================================================================
 
-@router.get("/orders", response_model=List[OrderOut])
+@router.get("/orders", response_model=Union[List[OrderOut], OrderPageResponse])
 def get_seller_orders(
     status: Optional[str] = Query(None, description="Lọc trạng thái"),
     keyword: Optional[str] = Query(None, description="Tìm kiếm"),
-    skip: int = 0,
-    limit: int = 20,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=200),
+    cursor: Optional[str] = Query(
+        None,
+        description="Phân trang keyset: gửi cursor rỗng (?cursor=) cho trang đầu, sau đó gửi lại next_cursor",
+    ),
     current_user_store: Tuple[User, Store] = Depends(get_current_seller),
     db: Session = Depends(get_db)
 ):
     current_user, store = current_user_store
 
-    # 1. Query cơ bản: Join bảng để lọc đơn hàng có sản phẩm của Shop
+    # 1. Chỉ đọc bảng store_orders (1 dòng / đơn của shop) -> không cần JOIN + DISTINCT
     query = (
-        db.query(Order)
-        .join(OrderItem, Order.id == OrderItem.order_id)
-        .join(Product, OrderItem.product_id == Product.id)
-        .filter(Product.store_id == store.id)
+        db.query(StoreOrder, Order, User.full_name, User.phone_number)
+        .join(Order, Order.id == StoreOrder.order_id)
+        .outerjoin(User, User.id == Order.user_id)
+        .filter(StoreOrder.store_id == store.id)
     )
 
     # 2. Lọc theo trạng thái
     if status and status != "ALL":
-        query = query.filter(Order.status == status)
+        query = query.filter(StoreOrder.status == status)
+
+    # 3. Tìm kiếm: "#123" đúng mã đơn, còn lại tìm trong mã đơn / tên / SĐT / địa chỉ (index trigram)
+    # Từ khóa không dùng được (vd "#abc") thì bỏ qua như trước, không lọc
+    cond = store_orders.keyword_filter(keyword)
+    if cond is not None:
+        query = query.filter(cond)
+
+    # 4. Sắp xếp cùng thứ tự với index (store_id, [status,] created_at, order_id)
+    query = query.order_by(StoreOrder.created_at.desc(), StoreOrder.order_id.desc())
+    if cursor:
+        payload = decode_cursor(cursor)
+        try:
+            last_created = datetime.fromisoformat(payload["k"])
+            last_id = int(payload["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
+        query = query.filter(
+            tuple_(StoreOrder.created_at, StoreOrder.order_id) < tuple_(last_created, last_id)
+        )
 
-    # 3. Tìm kiếm (Logic thông minh)
-    if keyword:
-        search_term = keyword.strip()
-        
-        # 🟢 TRƯỜNG HỢP 1: Tìm đích danh Mã đơn (Bắt đầu bằng #)
-        if search_term.startswith("#"):
-            clean_id = search_term.replace("#", "")
-            if clean_id.isdigit():
-                query = query.filter(Order.id == int(clean_id))
-        
-        # 🟡 TRƯỜNG HỢP 2: Tìm rộng (Tên, SĐT, Địa chỉ, Mã đơn trần)
-        else:
-            query = query.join(User, Order.user_id == User.id).filter(
-                or_(
-                    Order.id.cast(str) == search_term,         # Mã đơn (không có #)
-                    User.full_name.ilike(f"%{search_term}%"),  # Tên khách
-                    User.phone_number.ilike(f"%{search_term}%"), # SĐT khách
-                    Order.shipping_address.ilike(f"%{search_term}%") # Địa chỉ
-                )
-            )
+    if cursor is None:
+        rows = query.offset(skip).limit(limit).all()
+        has_more = False
+    else:
+        rows = query.limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
 
-    # 4. Phân trang và sắp xếp
-    # Dùng distinct() vì 1 đơn có thể có nhiều item của shop -> tránh trùng lặp dòng Order
-    orders = query.distinct().order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
+    # 5. Item của shop trong cả trang: 1 câu (không lazy-load từng đơn)
+    items_by_order = store_orders.load_store_items(db, store.id, [so.order_id for so, *_ in rows])
 
     results = []
-    
-    for order in orders:
-        shop_items = []
-        
-        # 5. Xử lý Items: Tạo dict thủ công để khớp với Schema
-        for item in order.items:
-            # Chỉ lấy sản phẩm của shop này
-            if item.product.store_id == store.id:
-                item_data = {
-                    "product_id": item.product_id,
-                    "product_name": item.product.name,
-                    "store_id": store.id,
-                    "store_name": store.store_name,
-                    "quantity": item.quantity,
-                    "price": item.price,
-                    "line_total": item.price * item.quantity 
-                }
-                shop_items.append(item_data)
-        
-        # Chỉ trả về đơn hàng nếu có item của shop
-        if shop_items:
-            customer_name = order.user.full_name if order.user else f"User #{order.user_id}"
-            customer_phone = order.user.phone_number if order.user else None
-
-            results.append({
-                "order_id": order.id,
-                "user_id": order.user_id,
-                "customer_name": customer_name,
-                "customer_phone": customer_phone,
-                "status": order.status,
-                "payment_method": order.payment_method,
-                "shipping_address": order.shipping_address,
-                "created_at": order.created_at,
-                "subtotal": order.total_amount, 
-                "shipping_fee": 0,
-                "tax": 0,
-                "total_amount": order.total_amount,
-                "items": shop_items 
-            })
+    for so, order, full_name, phone in rows:
+        shop_items = [
+            {**item, "store_id": store.id, "store_name": store.store_name}
+            for item in items_by_order.get(so.order_id, [])
+        ]
+        results.append({
+            "order_id": order.id,
+            "user_id": order.user_id,
+            "customer_name": full_name if full_name is not None else f"User #{order.user_id}",
+            "customer_phone": phone,
+            "status": so.status,
+            "payment_method": order.payment_method,
+            "shipping_address": order.shipping_address,
+            "created_at": order.created_at,
+            "subtotal": so.subtotal,
+            "shipping_fee": 0,
+            "tax": 0,
+            "total_amount": order.total_amount,
+            "items": shop_items
+        })
 
-    return results
+    if cursor is None:
+        return results
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1][0]
+        next_cursor = encode_cursor({"k": last.created_at, "id": last.order_id})
+    return OrderPageResponse(items=results, next_cursor=next_cursor)
 
 
 @router.get("/orders/stats")
@@ -240,38 +414,28 @@ def get_order_stats(
     """
     current_user, store = current_user_store
     
-    # Query lấy Order Object để dùng distinct() theo ID đơn hàng
-    query = (
-        db.query(Order)
-        .join(OrderItem, Order.id == OrderItem.order_id)
-        .join(Product, OrderItem.product_id == Product.id)
-        .filter(Product.store_id == store.id)
-    )
-    
-    # DISTINCT để loại bỏ các dòng trùng lặp
-    orders = query.distinct().all()
+    # Đọc bộ đếm tính sẵn theo (store, trạng thái) -> không phải nạp toàn bộ đơn của shop
+    counts = order_status.counts_for_store(db, store.id)
     
-    stats = {
-        "new": 0,
+    return {
+        "new": sum(counts.get(st, 0) for st in ["NEW", "CONFIRMED", "PENDING"]),
         "processing": 0,
-        "shipping": 0,
-        "completed": 0,
-        "cancelled": 0
+        "shipping": counts.get("SHIPPING", 0),
+        "completed": counts.get("COMPLETED", 0),
+        "cancelled": counts.get("CANCELLED", 0)
     }
-    
-    # Đếm thủ công
-    for order in orders:
-        st = order.status
-        if st in ["NEW", "CONFIRMED", "PENDING"]:
-            stats["new"] += 1
-        elif st == "SHIPPING":
-            stats["shipping"] += 1
-        elif st == "COMPLETED":
-            stats["completed"] += 1
-        elif st == "CANCELLED":
-            stats["cancelled"] += 1
-            
-    return stats
+
+# ✅ BIỂU ĐỒ DOANH THU / SỐ LƯỢNG / SỐ ĐƠN THEO NGÀY
+@router.get("/analytics")
+def get_sales_analytics(
+    days: int = Query(30, ge=1, le=sales_rollup.MAX_DAYS),
+    product_id: Optional[int] = Query(None, ge=1),
+    current_user_store: Tuple[User, Store] = Depends(get_current_seller),
+    db: Session = Depends(get_db)
+):
+    _, store = current_user_store
+    # Đọc bảng tổng hợp theo ngày (tối đa `days` dòng), ngày trống được điền 0
+    return sales_rollup.series(db, store.id, days, product_id or sales_rollup.STORE_TOTAL)
 
 # =================================================================
 # 4. ORDER ACTION APIs (Cập nhật trạng thái)
@@ -289,18 +453,13 @@ def update_order_status(
 ):
     current_user, store = current_user_store
     
-    # 1. Tìm đơn hàng
-    order = db.query(Order).filter(Order.id == order_id).first()
+    # 1. Tìm đơn hàng (khóa dòng: cùng thứ tự khóa với job trả hàng quá hạn)
+    order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
     if not order:
         raise HTTPException(status_code=404, detail="Không tìm thấy đơn hàng")
 
     # 2. Kiểm tra quyền sở hữu (Shop có sản phẩm trong đơn này không?)
-    has_item_in_store = (
-        db.query(OrderItem)
-        .join(Product, OrderItem.product_id == Product.id)
-        .filter(OrderItem.order_id == order_id, Product.store_id == store.id)
-        .first()
-    )
+    has_item_in_store = db.get(StoreOrder, (store.id, order_id))
     
     if not has_item_in_store:
         raise HTTPException(status_code=403, detail="Bạn không có quyền thao tác trên đơn hàng này")
@@ -310,7 +469,8 @@ def update_order_status(
     if new_status not in ["SHIPPING", "CANCELLED", "COMPLETED"]:
          raise HTTPException(status_code=400, detail="Trạng thái không hợp lệ")
 
-    order.status = new_status
+    # Bộ đếm theo store, thống kê và hàng đang giữ (đơn QR) cập nhật cùng transaction
+    order_status.change_status(db, order, new_status)
     db.commit()
     
     return {"message": "Cập nhật trạng thái thành công", "status": new_status}
@@ -319,55 +479,18 @@ def update_order_status(
 # 5. WALLET APIs (ĐÃ SỬA VÀ BỔ SUNG)
 # =================================================================
 
-# ✅ API 1: LẤY THÔNG TIN VÍ (TÍNH TOÁN REAL-TIME)
+# ✅ API 1: LẤY THÔNG TIN VÍ (ĐỌC SỐ DƯ CHẠY CỦA SỔ CÁI)
 @router.get("/wallet/overview")
 def get_wallet_overview(
     current_user_store: Tuple[User, Store] = Depends(get_current_seller),
-    db: Session = Depends(get_db)
 ):
     current_user, store = current_user_store
     
-    # ==================================================================
-    # 1. TÍNH DOANH THU (CÁCH MỚI: LẤY TOTAL_AMOUNT CỦA ĐƠN HÀNG)
-    # ==================================================================
-    
-    # Bước A: Tìm danh sách các Order ID mà Store này có tham gia bán
-    # (Dùng distinct để tránh trùng lặp nếu 1 đơn có nhiều món của cùng 1 shop)
-    store_order_ids_query = (
-        db.query(OrderItem.order_id)
-        .filter(OrderItem.store_id == store.id)
-        .distinct()
-    )
-    
-    # Bước B: Cộng tổng tiền (total_amount) của các Order đó
-    # Chỉ tính các đơn đã chốt (CONFIRMED, SHIPPING, COMPLETED)
-    revenue_query = (
-        db.query(func.sum(Order.total_amount))
-        .filter(Order.id.in_(store_order_ids_query)) # Chỉ lấy đơn của shop mình
-        .filter(Order.status.in_(["CONFIRMED", "SHIPPING", "COMPLETED"]))
-    )
-    
-    total_revenue = revenue_query.scalar() or 0 # Nếu null thì trả về 0
-
-    # ==================================================================
-    # 2. TÍNH TIỀN ĐÃ RÚT (GIỮ NGUYÊN)
-    # ==================================================================
-    withdraw_query = (
-        db.query(func.sum(WithdrawRequest.amount))
-        .filter(WithdrawRequest.store_id == store.id)
-        .filter(WithdrawRequest.status != "REJECTED") # Trừ tiền các đơn PENDING và COMPLETED
-    )
-    total_withdrawn = withdraw_query.scalar() or 0
-
-    # ==================================================================
-    # 3. TÍNH SỐ DƯ
-    # ==================================================================
-    # Doanh thu thực nhận = Tổng đơn hàng
-    balance = float(total_revenue) - float(total_withdrawn)
-
+    # Số dư & doanh thu được cộng dồn mỗi khi đơn hoàn tất / rút tiền (app/services/ledger.py)
+    # -> chỉ đọc dòng store đã có sẵn, không SUM lại toàn bộ đơn hàng
     return {
-        "balance": balance,
-        "totalRevenue": float(total_revenue),
+        "balance": float(store.balance or 0),
+        "totalRevenue": float(store.lifetime_revenue or 0),
         "platformFee": 0, # Tạm thời chưa tính phí sàn
         "pendingPayout": 0
     }
@@ -432,44 +555,31 @@ def request_withdraw(
     if not store.bank_account:
         raise HTTPException(status_code=400, detail="Vui lòng cập nhật tài khoản ngân hàng trước")
 
-    # 3. TÍNH LẠI SỐ DƯ ĐỂ KIỂM TRA (An toàn tuyệt đối)
-    # --- Tổng thu ---
-    revenue_query = (
-        db.query(func.sum(OrderItem.price * OrderItem.quantity))
-        .join(Order, OrderItem.order_id == Order.id)
-        .join(Product, OrderItem.product_id == Product.id)
-        .filter(Product.store_id == store.id)
-        .filter(Order.status.in_(["CONFIRMED", "SHIPPING", "COMPLETED"]))
-    )
-    total_revenue = revenue_query.scalar() or 0
-    
-    # --- Tổng đã rút ---
-    withdraw_query = (
-        db.query(func.sum(WithdrawRequest.amount))
-        .filter(WithdrawRequest.store_id == store.id)
-        .filter(WithdrawRequest.status != "REJECTED") 
-    )
-    total_withdrawn = withdraw_query.scalar() or 0
-    
-    current_balance = float(total_revenue) - float(total_withdrawn)
+    # 3. KHÓA DÒNG STORE RỒI MỚI KIỂM TRA SỐ DƯ
+    # 2 yêu cầu rút đồng thời phải chờ nhau -> không thể cùng vượt số dư
+    store = ledger.lock_store(db, store.id)
+    current_balance = Decimal(store.balance or 0)
+    amount = Decimal(data.amount)
 
     # 4. SO SÁNH
-    if float(data.amount) > current_balance:
+    if amount > current_balance:
         raise HTTPException(
             status_code=400, 
             detail=f"Số dư không đủ. Khả dụng: {current_balance:,.0f}đ"
         )
 
-    # 5. Lưu vào DB
+    # 5. Lưu vào DB (yêu cầu rút + bút toán trừ ví trong cùng transaction)
     new_req = WithdrawRequest(
         store_id=store.id,
-        amount=data.amount,
+        amount=amount,
         status="PENDING",
         bank_name=store.bank_name,
         bank_account=store.bank_account,
         bank_holder=store.bank_holder
     )
     db.add(new_req)
+    db.flush()
+    ledger.post(db, store, LedgerEntryType.WITHDRAW, -amount, withdraw_request_id=new_req.id)
     db.commit()
     
     return {"message": "Gửi yêu cầu rút tiền thành công"}
\ No newline at end of file
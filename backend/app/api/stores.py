@@ -1,15 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, desc
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 
 from app.core.database import get_db
-from app.models.store import Store
+from app.models.store import Store, StoreStats
 from app.models.product import Product
-from app.models.review import Review  # <--- Import thêm bảng Review
-from app.models.users import User
+from app.models.review import Review
+from app.services import store_stats
+from app.schemas.product import ProductListResponse, to_list_item
+from app.schemas.review import ReviewResponse
+from app.core import cache
+from app.services.catalog_cache import STORE_LIST, LIST_TTL, DETAIL_TTL, store_ns
 
 router = APIRouter()
 
@@ -18,7 +22,7 @@ class StorePublicResponse(BaseModel):
     id: int
     name: str
     description: Optional[str] = None
-    rating: float = 0.0               # Rating này sẽ là rating TÍNH TOÁN
+    rating: float = 0.0               # Trung bình review của mọi sản phẩm trong store
     
     phone_number: Optional[str] = None
     address: Optional[str] = None
@@ -28,10 +32,19 @@ class StorePublicResponse(BaseModel):
     
     created_at: Optional[datetime] = None
     product_count: int = 0
+    review_count: int = 0
+    order_count: int = 0
 
     class Config:
         from_attributes = True
 
+# Trang gian hàng gom trong 1 response
+class StorePageResponse(BaseModel):
+    store: StorePublicResponse
+    top_products: List[ProductListResponse]
+    recent_reviews: List[ReviewResponse]
+
+
 # GET /api/stores
 @router.get("/", response_model=List[StorePublicResponse])
 def get_stores(
@@ -40,89 +53,130 @@ def get_stores(
     limit: int = Query(100, ge=1, le=100),
     search: Optional[str] = None
 ):
-    # 1. Lấy danh sách Store active
-    query = db.query(Store).filter(Store.is_active == True)
-    
+    params = {"skip": skip, "limit": limit, "search": " ".join(search.split()).lower() if search else None}
+    return cache.get_or_set(STORE_LIST, params, lambda: _list_stores(db, skip, limit, search), ttl=LIST_TTL)
+
+
+def _list_stores(db: Session, skip: int, limit: int, search: Optional[str]):
+    # 1 câu duy nhất: store active + stats tính sẵn (xem app/services/store_stats.py),
+    # sắp theo rating ngay trong SQL nên phân trang đúng thứ tự trên toàn bộ danh sách
+    rating = func.coalesce(StoreStats.rating_average, 0.0)
+    query = (
+        db.query(Store, StoreStats)
+        .outerjoin(StoreStats, StoreStats.store_id == Store.id)
+        .filter(Store.is_active == True)
+    )
+
     if search:
         query = query.filter(Store.store_name.ilike(f"%{search}%"))
-    
-    # Lấy danh sách store trước
-    stores = query.offset(skip).limit(limit).all()
-    
-    result = []
-    for store in stores:
-        # 2. LOGIC TÍNH RATING "HỢP LÝ"
-        # Rating Store = Trung bình cộng rating của tất cả Review thuộc các Product của Store đó
-        avg_rating = db.query(func.avg(Review.rating))\
-                       .join(Product, Review.product_id == Product.id)\
-                       .filter(Product.store_id == store.id)\
-                       .scalar()
-        
-        # Nếu chưa có review nào thì mặc định 0 hoặc 5 (tùy bạn chọn, ở đây để 0 cho thật)
-        final_rating = round(avg_rating, 1) if avg_rating else 0.0
-
-        # 3. Đếm số lượng sản phẩm
-        product_count = db.query(func.count(Product.id)).filter(
-            Product.store_id == store.id,
-            Product.is_active == True
-        ).scalar() or 0
-        
-        result.append(StorePublicResponse(
-            id=store.id,
-            name=store.store_name,
-            description=store.store_description,
-            rating=final_rating,  # <--- Dùng giá trị vừa tính toán
-            phone_number=store.phone_number,
-            address=store.address,
-            city=store.city,
-            district=store.district,
-            ward=store.ward,
-            created_at=store.created_at,
-            product_count=product_count
-        ))
-    
-    # Sắp xếp kết quả: Store nào rating cao xếp trước (Python sort)
-    result.sort(key=lambda x: x.rating, reverse=True)
-    
-    return result
 
-# GET /api/stores/{store_id}
-@router.get("/{store_id}", response_model=StorePublicResponse)
-def get_store_detail(
-    store_id: int,
-    db: Session = Depends(get_db)
-):
-    store = db.query(Store).filter(
-        Store.id == store_id,
-        Store.is_active == True
-    ).first()
-    
-    if not store:
-        raise HTTPException(status_code=404, detail="Không tìm thấy store này")
-    
-    # Tính Rating thật
-    avg_rating = db.query(func.avg(Review.rating))\
-                   .join(Product, Review.product_id == Product.id)\
-                   .filter(Product.store_id == store.id)\
-                   .scalar()
-    
-    final_rating = round(avg_rating, 1) if avg_rating else 0.0
+    rows = query.order_by(desc(rating), Store.id).offset(skip).limit(limit).all()
+    return [_to_public(store, stats) for store, stats in rows]
 
-    product_count = db.query(func.count(Product.id)).filter(
-        Product.store_id == store.id,
-        Product.is_active == True
-    ).scalar() or 0
-    
+
+def _to_public(store: Store, stats: Optional[StoreStats]) -> StorePublicResponse:
     return StorePublicResponse(
         id=store.id,
         name=store.store_name,
         description=store.store_description,
-        rating=final_rating, # <--- Rating thật
+        rating=store_stats.rating_of(stats),
         phone_number=store.phone_number,
         address=store.address,
         city=store.city,
         district=store.district,
         ward=store.ward,
         created_at=store.created_at,
-        product_count=product_count
-    )
\ No newline at end of file
+        product_count=stats.active_product_count if stats else 0,
+        review_count=stats.review_count if stats else 0,
+        order_count=stats.order_count if stats else 0,
+    )
+
+# GET /api/stores/{store_id}
+@router.get("/{store_id}", response_model=StorePublicResponse)
+def get_store_detail(
+    store_id: int,
+    db: Session = Depends(get_db)
+):
+    return cache.get_or_set(store_ns(store_id), None, lambda: _store_detail(db, store_id), ttl=DETAIL_TTL)
+
+
+def _store_detail(db: Session, store_id: int):
+    row = (
+        db.query(Store, StoreStats)
+        .outerjoin(StoreStats, StoreStats.store_id == Store.id)
+        .filter(Store.id == store_id, Store.is_active == True)
+        .first()
+    )
+    if not row:
+        raise HTTPException(status_code=404, detail="Không tìm thấy store này")
+
+    store, stats = row
+    return _to_public(store, stats)
+
+
+# GET /api/stores/{store_id}/page
+@router.get("/{store_id}/page", response_model=StorePageResponse)
+def get_store_page(
+    store_id: int,
+    products: int = Query(12, ge=1, le=50),
+    reviews: int = Query(5, ge=0, le=20),
+    db: Session = Depends(get_db),
+):
+    """
+    Mọi thứ trang gian hàng cần trong 1 round trip: thông tin + thống kê,
+    sản phẩm nổi bật, review mới nhất. Cache theo store (namespace `store:{id}`),
+    tự xóa khi seller sửa sản phẩm hoặc khách thêm / sửa / xóa review.
+    """
+    params = {"page": True, "products": products, "reviews": reviews}
+    return cache.get_or_set(
+        store_ns(store_id), params,
+        lambda: _store_page(db, store_id, products, reviews),
+        ttl=DETAIL_TTL,
+    )
+
+
+def _store_page(db: Session, store_id: int, product_limit: int, review_limit: int):
+    # 3 câu query cố định, đều đi theo index store_id
+    store_info = _store_detail(db, store_id)
+
+    # Sản phẩm nổi bật: rating cao, nhiều review trước (aggregate đã có sẵn trên products)
+    top_products = (
+        db.query(Product)
+        .filter(Product.store_id == store_id, Product.is_active == True)
+        .order_by(
+            desc(func.coalesce(Product.rating_average, 0.0)),
+            desc(func.coalesce(Product.review_count, 0)),
+            desc(Product.id),
+        )
+        .limit(product_limit)
+        .all()
+    )
+
+    recent_reviews = []
+    if review_limit:
+        recent_reviews = (
+            db.query(Review)
+            .join(Product, Product.id == Review.product_id)
+            .filter(Product.store_id == store_id)
+            .options(joinedload(Review.user))
+            .order_by(desc(Review.created_at), desc(Review.id))
+            .limit(review_limit)
+            .all()
+        )
+
+    return StorePageResponse(
+        store=store_info,
+        # Store đã nằm trong identity map từ câu đầu -> prod.store không tốn thêm query
+        top_products=[to_list_item(prod) for prod in top_products],
+        recent_reviews=[
+            ReviewResponse(
+                id=r.id,
+                user_id=r.user_id,
+                user_name=(r.user.full_name if r.user else None) or "Khách hàng",
+                rating=r.rating,
+                comment=r.comment,
+                created_at=r.created_at,
+            )
+            for r in recent_reviews
+        ],
+    )
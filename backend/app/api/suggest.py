@@ -0,0 +1,32 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+
+from app.services import suggest_index
+
+router = APIRouter()
+
+
+# GET /api/suggest?q=pin mat&limit=5&types=product,store
+@router.get("/suggest")
+def get_suggestions(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(5, ge=1, le=20),
+    types: Optional[str] = Query(None, description="Lọc loại: product, store, news (cách nhau bởi dấu phẩy)"),
+):
+    """
+    Gợi ý khi gõ (typeahead) cho ô tìm kiếm: đọc từ chỉ mục trong RAM,
+    không truy vấn database. Gõ không dấu vẫn khớp tên có dấu.
+    """
+    kinds = suggest_index.KINDS
+    if types:
+        kinds = tuple(t.strip() for t in types.split(",") if t.strip())
+        if not kinds or any(t not in suggest_index.KINDS for t in kinds):
+            raise HTTPException(status_code=400, detail="Loại gợi ý không hợp lệ")
+
+    groups = suggest_index.suggest(q, limit=limit, kinds=kinds)
+    return {
+        "query": q,
+        "products": groups.get(suggest_index.PRODUCT, []),
+        "stores": groups.get(suggest_index.STORE, []),
+        "news": groups.get(suggest_index.NEWS, []),
+    }
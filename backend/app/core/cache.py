@@ -0,0 +1,225 @@
+# app/core/cache.py
+"""
+Cache đọc xuyên (read-through) cho các API đọc nhiều, ghi ít.
+
+- Mặc định: LRU + TTL ngay trong process (`MemoryCache`).
+- Đặt `CACHE_URL=redis://...` để dùng Redis hoặc bất kỳ server tương thích
+  giao thức Redis (KeyDB, Dragonfly, redis-server chạy local...) -> các worker
+  dùng chung cache.
+
+Key được gom theo "namespace" có version: `invalidate(ns)` chỉ tăng version
+của namespace đó, mọi key cũ tự thành rác và hết hạn theo TTL. Nhờ vậy có thể
+xóa chính xác 1 sản phẩm (`product:12`) mà không đụng cache của sản phẩm khác.
+"""
+import abc
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+
+
+class CacheBackend(abc.ABC):
+    """Giao diện tối thiểu mà một backend cache cần có (thiếu hàm -> lỗi ngay khi khởi tạo)."""
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abc.abstractmethod
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        ...
+
+    @abc.abstractmethod
+    def get_version(self, namespace: str) -> int:
+        ...
+
+    @abc.abstractmethod
+    def bump_version(self, namespace: str) -> int:
+        ...
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class MemoryCache(CacheBackend):
+    def __init__(self, max_entries: int = 5000, max_namespaces: int = 20000):
+        self.max_entries = max_entries
+        self.max_namespaces = max_namespaces
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        # Version để riêng, LRU theo namespace ("product:12" thì có bao nhiêu sản phẩm
+        # có bấy nhiêu namespace). Namespace bị đẩy ra đọc về `_version_floor`, luôn lớn
+        # hơn mọi version đã bị đẩy -> key cũ không bao giờ dùng lại được (chỉ là miss).
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._version_floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get_version(self, namespace):
+        with self._lock:
+            version = self._versions.get(namespace)
+            if version is None:
+                return self._version_floor
+            self._versions.move_to_end(namespace)
+            return version
+
+    def bump_version(self, namespace):
+        with self._lock:
+            version = self._versions.get(namespace, self._version_floor) + 1
+            self._versions[namespace] = version
+            self._versions.move_to_end(namespace)
+            while len(self._versions) > self.max_namespaces:
+                _, evicted = self._versions.popitem(last=False)
+                self._version_floor = max(self._version_floor, evicted + 1)
+            return version
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._versions.clear()
+            self._version_floor = 0
+
+
+class RedisCache(CacheBackend):
+    """
+    Key version có hạn `version_ttl` (gia hạn mỗi lần bump) để không tồn mãi 1 key cho
+    mỗi namespace từng bị xóa. TTL của entry bị chặn <= version_ttl, nên khi key version
+    hết hạn (đọc lại = 0) thì entry ghi ở version cũ đã hết hạn trước -> không đọc lại dữ liệu cũ.
+    """
+
+    def __init__(self, url: str, prefix: str = "zenergy:", version_ttl: int = 86400):
+        import redis  # thư viện tùy chọn, chỉ cần khi đặt CACHE_URL
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.version_ttl = version_ttl
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value), ex=min(ttl, self.version_ttl))
+
+    def get_version(self, namespace):
+        raw = self.client.get(f"{self.prefix}ver:{namespace}")
+        return int(raw) if raw is not None else 0
+
+    def bump_version(self, namespace):
+        key = f"{self.prefix}ver:{namespace}"
+        pipe = self.client.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, self.version_ttl)
+        version, _ = pipe.execute()
+        return int(version)
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{self.prefix}*"):
+            self.client.delete(key)
+
+
+def _create_backend() -> CacheBackend:
+    if settings.CACHE_URL:
+        try:
+            backend = RedisCache(settings.CACHE_URL, version_ttl=settings.CACHE_VERSION_TTL)
+            backend.client.ping()
+            print("✅ Cache: dùng Redis")
+            return backend
+        except Exception as e:
+            print(f"⚠️ Cache: không kết nối được Redis ({e}), dùng cache trong bộ nhớ")
+    return MemoryCache(max_entries=settings.CACHE_MAX_ENTRIES)
+
+
+backend: CacheBackend = _create_backend()
+
+# Bộ đếm hit/miss theo nhóm namespace ("product:12" -> "product"), tính theo từng process
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def _record(namespace: str, field: str) -> None:
+    family = namespace.split(":", 1)[0]
+    with _stats_lock:
+        bucket = _stats.setdefault(family, {"hits": 0, "misses": 0, "invalidations": 0})
+        bucket[field] += 1
+
+
+def make_key(namespace: str, params: Any = None) -> str:
+    version = backend.get_version(namespace)
+    digest = hashlib.sha1(
+        json.dumps(jsonable_encoder(params), sort_keys=True, default=str).encode()
+    ).hexdigest()[:16]
+    return f"{namespace}:v{version}:{digest}"
+
+
+def get_or_set(namespace: str, params: Any, loader: Callable[[], Any], ttl: Optional[int] = None) -> Any:
+    """
+    Trả về giá trị đã cache cho (namespace, params); nếu chưa có thì gọi `loader()`,
+    lưu kết quả (đã chuyển sang dạng JSON) rồi trả về.
+    Lỗi của backend cache không bao giờ làm hỏng request: khi đó đọc thẳng DB.
+    """
+    try:
+        key = make_key(namespace, params)
+        cached = backend.get(key)
+    except Exception as e:
+        print(f"⚠️ Cache get lỗi: {e}")
+        return loader()
+
+    if cached is not None:
+        _record(namespace, "hits")
+        return cached
+
+    _record(namespace, "misses")
+    value = jsonable_encoder(loader())
+    try:
+        backend.set(key, value, ttl or settings.CACHE_DEFAULT_TTL)
+    except Exception as e:
+        print(f"⚠️ Cache set lỗi: {e}")
+    return value
+
+
+def invalidate(*namespaces: str) -> None:
+    for ns in namespaces:
+        try:
+            backend.bump_version(ns)
+            _record(ns, "invalidations")
+        except Exception as e:
+            print(f"⚠️ Cache invalidate lỗi ({ns}): {e}")
+
+
+def stats() -> Dict[str, Any]:
+    with _stats_lock:
+        by_namespace = {k: dict(v) for k, v in _stats.items()}
+    hits = sum(v["hits"] for v in by_namespace.values())
+    misses = sum(v["misses"] for v in by_namespace.values())
+    return {
+        "backend": type(backend).__name__,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "namespaces": by_namespace,
+    }
@@ -24,4 +24,11 @@ class Settings:
     MAIL_PORT: int = int(os.getenv("MAIL_PORT", 587))
     MAIL_SERVER: str = os.getenv("MAIL_SERVER")
 
+    # Cache (để trống CACHE_URL -> cache trong bộ nhớ của process)
+    CACHE_URL: str = os.getenv("CACHE_URL", "")
+    CACHE_DEFAULT_TTL: int = int(os.getenv("CACHE_DEFAULT_TTL", 60))
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", 5000))
+    # Hạn của key version namespace trên Redis (giây), phải >= TTL dài nhất của cache
+    CACHE_VERSION_TTL: int = int(os.getenv("CACHE_VERSION_TTL", 86400))
+
 settings = Settings()
@@ -0,0 +1,28 @@
+# app/core/pagination.py
+"""
+Cursor dạng opaque cho phân trang keyset.
+
+Cursor chỉ là JSON nhỏ (khóa sắp xếp + id của dòng cuối trang) được mã hóa
+base64 url-safe; client không cần hiểu, chỉ gửi lại nguyên văn.
+"""
+import base64
+import json
+from typing import Any, Dict
+
+from fastapi import HTTPException
+
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(payload, dict):
+            raise ValueError("cursor payload")
+        return payload
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
@@ -0,0 +1,64 @@
+# app/core/schema.py
+"""
+Bổ sung schema còn thiếu cho DB đã tồn tại.
+
+`Base.metadata.create_all` chỉ tạo bảng mới, không thêm cột / index vào bảng
+đã có. Hàm `sync_schema` chạy ngay sau create_all khi khởi động để:
+  1. Thêm các cột mới khai báo trong model (ADD COLUMN IF NOT EXISTS)
+  2. Tạo các index khai báo trong model (CREATE INDEX IF NOT EXISTS)
+  3. Chạy các câu DDL mà model không diễn tả được (extension, trigger...)
+Mọi bước đều idempotent, chạy lại nhiều lần không sao.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+
+from app.core.database import Base
+from app.services.product_search import SEARCH_DDL
+from app.services.product_images import DISPLAY_IMAGE_DDL
+from app.services.store_stats import STORE_STATS_DDL
+from app.services.order_status import ORDER_COUNTER_DDL
+from app.services.ledger import LEDGER_DDL
+from app.services.sales_rollup import SALES_ROLLUP_DDL
+from app.services.store_orders import STORE_ORDERS_DDL
+from app.services.product_import import PRODUCT_IMPORT_DDL
+
+# Các câu DDL thô chạy SAU khi cột / index đã đủ.
+# Mỗi câu chạy trong transaction riêng, lỗi câu nào chỉ bỏ qua câu đó.
+POST_DDL: list[str] = [
+    *SEARCH_DDL,
+    *DISPLAY_IMAGE_DDL,
+    *STORE_STATS_DDL,
+    *ORDER_COUNTER_DDL,
+    *LEDGER_DDL,
+    *SALES_ROLLUP_DDL,
+    *STORE_ORDERS_DDL,
+    *PRODUCT_IMPORT_DDL,
+]
+
+
+def sync_schema(engine) -> None:
+    insp = inspect(engine)
+    ddl_compiler = engine.dialect.ddl_compiler(engine.dialect, None)
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                spec = ddl_compiler.get_column_specification(column)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS {spec}'))
+                print(f"🛠️ Schema: thêm cột {table.name}.{column.name}")
+
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+    for stmt in POST_DDL:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(stmt))
+        except Exception as e:
+            print(f"⚠️ Schema DDL lỗi (bỏ qua): {e}")
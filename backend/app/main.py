@@ -7,6 +7,7 @@ from app.api import messages as messages_router
 
 # --- IMPORT DATABASE & MODELS ---
 from app.core.database import engine, Base # Import Base từ database.py
+from app.core.schema import sync_schema
 
 # 👇 SỬA LẠI KHỐI NÀY: Import trực tiếp từng file (Không qua app.models)
 # Mục đích: Để Base nhận diện được các bảng (metadata) trước khi create_all
@@ -20,6 +21,11 @@ import app.models.market
 import app.models.review
 import app.models.news
 import app.models.withdraw # ✅ Đừng quên file mới này
+import app.models.recommendation
+import app.models.idempotency
+import app.models.reservation
+import app.models.ledger
+import app.models.sales
 
 # --- IMPORT ROUTERS ---
 from app.api import (
@@ -35,14 +41,18 @@ from app.api import (
     products as product_router,
     reviews as review_router,
     getdatafromyahoo as market_data,
-    news
+    news,
+    suggest as suggest_router
 )
+from app.services import suggest_index, recommendations, idempotency, inventory
 
 from app.api.market_job import analyze_market_task, get_cached_analysis
 
 # --- KHỞI TẠO BẢNG DỮ LIỆU ---
 # Vì đã import các file models ở trên, Base.metadata giờ đã chứa đủ thông tin
 Base.metadata.create_all(bind=engine) 
+# Bổ sung cột / index mới cho các bảng đã tồn tại (create_all không làm việc này)
+sync_schema(engine)
 
 # --- CẤU HÌNH LIFESPAN ---
 scheduler = AsyncIOScheduler()
@@ -60,6 +70,25 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠️ AI Job Error: {e}")
 
+    # 🔤 Chỉ mục gợi ý tìm kiếm: dựng ngay khi khởi động + làm mới định kỳ
+    suggest_index.refresh()
+    scheduler.add_job(
+        suggest_index.refresh, 'interval', minutes=suggest_index.REFRESH_MINUTES,
+        id="suggest_index_refresh", replace_existing=True,
+    )
+    # 🧮 "Thường được mua cùng": tính lại từ order_items định kỳ
+    scheduler.add_job(
+        recommendations.refresh, 'interval', hours=recommendations.REFRESH_HOURS,
+        id="product_recommendations", replace_existing=True,
+    )
+    # 🧹 Dọn Idempotency-Key hết hạn
+    scheduler.add_job(idempotency.purge, 'interval', hours=1, id="idempotency_purge", replace_existing=True)
+    # ⏰ Trả hàng đang giữ của đơn QR quá hạn thanh toán
+    scheduler.add_job(
+        inventory.sweep, 'interval', minutes=inventory.SWEEP_INTERVAL_MINUTES,
+        id="stock_reservation_sweep", replace_existing=True,
+    )
+
     try:
         market_data.start_market_scheduler()
         news.start_scheduler()
@@ -109,6 +138,7 @@ app.include_router(upload.router, prefix="/api/upload", tags=["Upload"])
 app.include_router(market_data.router, prefix="/api/market-data", tags=["Market Data"])
 app.include_router(news.router, prefix="/api/news", tags=["News"])
 app.include_router(messages_router.router, prefix="/api")
+app.include_router(suggest_router.router, prefix="/api", tags=["Suggest"])
 
 # --- AI API ---
 @app.get("/api/market/analysis", tags=["AI Analysis"])
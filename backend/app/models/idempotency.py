@@ -0,0 +1,30 @@
+# app/models/idempotency.py
+
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index, func
+from app.core.database import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Header `Idempotency-Key` của các API tạo tiền / trừ kho (đặt hàng, xác nhận thanh toán).
+    Lưu dấu vân tay request + response đã trả để client gửi lại (retry) nhận đúng kết quả cũ.
+    Xem app/services/idempotency.py.
+    """
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(50), nullable=False)        # Tên API, vd "create_order"
+    user_id = Column(Integer, nullable=False)         # Người gọi (key chỉ có nghĩa trong phạm vi 1 user)
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False) # sha256 của body request
+
+    status_code = Column(Integer, nullable=True)
+    response = Column(JSON, nullable=True)            # NULL = request đầu tiên chưa xong
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    __table_args__ = (
+        # Tra cứu khi retry = 1 lần đọc index duy nhất này
+        Index("ux_idempotency_scope_user_key", "scope", "user_id", "key", unique=True),
+    )
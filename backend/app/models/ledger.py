@@ -0,0 +1,35 @@
+# app/models/ledger.py
+import enum
+from sqlalchemy import Column, Integer, String, DECIMAL, DateTime, ForeignKey, Index, func
+from app.core.database import Base
+
+
+class LedgerEntryType(str, enum.Enum):
+    SALE = "SALE"            # Đơn hoàn tất -> cộng tiền hàng của store
+    REFUND = "REFUND"        # Đơn đã hoàn tất bị hủy -> trừ lại
+    WITHDRAW = "WITHDRAW"    # Seller rút tiền
+    WITHDRAW_REVERSAL = "WITHDRAW_REVERSAL"  # Yêu cầu rút bị từ chối -> cộng trả lại
+
+
+class StoreLedgerEntry(Base):
+    """
+    Sổ cái ví seller: chỉ ghi thêm, không sửa / xóa. `amount` có dấu (+ cộng, - trừ),
+    `balance_after` = `Store.balance` ngay sau bút toán. Xem app/services/ledger.py.
+    """
+    __tablename__ = "store_ledger_entries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    store_id = Column(Integer, ForeignKey("stores.id", ondelete="CASCADE"), nullable=False)
+    entry_type = Column(String, nullable=False)
+    amount = Column(DECIMAL(15, 2), nullable=False)
+    balance_after = Column(DECIMAL(15, 2), nullable=False)
+
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="SET NULL"), nullable=True)
+    withdraw_request_id = Column(Integer, ForeignKey("withdraw_requests.id", ondelete="SET NULL"), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Lịch sử ví của 1 store, mới nhất trước
+        Index("ix_store_ledger_store_id_id", "store_id", "id"),
+    )
@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, String, ForeignKey, DECIMAL, DateTime, Text, Enum
+from sqlalchemy import Column, Integer, String, ForeignKey, DECIMAL, DateTime, Text, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -15,8 +15,13 @@ class OrderStatus(str, enum.Enum):
 class Order(Base):
     __tablename__ = "orders"
     
-    # ✅ Giữ dòng này để tránh lỗi "Table already defined"
-    __table_args__ = {'extend_existing': True}
+    # ✅ Giữ extend_existing để tránh lỗi "Table already defined"
+    __table_args__ = (
+        # "Đơn của tôi": phân trang keyset theo (created_at, id), có / không lọc status
+        Index("ix_orders_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_orders_user_status_created_id", "user_id", "status", "created_at", "id"),
+        {'extend_existing': True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -52,7 +57,7 @@ class OrderItem(Base):
     __table_args__ = {'extend_existing': True}
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     
     # Store ID để biết món này của shop nào
@@ -69,4 +74,42 @@ class OrderItem(Base):
     product = relationship("app.models.product.Product")
     
     # Link tới Store (Dùng string để không bị lỗi Circular Import với file store.py)
-    store = relationship("app.models.store.Store")
\ No newline at end of file
+    store = relationship("app.models.store.Store")
+
+class StoreOrderCounter(Base):
+    """
+    Số đơn của từng store theo trạng thái (badge dashboard seller).
+    Chỉ được cập nhật qua app/services/order_status.py.
+    """
+    __tablename__ = "store_order_counters"
+    __table_args__ = {'extend_existing': True}
+
+    store_id = Column(Integer, ForeignKey("stores.id", ondelete="CASCADE"), primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class StoreOrder(Base):
+    """
+    Bản chiếu đơn hàng theo từng store (1 dòng / store / đơn) cho trang "Đơn hàng" của seller:
+    lọc, tìm kiếm và phân trang chỉ trên bảng này. Xem app/services/store_orders.py.
+    """
+    __tablename__ = "store_orders"
+    __table_args__ = (
+        # Trang đơn của seller: keyset theo (created_at, order_id), có / không lọc status
+        Index("ix_store_orders_store_created", "store_id", "created_at", "order_id"),
+        Index("ix_store_orders_store_status_created", "store_id", "status", "created_at", "order_id"),
+        {'extend_existing': True},
+    )
+
+    store_id = Column(Integer, ForeignKey("stores.id", ondelete="CASCADE"), primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+    status = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    subtotal = Column(DECIMAL(15, 2), nullable=False, default=0, server_default="0")  # Tiền hàng của riêng store
+    item_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # "mã đơn + tên + SĐT khách + địa chỉ" đã bỏ dấu, chữ thường (index trigram)
+    search_text = Column(Text, nullable=False, default="", server_default="")
@@ -1,10 +1,10 @@
 from sqlalchemy import (
     Column, Integer, String, Text, Boolean, ForeignKey,
-    TIMESTAMP, Float, Numeric
+    TIMESTAMP, Float, Numeric, Index, literal_column
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.dialects.postgresql import JSON, TSVECTOR
 
 from app.core.database import Base
 
@@ -12,7 +12,7 @@ class Product(Base):
     __tablename__ = "products"
 
     id = Column(Integer, primary_key=True, index=True)
-    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False, index=True)
 
     name = Column(String, nullable=False)
     slug = Column(String, unique=True, nullable=True)
@@ -26,6 +26,8 @@ class Product(Base):
 
     # 🖼️ ẢNH CHÍNH: Dùng cho hiển thị danh sách nhanh
     image_url = Column(String, nullable=True)
+    # Ảnh hiển thị đã tính sẵn = image_url hoặc ảnh đầu gallery (xem app/services/product_images.py)
+    display_image_url = Column(String, nullable=True)
     tags = Column(JSON, nullable=True)
     specifications = Column(JSON, nullable=True)
 
@@ -33,28 +35,55 @@ class Product(Base):
     price = Column(Numeric(12, 2), nullable=True)
     market_price = Column(Numeric(12, 2), nullable=True)
     stock = Column(Integer, default=0)
+    # Số lượng đang được giữ cho đơn QR chưa thanh toán. Còn bán được = stock - reserved_stock
+    reserved_stock = Column(Integer, nullable=False, default=0, server_default="0")
     sku = Column(String, nullable=True)
 
     rating_average = Column(Float, default=0.0)
     review_count = Column(Integer, default=0)
 
+    # 🔎 Do trigger trong DB tự cập nhật (xem app/services/product_search.py), không ghi từ code
+    search_vector = Column(TSVECTOR, nullable=True)
+
     is_active = Column(Boolean, default=True)
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
 
     # 🔗 RELATIONSHIPS
     # Giữ lại bảng ảnh phụ để làm Gallery (nhiều ảnh cho 1 sản phẩm)
-    images = relationship("ProductImage", back_populates="product", cascade="all, delete-orphan")
+    images = relationship(
+        "ProductImage", back_populates="product", cascade="all, delete-orphan",
+        order_by="ProductImage.display_order",
+    )
     # Quan hệ với cửa hàng
     store = relationship("app.models.store.Store", back_populates="products")
     
     # ❌ ĐÃ XÓA relationship variants vì bạn không dùng bảng này nữa
 
+# 📑 INDEX CHO PHÂN TRANG KEYSET (GET /api/products?cursor=...)
+# Khóa sắp xếp theo giá: NULL coi như 0. Dùng literal_column để câu query render
+# đúng "coalesce(price, 0)" giống hệt biểu thức của index (không thành bind param).
+PRICE_SORT_KEY = func.coalesce(Product.price, literal_column("0"))
+
+# Partial index chỉ chứa sản phẩm đang bán, khớp đúng thứ tự sắp xếp + id làm tiebreaker
+Index(
+    "ix_products_active_price_id",
+    PRICE_SORT_KEY, Product.id,
+    postgresql_where=Product.is_active == True,
+)
+Index(
+    "ix_products_active_created_id",
+    Product.created_at, Product.id,
+    postgresql_where=Product.is_active == True,
+)
+# Full-text search (index trigram trên tên nằm ở product_search.SEARCH_DDL vì cần hàm f_unaccent)
+Index("ix_products_search_vector", Product.search_vector, postgresql_using="gin")
+
 class ProductImage(Base):
     __tablename__ = "product_images"
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
     image_url = Column(String, nullable=False)
     display_order = Column(Integer, default=0)
 
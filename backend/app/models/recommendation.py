@@ -0,0 +1,23 @@
+# app/models/recommendation.py
+
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, func
+from app.core.database import Base
+
+
+class ProductRecommendation(Base):
+    """
+    "Thường được mua cùng": top-K sản phẩm hay nằm chung đơn với `product_id`.
+    Bảng do job app/services/recommendations.py dựng lại toàn bộ, API chỉ đọc.
+    """
+    __tablename__ = "product_recommendations"
+    __table_args__ = {'extend_existing': True}
+
+    # PK (product_id, rank) -> đọc top-K của 1 sản phẩm là 1 lần quét index
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    related_product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+
+    co_count = Column(Integer, nullable=False, default=0)  # Số đơn có cả 2 sản phẩm
+    score = Column(Float, nullable=False, default=0.0)     # Độ tương đồng cosine theo số đơn
+
+    created_at = Column(DateTime, default=func.now())
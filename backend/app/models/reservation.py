@@ -0,0 +1,37 @@
+# app/models/reservation.py
+import enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, text, func
+from app.core.database import Base
+
+
+class ReservationStatus(str, enum.Enum):
+    ACTIVE = "ACTIVE"        # Đang giữ hàng, chờ thanh toán
+    CONSUMED = "CONSUMED"    # Đã thanh toán -> trừ hẳn vào stock
+    RELEASED = "RELEASED"    # Hết hạn / hủy đơn -> trả lại hàng
+
+
+class StockReservation(Base):
+    """
+    Hàng được giữ cho đơn QR chưa thanh toán. Trong lúc ACTIVE, số lượng nằm trong
+    `Product.reserved_stock` (chưa trừ `stock`). Xem app/services/inventory.py.
+    """
+    __tablename__ = "stock_reservations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+    status = Column(String, nullable=False, default=ReservationStatus.ACTIVE.value)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Sweeper chỉ quét các dòng còn ACTIVE theo hạn -> partial index nhỏ gọn
+        Index(
+            "ix_stock_reservations_active_expires", "expires_at",
+            postgresql_where=text("status = 'ACTIVE'"),
+        ),
+    )
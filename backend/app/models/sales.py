@@ -0,0 +1,23 @@
+# app/models/sales.py
+from sqlalchemy import Column, Integer, Date, DECIMAL, DateTime, ForeignKey, func
+from app.core.database import Base
+
+
+class StoreDailySales(Base):
+    """
+    Doanh thu / số lượng / số đơn theo ngày (giờ Việt Nam) của từng store.
+    product_id = 0 là dòng tổng của cả store; các dòng khác là từng sản phẩm.
+    Chỉ tính đơn chưa hủy, theo ngày đặt đơn. Xem app/services/sales_rollup.py.
+    """
+    __tablename__ = "store_daily_sales"
+    __table_args__ = {'extend_existing': True}
+
+    store_id = Column(Integer, ForeignKey("stores.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True)  # Không FK: 0 = tổng store
+
+    revenue = Column(DECIMAL(15, 2), nullable=False, default=0, server_default="0")
+    units = Column(Integer, nullable=False, default=0, server_default="0")
+    order_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,6 +1,6 @@
 # app/models/store.py
 
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, TIMESTAMP, DECIMAL
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, TIMESTAMP, DECIMAL, Float
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -33,8 +33,9 @@ class Store(Base):
     # Trạng thái
     is_active = Column(Boolean, default=False)
     
-    # Ví tiền & Ngân hàng
+    # Ví tiền & Ngân hàng (số dư chạy của sổ cái store_ledger_entries - xem app/services/ledger.py)
     balance = Column(DECIMAL(15, 2), default=0)
+    lifetime_revenue = Column(DECIMAL(15, 2), nullable=False, default=0, server_default="0")
     bank_name = Column(String, nullable=True)
     bank_account = Column(String, nullable=True)
     bank_holder = Column(String, nullable=True)
@@ -48,4 +49,27 @@ class Store(Base):
     products = relationship("app.models.product.Product", back_populates="store")
     
     # ✅ Dùng chuỗi String chính xác này:
-    withdraws = relationship("app.models.withdraw.WithdrawRequest", back_populates="store")
\ No newline at end of file
+    withdraws = relationship("app.models.withdraw.WithdrawRequest", back_populates="store")
+
+    stats = relationship("StoreStats", uselist=False, viewonly=True)
+
+class StoreStats(Base):
+    """
+    Số liệu tổng hợp của 1 gian hàng, cộng dồn mỗi khi có review / sản phẩm / đơn hàng thay đổi
+    (xem app/services/store_stats.py). Trang danh sách store chỉ JOIN bảng này.
+    """
+    __tablename__ = "store_stats"
+    __table_args__ = {'extend_existing': True}
+
+    store_id = Column(Integer, ForeignKey("stores.id", ondelete="CASCADE"), primary_key=True)
+
+    # Rating store = trung bình mọi review thuộc các sản phẩm của store
+    review_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_average = Column(Float, nullable=False, default=0.0, server_default="0", index=True)
+
+    active_product_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Số đơn (không tính đơn đã hủy) có ít nhất 1 sản phẩm của store
+    order_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
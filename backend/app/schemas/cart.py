@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 from decimal import Decimal
 
 class CartItemAdd(BaseModel):
@@ -14,6 +14,18 @@ class CartItemAdd(BaseModel):
 class CartItemUpdate(BaseModel):
     quantity: int = Field(ge=1)
 
+# PATCH /api/cart/items: nhiều thao tác trong 1 transaction
+class CartItemOperation(BaseModel):
+    op: Literal["add", "update", "remove"]
+    # add: cần product_id | update / remove: cart_item_id hoặc product_id
+    product_id: Optional[int] = None
+    cart_item_id: Optional[int] = None
+    # add: số lượng cộng thêm (mặc định 1) | update: số lượng mới
+    quantity: Optional[int] = Field(default=None, ge=1)
+
+class CartBatchUpdate(BaseModel):
+    operations: List[CartItemOperation] = Field(..., min_length=1, max_length=100)
+
 class CartItemResponse(BaseModel):
     cart_item_id: int
     product_id: int
@@ -23,6 +35,11 @@ class CartItemResponse(BaseModel):
     line_total: Decimal
     in_stock: bool
 
+    # Thông tin hiển thị (nạp sẵn cùng câu query giỏ hàng)
+    image_url: Optional[str] = None
+    store_id: Optional[int] = None
+    store_name: Optional[str] = None
+
     # Legacy fields (optional)
     variant_id: Optional[int] = None
     variant_name: Optional[str] = None
@@ -37,3 +54,9 @@ class CartResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class CartSummaryResponse(BaseModel):
+    item_count: int = 0      # Số dòng sản phẩm
+    quantity: int = 0        # Tổng số lượng (hiển thị trên badge)
+    subtotal: Decimal = Decimal("0")
@@ -53,4 +53,21 @@ class OrderOut(BaseModel):
 
     # ✅ BẮT BUỘC CÓ
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# --- 4. Schema rút gọn cho danh sách "Đơn của tôi" (không kèm từng item) ---
+class OrderSummaryOut(BaseModel):
+    order_id: int
+    status: str
+    payment_method: str
+    created_at: datetime
+    total_amount: Decimal
+
+    item_count: int = 0          # Số dòng sản phẩm
+    total_quantity: int = 0      # Tổng số lượng
+    first_product_name: Optional[str] = None  # Hiển thị "Sản phẩm A và 2 sản phẩm khác"
+
+# Trang kết quả khi dùng cursor
+class OrderPageResponse(BaseModel):
+    items: List[OrderSummaryOut | OrderOut]
+    next_cursor: Optional[str] = None
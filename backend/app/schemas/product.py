@@ -1,8 +1,11 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field
+from typing import TYPE_CHECKING, List, Optional, Dict, Any
 from datetime import datetime
 from decimal import Decimal
 
+if TYPE_CHECKING:
+    from app.models.product import Product
+
 # ========== 0. IMAGE SCHEMAS ==========
 class ProductImageBase(BaseModel):
     image_url: str
@@ -60,6 +63,22 @@ class ProductUpdate(BaseModel):
     
     images: Optional[List[str]] = None 
 
+# PUT /api/seller/products/{id}/images/order: toàn bộ id ảnh gallery theo thứ tự mới
+class ProductImageReorder(BaseModel):
+    image_ids: List[int] = Field(..., max_length=200)
+
+# PATCH /api/seller/products/bulk: cập nhật giá / tồn kho hàng loạt theo id hoặc sku
+class ProductBulkUpdateItem(BaseModel):
+    id: Optional[int] = None
+    sku: Optional[str] = None
+    # Bỏ trống (null) = giữ nguyên giá trị cũ
+    price: Optional[Decimal] = Field(default=None, ge=0)
+    market_price: Optional[Decimal] = Field(default=None, ge=0)
+    stock: Optional[int] = Field(default=None, ge=0)
+
+class ProductBulkUpdate(BaseModel):
+    items: List[ProductBulkUpdateItem] = Field(..., min_length=1, max_length=5000)
+
 class ProductResponse(ProductBase):
     id: int
     store_id: int
@@ -68,10 +87,12 @@ class ProductResponse(ProductBase):
     price: Optional[Decimal] = None
     market_price: Optional[Decimal] = None
     stock: int = 0
+    reserved_stock: int = 0  # Đang giữ cho đơn QR chờ thanh toán
     sku: Optional[str] = None
     
     rating_average: float = 0.0
     review_count: int = 0
+    display_image_url: Optional[str] = None
     
     created_at: datetime
     updated_at: Optional[datetime] = None
@@ -112,4 +133,44 @@ class ProductPublicResponse(BaseModel):
     images: List[ProductImageResponse] = [] 
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# ========== 3. CARD SẢN PHẨM (DANH SÁCH, TRANG GIAN HÀNG) ==========
+
+class ProductListResponse(BaseModel):
+    id: int
+    name: str
+    slug: Optional[str] = None
+    category: Optional[str] = None
+    description: Optional[str] = None
+    price: float = 0
+    market_price: float = 0
+    image_url: Optional[str] = None
+    rating_average: float = 0.0
+    review_count: int = 0
+    store_name: Optional[str] = None
+    is_active: bool
+
+    class Config:
+        from_attributes = True
+
+
+def to_list_item(prod: "Product") -> ProductListResponse:
+    """Card sản phẩm cho danh sách / trang gian hàng (cần `prod.store` đã load)."""
+    safe_slug = prod.slug or f"product-{prod.id}"
+
+    return ProductListResponse(
+        id=prod.id,
+        name=prod.name,
+        slug=safe_slug,
+        category=prod.category,
+        description=prod.description,
+        price=float(prod.price or 0),
+        market_price=float(prod.market_price or 0),
+        # ✅ Ảnh đã tính sẵn (image_url hoặc ảnh đầu gallery) -> không cần load gallery
+        image_url=prod.display_image_url or prod.image_url,
+        rating_average=float(prod.rating_average or 0.0),
+        review_count=int(prod.review_count or 0),
+        store_name=prod.store.store_name if prod.store else "Unknown",
+        is_active=prod.is_active
+    )
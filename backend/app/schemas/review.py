@@ -8,6 +8,10 @@ class ReviewCreate(BaseModel):
     rating: int = Field(..., ge=1, le=5)  # Validate 1-5 sao
     comment: Optional[str] = None
 
+class ReviewUpdate(BaseModel):
+    rating: Optional[int] = Field(None, ge=1, le=5)
+    comment: Optional[str] = None
+
 class ReviewResponse(BaseModel):
     id: int
     user_id: int
@@ -0,0 +1,45 @@
+# app/services/cart_summary.py
+"""
+Tóm tắt giỏ hàng (số dòng, tổng số lượng, tạm tính) cho badge trên header.
+
+Header gọi API này ở mọi trang nên kết quả được cache theo user
+(namespace `cart:{user_id}`); mọi thao tác sửa giỏ và đặt hàng gọi
+`invalidate(user_id)` sau khi commit.
+"""
+from decimal import Decimal
+from typing import Any, Dict
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core import cache
+from app.models.cart import Cart, CartItem
+
+SUMMARY_TTL = 600
+
+
+def cart_ns(user_id: int) -> str:
+    return f"cart:{user_id}"
+
+
+def _compute(db: Session, user_id: int) -> Dict[str, Any]:
+    # 1 câu aggregate, không tạo giỏ mới chỉ để đọc badge
+    item_count, quantity, subtotal = (
+        db.query(
+            func.count(CartItem.id),
+            func.coalesce(func.sum(CartItem.quantity), 0),
+            func.coalesce(func.sum(CartItem.price_at_add * CartItem.quantity), 0),
+        )
+        .join(Cart, Cart.id == CartItem.cart_id)
+        .filter(Cart.user_id == user_id)
+        .one()
+    )
+    return {"item_count": int(item_count), "quantity": int(quantity), "subtotal": Decimal(str(subtotal))}
+
+
+def get_summary(db: Session, user_id: int) -> Dict[str, Any]:
+    return cache.get_or_set(cart_ns(user_id), None, lambda: _compute(db, user_id), ttl=SUMMARY_TTL)
+
+
+def invalidate(user_id: int) -> None:
+    cache.invalidate(cart_ns(user_id))
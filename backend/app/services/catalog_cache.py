@@ -0,0 +1,56 @@
+# app/services/catalog_cache.py
+"""
+Tên namespace cache của catalog và các hàm xóa cache theo đúng phạm vi bị ảnh hưởng.
+
+    product_list      : GET /api/products (mọi trang / bộ lọc)
+    product_facets    : GET /api/products/facets
+    product:{id}      : GET /api/products/{id}
+    store_list        : GET /api/stores
+    store:{id}        : GET /api/stores/{id}, /api/stores/{id}/page
+"""
+from typing import Iterable, Optional
+
+from app.core import cache
+
+PRODUCT_LIST = "product_list"
+PRODUCT_FACETS = "product_facets"
+STORE_LIST = "store_list"
+
+# TTL (giây): danh sách đổi thường xuyên hơn trang chi tiết
+LIST_TTL = 60
+DETAIL_TTL = 300
+
+
+def product_ns(product_id: int) -> str:
+    return f"product:{product_id}"
+
+
+def store_ns(store_id: int) -> str:
+    return f"store:{store_id}"
+
+
+def invalidate_product(product_id: Optional[int], store_id: Optional[int] = None) -> None:
+    """Sản phẩm được thêm / sửa / xóa: danh sách, facet, trang chi tiết và store chứa nó."""
+    namespaces = [PRODUCT_LIST, PRODUCT_FACETS, STORE_LIST]
+    if product_id is not None:
+        namespaces.append(product_ns(product_id))
+    if store_id is not None:
+        namespaces.append(store_ns(store_id))
+    cache.invalidate(*namespaces)
+
+
+def invalidate_products(product_ids: Iterable[int], store_id: Optional[int] = None) -> None:
+    """Nhiều sản phẩm của 1 store đổi cùng lúc (import / cập nhật hàng loạt)."""
+    namespaces = [PRODUCT_LIST, PRODUCT_FACETS, STORE_LIST]
+    namespaces.extend(product_ns(pid) for pid in sorted(set(product_ids)))
+    if store_id is not None:
+        namespaces.append(store_ns(store_id))
+    cache.invalidate(*namespaces)
+
+
+def invalidate_store(store_id: Optional[int]) -> None:
+    """Store được duyệt / khóa / xóa: ảnh hưởng cả danh sách sản phẩm đang hiển thị."""
+    namespaces = [STORE_LIST, PRODUCT_LIST, PRODUCT_FACETS]
+    if store_id is not None:
+        namespaces.append(store_ns(store_id))
+    cache.invalidate(*namespaces)
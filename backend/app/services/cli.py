@@ -0,0 +1,26 @@
+# app/services/cli.py
+"""Tiện ích nhỏ cho các lệnh bảo trì chạy bằng `python -m app.services.<module>`."""
+from app.core.database import SessionLocal
+
+
+def load_models() -> None:
+    # Nạp đủ model để SQLAlchemy resolve được các relationship khai báo bằng chuỗi
+    import app.models.users  # noqa: F401
+    import app.models.address  # noqa: F401
+    import app.models.store  # noqa: F401
+    import app.models.product  # noqa: F401
+    import app.models.cart  # noqa: F401
+    import app.models.order  # noqa: F401
+    import app.models.review  # noqa: F401
+    import app.models.withdraw  # noqa: F401
+    import app.models.news  # noqa: F401
+    import app.models.recommendation  # noqa: F401
+    import app.models.idempotency  # noqa: F401
+    import app.models.reservation  # noqa: F401
+    import app.models.ledger  # noqa: F401
+    import app.models.sales  # noqa: F401
+
+
+def open_session():
+    load_models()
+    return SessionLocal()
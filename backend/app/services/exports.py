@@ -0,0 +1,187 @@
+# app/services/exports.py
+"""
+Xuất dữ liệu của 1 gian hàng (sản phẩm, đơn hàng, yêu cầu rút tiền) ra CSV / XLSX.
+
+- CSV được stream thẳng về client: đọc bằng server-side cursor (`yield_per`),
+  ghi từng khối `CHUNK_ROWS` dòng -> RAM không tăng theo số dòng.
+  Generator tự mở session riêng (session của request đã đóng khi response bắt đầu stream).
+- XLSX (cần `openpyxl`) chạy thành job nền (app/services/jobs.py), ghi file tạm bằng
+  workbook write_only rồi tải về qua GET /api/seller/jobs/{id}/file.
+
+File sản phẩm dùng cùng tên cột với import (sku, name, price...) để sửa rồi import lại được.
+"""
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.order import Order, StoreOrder
+from app.models.product import Product
+from app.models.users import User
+from app.models.withdraw import WithdrawRequest
+from app.services import jobs
+
+YIELD_PER = 1000
+CHUNK_ROWS = 500
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "seller_exports")
+
+PRODUCTS = "products"
+ORDERS = "orders"
+WITHDRAWALS = "withdrawals"
+
+
+def _products(store_id: int, params: Dict[str, Any]):
+    return (
+        select(
+            Product.id, Product.sku, Product.name, Product.price, Product.market_price, Product.stock,
+            Product.reserved_stock, Product.category, Product.brand, Product.unit, Product.is_active,
+            Product.created_at, Product.updated_at,
+        )
+        .where(Product.store_id == store_id)
+        .order_by(Product.id)
+    )
+
+
+def _orders(store_id: int, params: Dict[str, Any]):
+    stmt = (
+        select(
+            StoreOrder.order_id, StoreOrder.created_at, StoreOrder.status, Order.payment_method,
+            User.full_name, User.phone_number, Order.shipping_address,
+            StoreOrder.item_count, StoreOrder.subtotal, Order.total_amount,
+        )
+        .join(Order, Order.id == StoreOrder.order_id)
+        .outerjoin(User, User.id == Order.user_id)
+        .where(StoreOrder.store_id == store_id)
+        .order_by(StoreOrder.created_at.desc(), StoreOrder.order_id.desc())
+    )
+    if params.get("status") and params["status"] != "ALL":
+        stmt = stmt.where(StoreOrder.status == params["status"])
+    return stmt
+
+
+def _withdrawals(store_id: int, params: Dict[str, Any]):
+    return (
+        select(
+            WithdrawRequest.id, WithdrawRequest.created_at, WithdrawRequest.amount, WithdrawRequest.status,
+            WithdrawRequest.bank_name, WithdrawRequest.bank_account, WithdrawRequest.bank_holder,
+        )
+        .where(WithdrawRequest.store_id == store_id)
+        .order_by(WithdrawRequest.created_at.desc(), WithdrawRequest.id.desc())
+    )
+
+
+def _withdrawal_row(row: Sequence[Any]) -> List[Any]:
+    # Mã hiển thị giống GET /wallet/withdraw-requests
+    return [row[0], f"WD-{row[0]:04d}", *row[1:]]
+
+
+# loại -> (dòng tiêu đề, hàm dựng câu SELECT, hàm chuyển 1 dòng hoặc None)
+EXPORTS: Dict[str, Tuple[Sequence[str], Callable[[int, Dict[str, Any]], Any], Optional[Callable]]] = {
+    PRODUCTS: (
+        ("id", "sku", "name", "price", "market_price", "stock", "reserved_stock", "category",
+         "brand", "unit", "is_active", "created_at", "updated_at"),
+        _products,
+        None,
+    ),
+    ORDERS: (
+        ("order_id", "created_at", "status", "payment_method", "customer_name", "customer_phone",
+         "shipping_address", "item_count", "subtotal", "total_amount"),
+        _orders,
+        None,
+    ),
+    WITHDRAWALS: (
+        ("id", "code", "created_at", "amount", "status", "bank_name", "bank_account", "bank_holder"),
+        _withdrawals,
+        _withdrawal_row,
+    ),
+}
+
+
+# Ô bắt đầu bằng các ký tự này bị Excel / LibreOffice hiểu là công thức (kể cả tab / CR đứng đầu)
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        # Chữ do người mua / seller nhập (tên, địa chỉ...): thêm ' để chặn chèn công thức
+        return "'" + value
+    return value
+
+
+def iter_rows(db: Session, kind: str, store_id: int, params: Optional[Dict[str, Any]] = None) -> Iterator[Sequence[Any]]:
+    """Các dòng dữ liệu (tuple cột) đọc theo lô `YIELD_PER` trên server-side cursor."""
+    _, build, transform = EXPORTS[kind]
+    stmt = build(store_id, params or {}).execution_options(yield_per=YIELD_PER)
+    for row in db.execute(stmt):
+        yield transform(row) if transform else row
+
+
+def stream_csv(kind: str, store_id: int, params: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """Generator cho StreamingResponse: BOM (để Excel đọc đúng tiếng Việt) + tiêu đề + từng khối dòng."""
+    header = EXPORTS[kind][0]
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    yield "\ufeff" + buf.getvalue()
+
+    db = SessionLocal()
+    try:
+        count = 0
+        buf.seek(0)
+        buf.truncate()
+        for row in iter_rows(db, kind, store_id, params):
+            writer.writerow([_cell(v) for v in row])
+            count += 1
+            if count % CHUNK_ROWS == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        if buf.tell():
+            yield buf.getvalue()
+    finally:
+        db.close()
+
+
+def filename(kind: str, ext: str) -> str:
+    return f"{kind}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{ext}"
+
+
+def run_xlsx_export(job: jobs.Job, kind: str, store_id: int, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Hàm chạy nền: ghi file .xlsx (write_only, không giữ cả sheet trong RAM)."""
+    from openpyxl import Workbook
+
+    header = EXPORTS[kind][0]
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    name = filename(kind, "xlsx")
+    path = os.path.join(EXPORT_DIR, f"{job.id}.xlsx")
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(kind)
+    ws.append(list(header))
+
+    db = SessionLocal()
+    count = 0
+    try:
+        for row in iter_rows(db, kind, store_id, params):
+            ws.append([float(v) if isinstance(v, Decimal) else _cell(v) for v in row])
+            count += 1
+            if count % CHUNK_ROWS == 0:
+                jobs.progress(job, count)
+    finally:
+        db.close()
+
+    wb.save(path)
+    job.file_path = path
+    jobs.progress(job, count, count)
+    return {"rows": count, "filename": name}
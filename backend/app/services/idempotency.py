@@ -0,0 +1,128 @@
+# app/services/idempotency.py
+"""
+Idempotency-Key cho các API không được chạy 2 lần (đặt hàng, xác nhận thanh toán QR).
+
+Luồng trong 1 request:
+    record = idempotency.begin(db, "create_order", user.id, key, payload)
+    if record.replay is not None: return record.replay       # retry -> trả response cũ
+    ... xử lý như bình thường ...
+    idempotency.complete(db, record, response)               # trước db.commit()
+
+Dòng key được INSERT trong CÙNG transaction với nghiệp vụ:
+  - nghiệp vụ lỗi -> rollback -> key biến mất, client retry được chạy lại từ đầu;
+  - 2 request cùng key chạy song song: request sau bị chặn ở unique index tới khi
+    request trước commit, rồi đọc lại dòng đó và trả response đã lưu.
+Key hết hạn sau TTL_HOURS; job `purge_expired` dọn định kỳ.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.idempotency import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+TTL_HOURS = 24
+MAX_KEY_LENGTH = 255
+
+
+@dataclass
+class IdempotencyRecord:
+    row: Optional[IdempotencyKey] = None
+    replay: Optional[Any] = None  # response đã lưu (khi là request gửi lại)
+
+
+def fingerprint(payload: Any) -> str:
+    raw = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _lookup(db: Session, scope: str, user_id: int, key: str) -> Optional[IdempotencyKey]:
+    return (
+        db.query(IdempotencyKey)
+        .filter(IdempotencyKey.scope == scope, IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .first()
+    )
+
+
+def _check(row: IdempotencyKey, request_hash: str) -> IdempotencyRecord:
+    if row.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail=f"{HEADER} đã được dùng cho một request khác")
+    if row.response is None:
+        raise HTTPException(status_code=409, detail="Request với key này đang được xử lý, vui lòng thử lại sau")
+    return IdempotencyRecord(row=row, replay=row.response)
+
+
+def begin(db: Session, scope: str, user_id: int, key: Optional[str], payload: Any) -> IdempotencyRecord:
+    """Không có key -> không làm gì (giữ tương thích client cũ)."""
+    if not key:
+        return IdempotencyRecord()
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"{HEADER} không hợp lệ")
+
+    request_hash = fingerprint(payload)
+
+    existing = _lookup(db, scope, user_id, key)
+    if existing is not None:
+        if existing.expires_at > datetime.now(timezone.utc):
+            return _check(existing, request_hash)
+        # Key cũ đã hết hạn: coi như key mới
+        db.delete(existing)
+        db.flush()
+
+    row = IdempotencyKey(
+        scope=scope, user_id=user_id, key=key, request_hash=request_hash,
+        expires_at=datetime.now(timezone.utc) + timedelta(hours=TTL_HOURS),
+    )
+    try:
+        # Savepoint: trùng key chỉ hủy câu INSERT này, không hủy cả transaction
+        with db.begin_nested():
+            db.add(row)
+    except IntegrityError:
+        # Request song song cùng key vừa commit xong -> trả kết quả của nó
+        existing = _lookup(db, scope, user_id, key)
+        if existing is None:
+            raise HTTPException(status_code=409, detail="Request với key này đang được xử lý, vui lòng thử lại sau")
+        return _check(existing, request_hash)
+    return IdempotencyRecord(row=row)
+
+
+def complete(db: Session, record: IdempotencyRecord, response: Any, status_code: int = 200) -> None:
+    """Lưu response vào dòng key (chưa commit - commit cùng nghiệp vụ)."""
+    if record.row is None:
+        return
+    record.row.response = jsonable_encoder(response)
+    record.row.status_code = status_code
+
+
+def purge_expired(db: Session) -> int:
+    res = db.execute(
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.expires_at < func.now())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return res.rowcount or 0
+
+
+def purge() -> None:
+    """Job định kỳ: tự mở session riêng (chạy ngoài request)."""
+    from app.services.cli import open_session
+
+    db = open_session()
+    try:
+        n = purge_expired(db)
+        if n:
+            print(f"🧹 Idempotency: xóa {n} key hết hạn")
+    except Exception as e:
+        print(f"⚠️ Idempotency purge lỗi: {e}")
+    finally:
+        db.close()
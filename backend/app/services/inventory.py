@@ -0,0 +1,228 @@
+# app/services/inventory.py
+"""
+Khóa, trừ và giữ (reserve) tồn kho khi đặt hàng.
+
+- Khóa mọi sản phẩm của đơn bằng 1 câu `SELECT ... ORDER BY id FOR UPDATE`:
+  mọi checkout khóa theo cùng 1 thứ tự (id tăng dần) nên 2 giỏ hàng chứa
+  cùng sản phẩm chỉ chờ nhau chứ không deadlock.
+- Trừ tồn bằng 1 câu `UPDATE ... FROM (VALUES ...) WHERE còn đủ hàng`
+  thay vì UPDATE từng dòng.
+- Đơn QR chưa thanh toán chỉ GIỮ hàng: cộng vào `Product.reserved_stock` và
+  ghi `stock_reservations` có hạn. Admin xác nhận thanh toán -> trừ hẳn vào stock;
+  quá hạn -> job `sweep_expired` trả hàng và hủy đơn.
+  Số còn bán được luôn là `stock - reserved_stock`, đọc thẳng trên products.
+
+Thứ tự khóa chung để không deadlock: orders -> stock_reservations -> products (id tăng dần).
+
+Benchmark so sánh với cách cũ: `python bench_checkout.py --help` (thư mục backend/).
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import update, insert, select, values, column, func, Integer
+from sqlalchemy.orm import Session
+
+from app.models.product import Product
+from app.models.order import Order, OrderStatus
+from app.models.reservation import StockReservation, ReservationStatus
+
+# Đơn QR giữ hàng trong bao lâu chờ thanh toán
+RESERVATION_MINUTES = 30
+# Số đơn hết hạn xử lý trong 1 transaction của sweeper
+SWEEP_BATCH_SIZE = 200
+SWEEP_INTERVAL_MINUTES = 1
+
+AVAILABLE = func.coalesce(Product.stock, 0) - func.coalesce(Product.reserved_stock, 0)
+
+
+def available(product: Product) -> int:
+    """Số lượng còn bán được (đã trừ phần đang giữ cho đơn QR)."""
+    return int(product.stock or 0) - int(product.reserved_stock or 0)
+
+
+def lock_products(db: Session, product_ids: Iterable[int]) -> Dict[int, Product]:
+    """Khóa (FOR UPDATE) toàn bộ sản phẩm theo thứ tự id, trả về {id: Product} với tồn kho mới nhất."""
+    ids = sorted(set(product_ids))
+    if not ids:
+        return {}
+    rows = (
+        db.query(Product)
+        .filter(Product.id.in_(ids))
+        .order_by(Product.id)
+        .with_for_update()
+        .populate_existing()
+        .all()
+    )
+    return {p.id: p for p in rows}
+
+
+def find_shortages(products: Dict[int, Product], quantities: Dict[int, int]) -> List[dict]:
+    """Mọi dòng thiếu hàng (không dừng ở dòng đầu tiên). Tồn kho NULL coi như 0."""
+    shortages = []
+    for pid, qty in quantities.items():
+        product = products.get(pid)
+        if product is None:
+            continue
+        stock = available(product)
+        if stock < qty:
+            shortages.append({"product_id": pid, "name": product.name, "requested": qty, "available": stock})
+    return shortages
+
+
+def _qty_values(quantities: Dict[int, int]):
+    return values(column("id", Integer), column("qty", Integer), name="v").data(
+        [(pid, qty) for pid, qty in sorted(quantities.items())]
+    )
+
+
+def _bulk_update(db: Session, quantities: Dict[int, int], require_available: bool, **set_) -> List[int]:
+    """UPDATE products ... FROM (VALUES (id, qty)...) trong 1 câu, trả về id KHÔNG cập nhật được."""
+    if not quantities:
+        return []
+    v = _qty_values(quantities)
+    conds = [Product.id == v.c.id]
+    if require_available:
+        conds.append(AVAILABLE >= v.c.qty)
+    stmt = (
+        update(Product)
+        .where(*conds)
+        .values(**{k: fn(v.c.qty) for k, fn in set_.items()})
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+    updated = {row[0] for row in db.execute(stmt)}
+    return [pid for pid in quantities if pid not in updated]
+
+
+def decrement_stock(db: Session, quantities: Dict[int, int]) -> List[int]:
+    """
+    Trừ tồn kho cho nhiều sản phẩm trong 1 câu UPDATE (chưa commit).
+    Trả về danh sách id KHÔNG trừ được (không đủ hàng) - rỗng nghĩa là thành công hết.
+    """
+    return _bulk_update(db, quantities, True, stock=lambda q: Product.stock - q)
+
+
+# --- GIỮ HÀNG CHO ĐƠN QR ---
+def reserve_stock(db: Session, order_id: int, quantities: Dict[int, int]) -> List[int]:
+    """Giữ hàng (không trừ stock) + ghi reservation có hạn. Trả về id không đủ hàng."""
+    failed = _bulk_update(
+        db, quantities, True,
+        reserved_stock=lambda q: func.coalesce(Product.reserved_stock, 0) + q,
+    )
+    if failed or not quantities:
+        return failed
+
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=RESERVATION_MINUTES)
+    db.execute(insert(StockReservation), [
+        {
+            "order_id": order_id, "product_id": pid, "quantity": qty,
+            "status": ReservationStatus.ACTIVE.value, "expires_at": expires_at,
+        }
+        for pid, qty in sorted(quantities.items())
+    ])
+    return []
+
+
+def _lock_active_reservations(db: Session, order_ids: List[int]) -> List[StockReservation]:
+    if not order_ids:
+        return []
+    return (
+        db.query(StockReservation)
+        .filter(
+            StockReservation.order_id.in_(order_ids),
+            StockReservation.status == ReservationStatus.ACTIVE.value,
+        )
+        .order_by(StockReservation.id)
+        .with_for_update()
+        .all()
+    )
+
+
+def _settle(db: Session, reservations: List[StockReservation], new_status: ReservationStatus) -> int:
+    """Chuyển reservation sang CONSUMED (trừ stock) hoặc RELEASED (trả hàng), cập nhật products 1 câu."""
+    if not reservations:
+        return 0
+    quantities: Dict[int, int] = {}
+    for r in reservations:
+        quantities[r.product_id] = quantities.get(r.product_id, 0) + r.quantity
+
+    lock_products(db, quantities.keys())
+    set_ = {"reserved_stock": lambda q: func.greatest(func.coalesce(Product.reserved_stock, 0) - q, 0)}
+    if new_status == ReservationStatus.CONSUMED:
+        set_["stock"] = lambda q: Product.stock - q
+    _bulk_update(db, quantities, False, **set_)
+
+    db.execute(
+        update(StockReservation)
+        .where(StockReservation.id.in_([r.id for r in reservations]))
+        .values(status=new_status.value, updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    return len(reservations)
+
+
+def consume_reservations(db: Session, order_id: int) -> int:
+    """Đơn đã thanh toán / đã giao: hàng đang giữ được trừ hẳn vào stock. Gọi khi đã khóa dòng order."""
+    return _settle(db, _lock_active_reservations(db, [order_id]), ReservationStatus.CONSUMED)
+
+
+def release_reservations(db: Session, order_id: int) -> int:
+    """Đơn bị hủy: trả lại hàng đang giữ. Gọi khi đã khóa dòng order."""
+    return _settle(db, _lock_active_reservations(db, [order_id]), ReservationStatus.RELEASED)
+
+
+def sweep_expired(db: Session, batch_size: int = SWEEP_BATCH_SIZE) -> Tuple[int, int]:
+    """
+    Trả hàng + hủy các đơn QR quá hạn thanh toán, từng lô `batch_size` đơn / transaction.
+    `FOR UPDATE SKIP LOCKED` trên orders: nhiều worker chạy song song không giẫm chân nhau,
+    và bỏ qua đơn admin đang xác nhận dở. Trả về (số đơn, số reservation) đã xử lý.
+    """
+    from app.services import order_status
+
+    total_orders = total_reservations = 0
+    while True:
+        expired = (
+            select(StockReservation.order_id)
+            .where(
+                StockReservation.status == ReservationStatus.ACTIVE.value,
+                StockReservation.expires_at < func.now(),
+            )
+        )
+        orders = (
+            db.query(Order)
+            .filter(Order.id.in_(expired), Order.status == OrderStatus.PENDING.value)
+            .order_by(Order.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not orders:
+            break
+
+        total_reservations += _settle(
+            db, _lock_active_reservations(db, [o.id for o in orders]), ReservationStatus.RELEASED
+        )
+        for order in orders:
+            order_status.change_status(db, order, OrderStatus.CANCELLED.value, settle_reservations=False)
+        db.commit()
+        total_orders += len(orders)
+
+        if len(orders) < batch_size:
+            break
+    return total_orders, total_reservations
+
+
+def sweep() -> None:
+    """Job định kỳ: tự mở session riêng (chạy ngoài request)."""
+    from app.services.cli import open_session
+
+    db = open_session()
+    try:
+        orders, reservations = sweep_expired(db)
+        if orders:
+            print(f"⏰ Reservation: hủy {orders} đơn QR quá hạn, trả {reservations} dòng hàng")
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Reservation sweep lỗi: {e}")
+    finally:
+        db.close()
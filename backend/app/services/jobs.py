@@ -0,0 +1,131 @@
+# app/services/jobs.py
+"""
+Sổ theo dõi các tác vụ nền chạy lâu (import / export sản phẩm...) của seller.
+
+Tác vụ được chạy bằng `BackgroundTasks` của FastAPI (thread pool, sau khi đã
+trả response), còn trạng thái / tiến độ / lỗi từng dòng nằm trong RAM của
+process để client poll `GET .../jobs/{id}`. Chạy nhiều worker thì client phải
+poll đúng worker đã nhận job (sticky session) - giống suggest_index.
+Job đã xong được giữ `KEEP_HOURS` giờ rồi tự dọn.
+Import / export .xlsx cần thư viện tùy chọn `openpyxl` (`xlsx_supported()`).
+"""
+import os
+import threading
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+PENDING = "PENDING"
+RUNNING = "RUNNING"
+DONE = "DONE"
+FAILED = "FAILED"
+
+KEEP_HOURS = 6
+# Số lỗi từng dòng tối đa giữ lại cho 1 job (còn lại chỉ đếm)
+MAX_ERRORS = 1000
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    owner_id: int
+    status: str = PENDING
+    total: Optional[int] = None
+    processed: int = 0
+    error_count: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    result: Dict[str, Any] = field(default_factory=dict)
+    message: Optional[str] = None
+    file_path: Optional[str] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "error_count": self.error_count,
+            "errors": list(self.errors),
+            "result": dict(self.result),
+            "message": self.message,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def xlsx_supported() -> bool:
+    """Đã cài openpyxl chưa (đọc / ghi file .xlsx)."""
+    try:
+        import openpyxl  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+_jobs: Dict[str, Job] = {}
+_lock = threading.Lock()
+
+
+def _prune_locked() -> None:
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=KEEP_HOURS)
+    for job_id in [j.id for j in _jobs.values() if j.finished_at and j.finished_at < cutoff]:
+        job = _jobs.pop(job_id, None)
+        # File kết quả (export) bị xóa cùng job
+        if job is not None and job.file_path:
+            try:
+                os.remove(job.file_path)
+            except OSError:
+                pass
+
+
+def create(kind: str, owner_id: int) -> Job:
+    job = Job(id=uuid.uuid4().hex, kind=kind, owner_id=owner_id)
+    with _lock:
+        _prune_locked()
+        _jobs[job.id] = job
+    return job
+
+
+def get(job_id: str, owner_id: int) -> Optional[Job]:
+    """Chỉ trả job của đúng chủ sở hữu (store), tránh đoán id xem job người khác."""
+    with _lock:
+        job = _jobs.get(job_id)
+    return job if job is not None and job.owner_id == owner_id else None
+
+
+def progress(job: Job, processed: int, total: Optional[int] = None) -> None:
+    with _lock:
+        job.processed = processed
+        if total is not None:
+            job.total = total
+
+
+def add_error(job: Job, **error: Any) -> None:
+    with _lock:
+        job.error_count += 1
+        if len(job.errors) < MAX_ERRORS:
+            job.errors.append(error)
+
+
+def run(job: Job, fn: Callable[[Job], Optional[Dict[str, Any]]]) -> None:
+    """Chạy `fn(job)` và ghi kết quả / lỗi vào job. Dùng làm hàm cho BackgroundTasks."""
+    with _lock:
+        job.status = RUNNING
+    try:
+        result = fn(job) or {}
+        with _lock:
+            job.result.update(result)
+            job.status = DONE
+    except Exception as e:
+        print(f"⚠️ Job {job.kind} {job.id} lỗi: {e}")
+        with _lock:
+            job.status = FAILED
+            job.message = str(e)
+    finally:
+        with _lock:
+            job.finished_at = datetime.now(timezone.utc)
@@ -0,0 +1,205 @@
+# app/services/ledger.py
+"""
+Ví seller = sổ cái `store_ledger_entries` (chỉ ghi thêm) + số dư chạy trên `Store.balance`.
+
+- Đơn chuyển sang COMPLETED: mỗi store trong đơn được ghi 1 bút toán SALE
+  bằng tổng tiền các món CỦA STORE ĐÓ (không phải total_amount cả đơn).
+- Đơn đã COMPLETED bị chuyển trạng thái khác (hủy): bút toán REFUND trừ lại.
+- Rút tiền: bút toán WITHDRAW trừ ngay khi tạo yêu cầu; yêu cầu bị từ chối
+  (`reject_withdraw`) được cộng trả bằng bút toán WITHDRAW_REVERSAL.
+
+Mọi bút toán khóa dòng stores (FOR UPDATE, id tăng dần) rồi mới cộng số dư,
+ghi cùng transaction với thao tác gốc -> 2 yêu cầu rút tiền đồng thời không
+thể cùng vượt số dư, và đọc ví chỉ là đọc 1 dòng stores.
+
+Thứ tự khóa: orders -> stores -> withdraw_requests.
+
+Đối soát lại số dư từ sổ cái:
+    python -m app.services.ledger
+"""
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, update, select
+from sqlalchemy.orm import Session
+
+from app.models.store import Store
+from app.models.order import Order, OrderItem, OrderStatus
+from app.models.ledger import StoreLedgerEntry, LedgerEntryType
+from app.models.withdraw import WithdrawRequest
+
+# Dựng sổ cái lần đầu cho DB cũ (chỉ chạy khi sổ cái còn trống):
+# SALE cho mọi đơn đã COMPLETED + WITHDRAW cho mọi yêu cầu rút, kèm WITHDRAW_REVERSAL
+# cho yêu cầu đã bị từ chối (giống lúc chạy thật: trừ khi tạo, cộng trả khi từ chối),
+# balance_after là tổng lũy kế theo thời gian; rồi ghi số dư vào stores.
+LEDGER_DDL: List[str] = [
+    """
+    WITH src AS (
+        SELECT oi.store_id, 'SALE' AS entry_type, sum(oi.price * oi.quantity) AS amount,
+               o.id AS order_id, NULL::integer AS withdraw_request_id,
+               coalesce(o.updated_at, o.created_at) AS created_at
+        FROM orders o JOIN order_items oi ON oi.order_id = o.id
+        WHERE o.status = 'COMPLETED' AND oi.store_id IS NOT NULL
+        GROUP BY oi.store_id, o.id
+        UNION ALL
+        SELECT w.store_id, 'WITHDRAW', -w.amount, NULL, w.id, w.created_at
+        FROM withdraw_requests w
+        UNION ALL
+        SELECT w.store_id, 'WITHDRAW_REVERSAL', w.amount, NULL, w.id,
+               greatest(coalesce(w.updated_at, w.created_at), w.created_at)
+        FROM withdraw_requests w
+        WHERE w.status = 'REJECTED'
+    ),
+    ins AS (
+        INSERT INTO store_ledger_entries
+            (store_id, entry_type, amount, balance_after, order_id, withdraw_request_id, created_at)
+        SELECT store_id, entry_type, amount,
+               sum(amount) OVER (PARTITION BY store_id
+                                 ORDER BY created_at, order_id, withdraw_request_id, entry_type
+                                 ROWS UNBOUNDED PRECEDING),
+               order_id, withdraw_request_id, created_at
+        FROM src
+        WHERE NOT EXISTS (SELECT 1 FROM store_ledger_entries)
+        RETURNING store_id, entry_type, amount
+    )
+    UPDATE stores s
+    SET balance = t.balance, lifetime_revenue = t.revenue
+    FROM (
+        SELECT store_id, sum(amount) AS balance,
+               coalesce(sum(amount) FILTER (WHERE entry_type IN ('SALE', 'REFUND')), 0) AS revenue
+        FROM ins GROUP BY store_id
+    ) t
+    WHERE t.store_id = s.id
+    """,
+]
+
+_REVENUE_TYPES = (LedgerEntryType.SALE.value, LedgerEntryType.REFUND.value)
+
+
+def lock_stores(db: Session, store_ids: Iterable[int]) -> Dict[int, Store]:
+    """Khóa dòng stores theo id tăng dần, trả về {id: Store} với số dư mới nhất."""
+    ids = sorted(set(store_ids))
+    if not ids:
+        return {}
+    rows = (
+        db.query(Store)
+        .filter(Store.id.in_(ids))
+        .order_by(Store.id)
+        .with_for_update()
+        .populate_existing()
+        .all()
+    )
+    return {s.id: s for s in rows}
+
+
+def lock_store(db: Session, store_id: int) -> Optional[Store]:
+    return lock_stores(db, [store_id]).get(store_id)
+
+
+def post(db: Session, store: Store, entry_type: LedgerEntryType, amount: Decimal,
+         order_id: Optional[int] = None, withdraw_request_id: Optional[int] = None) -> StoreLedgerEntry:
+    """Ghi 1 bút toán + cộng số dư. `store` phải đang bị khóa (lock_store / lock_stores). Chưa commit."""
+    amount = Decimal(amount)
+    store.balance = Decimal(store.balance or 0) + amount
+    if entry_type.value in _REVENUE_TYPES:
+        store.lifetime_revenue = Decimal(store.lifetime_revenue or 0) + amount
+
+    entry = StoreLedgerEntry(
+        store_id=store.id,
+        entry_type=entry_type.value,
+        amount=amount,
+        balance_after=store.balance,
+        order_id=order_id,
+        withdraw_request_id=withdraw_request_id,
+    )
+    db.add(entry)
+    return entry
+
+
+def reject_withdraw(db: Session, withdraw_id: int) -> Optional[WithdrawRequest]:
+    """
+    Chuyển yêu cầu rút sang REJECTED và cộng trả số tiền đã trừ (WITHDRAW_REVERSAL).
+    Mọi chỗ từ chối yêu cầu rút phải đi qua hàm này. Gọi lại lần 2 không cộng thêm. Chưa commit.
+    """
+    req = db.get(WithdrawRequest, withdraw_id)
+    if req is None:
+        return None
+    store = lock_store(db, req.store_id)
+    # Đọc lại trạng thái sau khi đã khóa store (2 lần từ chối đồng thời phải chờ nhau)
+    req = (
+        db.query(WithdrawRequest)
+        .filter(WithdrawRequest.id == withdraw_id)
+        .with_for_update()
+        .populate_existing()
+        .one()
+    )
+    if req.status == "REJECTED":
+        return req
+    if req.status == "COMPLETED":
+        raise ValueError("Yêu cầu rút tiền đã chi trả, không thể từ chối")
+    req.status = "REJECTED"
+    post(db, store, LedgerEntryType.WITHDRAW_REVERSAL, Decimal(req.amount), withdraw_request_id=req.id)
+    return req
+
+
+def _store_amounts(db: Session, order_id: int) -> Dict[int, Decimal]:
+    rows = (
+        db.query(OrderItem.store_id, func.sum(OrderItem.price * OrderItem.quantity))
+        .filter(OrderItem.order_id == order_id, OrderItem.store_id.isnot(None))
+        .group_by(OrderItem.store_id)
+    )
+    return {sid: Decimal(total or 0) for sid, total in rows}
+
+
+def on_order_status_changed(db: Session, order: Order, old_status: str) -> None:
+    """Gọi từ order_status.change_status (order đã bị khóa, order.status là trạng thái mới)."""
+    completed = OrderStatus.COMPLETED.value
+    if (old_status == completed) == (order.status == completed):
+        return
+
+    amounts = _store_amounts(db, order.id)
+    stores = lock_stores(db, amounts.keys())
+    if order.status == completed:
+        entry_type, sign = LedgerEntryType.SALE, 1
+    else:
+        entry_type, sign = LedgerEntryType.REFUND, -1
+    for sid in sorted(stores):
+        if amounts[sid]:
+            post(db, stores[sid], entry_type, sign * amounts[sid], order_id=order.id)
+
+
+# --- ĐỐI SOÁT ---
+def reconcile_all(db: Session) -> int:
+    """Đặt lại stores.balance / lifetime_revenue = tổng sổ cái (sổ cái là nguồn đúng)."""
+    totals = (
+        select(
+            StoreLedgerEntry.store_id,
+            func.sum(StoreLedgerEntry.amount).label("balance"),
+            func.coalesce(
+                func.sum(StoreLedgerEntry.amount).filter(StoreLedgerEntry.entry_type.in_(_REVENUE_TYPES)), 0
+            ).label("revenue"),
+        )
+        .group_by(StoreLedgerEntry.store_id)
+        .subquery()
+    )
+    # Khóa toàn bộ stores để không có bút toán mới chen vào giữa lúc tính
+    lock_stores(db, [sid for (sid,) in db.query(Store.id)])
+    res = db.execute(
+        update(Store)
+        .where(Store.id == totals.c.store_id)
+        .values(balance=totals.c.balance, lifetime_revenue=totals.c.revenue)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return res.rowcount or 0
+
+
+if __name__ == "__main__":
+    from app.services.cli import open_session
+
+    db = open_session()
+    try:
+        n = reconcile_all(db)
+        print(f"✅ Đã đối soát số dư ví cho {n} gian hàng")
+    finally:
+        db.close()
@@ -0,0 +1,128 @@
+# app/services/order_status.py
+"""
+Mọi thay đổi trạng thái đơn hàng đi qua đây để các số liệu đi kèm luôn khớp:
+  - `store_order_counters`: số đơn theo (store, trạng thái) cho badge dashboard seller
+  - `store_stats.order_count` (xem app/services/store_stats.py)
+  - hàng đang giữ của đơn QR (xem app/services/inventory.py)
+  - ví seller: bút toán SALE / REFUND khi đơn vào / ra COMPLETED (xem app/services/ledger.py)
+  - doanh thu theo ngày `store_daily_sales` (xem app/services/sales_rollup.py)
+  - bản chiếu `store_orders` cho trang đơn của seller (xem app/services/store_orders.py)
+
+Người gọi phải đang khóa dòng order (SELECT ... FOR UPDATE) và tự commit.
+
+Đối soát lại bộ đếm từ bảng orders:
+    python -m app.services.order_status
+"""
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.order import Order, OrderItem, OrderStatus, StoreOrderCounter
+from app.services import store_stats, ledger, sales_rollup, store_orders
+
+# Khởi tạo bộ đếm 1 lần cho DB cũ (chỉ chạy khi bảng còn trống)
+ORDER_COUNTER_DDL: List[str] = [
+    """
+    INSERT INTO store_order_counters (store_id, status, count)
+    SELECT oi.store_id, o.status, count(DISTINCT o.id)
+    FROM orders o JOIN order_items oi ON oi.order_id = o.id
+    WHERE oi.store_id IS NOT NULL AND o.status IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM store_order_counters)
+    GROUP BY oi.store_id, o.status
+    """,
+]
+
+
+def store_ids_of(db: Session, order_id: int) -> List[int]:
+    return [
+        sid for (sid,) in db.query(OrderItem.store_id)
+        .filter(OrderItem.order_id == order_id, OrderItem.store_id.isnot(None))
+        .distinct()
+    ]
+
+
+def _bump(db: Session, store_ids: Iterable[int], status: Optional[str], delta: int) -> None:
+    store_ids = sorted(set(store_ids))
+    if not store_ids or not status or not delta:
+        return
+    stmt = insert(StoreOrderCounter).values(
+        [{"store_id": sid, "status": status, "count": max(delta, 0)} for sid in store_ids]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[StoreOrderCounter.store_id, StoreOrderCounter.status],
+        set_={"count": func.greatest(StoreOrderCounter.count + delta, 0)},
+    )
+    db.execute(stmt)
+
+
+def on_order_placed(db: Session, order: Order, store_ids: Iterable[int]) -> None:
+    """Gọi trong transaction tạo đơn (sau flush)."""
+    store_ids = list(set(store_ids))
+    _bump(db, store_ids, order.status, 1)
+    store_stats.on_order_placed(db, store_ids)
+    sales_rollup.on_order_placed(db, order)
+    store_orders.on_order_placed(db, order)
+
+
+def change_status(db: Session, order: Order, new_status: str, settle_reservations: bool = True) -> str:
+    """
+    Đổi trạng thái đơn + cập nhật bộ đếm / thống kê / hàng đang giữ. Trả về trạng thái cũ.
+    settle_reservations=False khi người gọi đã tự xử lý reservation (job trả hàng quá hạn).
+    """
+    from app.services import inventory
+
+    old_status = order.status
+    if old_status == new_status:
+        return old_status
+
+    if settle_reservations:
+        # Đơn QR còn giữ hàng: hủy -> trả hàng, xác nhận / giao / hoàn tất -> trừ hẳn tồn kho
+        if new_status == OrderStatus.CANCELLED.value:
+            inventory.release_reservations(db, order.id)
+        else:
+            inventory.consume_reservations(db, order.id)
+
+    order.status = new_status
+    store_ids = store_ids_of(db, order.id)
+    _bump(db, store_ids, old_status, -1)
+    _bump(db, store_ids, new_status, 1)
+    store_stats.on_order_status_changed(db, order, old_status, store_ids)
+    ledger.on_order_status_changed(db, order, old_status)
+    sales_rollup.on_order_status_changed(db, order, old_status)
+    store_orders.on_status_changed(db, order)
+    return old_status
+
+
+def counts_for_store(db: Session, store_id: int) -> Dict[str, int]:
+    """{trạng thái: số đơn} của 1 store - đọc theo khóa chính, không quét bảng orders."""
+    rows = db.query(StoreOrderCounter.status, StoreOrderCounter.count).filter(
+        StoreOrderCounter.store_id == store_id
+    )
+    return {status: int(count or 0) for status, count in rows}
+
+
+def reconcile_all(db: Session) -> int:
+    """Tính lại toàn bộ bộ đếm từ orders trong 1 transaction."""
+    source = (
+        select(OrderItem.store_id, Order.status, func.count(func.distinct(Order.id)))
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(OrderItem.store_id.isnot(None), Order.status.isnot(None))
+        .group_by(OrderItem.store_id, Order.status)
+    )
+    db.execute(delete(StoreOrderCounter))
+    res = db.execute(insert(StoreOrderCounter).from_select(["store_id", "status", "count"], source))
+    db.commit()
+    return res.rowcount or 0
+
+
+if __name__ == "__main__":
+    from app.services.cli import open_session
+
+    db = open_session()
+    try:
+        n = reconcile_all(db)
+        print(f"✅ Đã đối soát {n} bộ đếm đơn hàng theo store")
+    finally:
+        db.close()
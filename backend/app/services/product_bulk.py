@@ -0,0 +1,105 @@
+# app/services/product_bulk.py
+"""
+Cập nhật giá / giá thị trường / tồn kho cho hàng nghìn sản phẩm của 1 gian hàng
+trong 1 câu `UPDATE products ... FROM (VALUES ...)` (giá dầu / điện mặt trời
+đổi hằng ngày, tồn kho đồng bộ từ kho).
+
+- Dòng theo sku được đổi sang id bằng 1 câu SELECT trong phạm vi store.
+- Câu UPDATE luôn kèm `store_id = :store` nên không thể chạm sản phẩm store khác.
+- Không cho đặt tồn kho thấp hơn số đang giữ cho đơn QR (`reserved_stock`).
+"""
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import update, values, column, func, or_, cast, null, Integer, Numeric
+from sqlalchemy.orm import Session
+
+from app.models.product import Product
+from app.schemas.product import ProductBulkUpdateItem
+
+
+PRICE = Numeric(12, 2)
+
+
+def _typed(value: Any, type_) -> Any:
+    # NULL trần trong VALUES bị Postgres coi là text -> ép kiểu để coalesce với cột numeric / integer
+    return cast(null(), type_) if value is None else value
+
+
+def _resolve(db: Session, store_id: int, items: List[ProductBulkUpdateItem]) -> Tuple[Dict[int, dict], List[dict]]:
+    """{product_id: thay đổi} (trùng sản phẩm thì gộp, giá trị dòng sau thắng) + danh sách lỗi theo vị trí dòng."""
+    errors: List[dict] = []
+    skus = {it.sku.strip() for it in items if it.id is None and it.sku and it.sku.strip()}
+    sku_to_id = dict(
+        db.query(Product.sku, Product.id)
+        .filter(Product.store_id == store_id, Product.sku.in_(skus))
+        .all()
+    ) if skus else {}
+
+    changes: Dict[int, dict] = {}
+    for i, it in enumerate(items):
+        if it.price is None and it.market_price is None and it.stock is None:
+            errors.append({"index": i, "id": it.id, "sku": it.sku, "error": "Không có giá trị nào để cập nhật"})
+            continue
+        pid = it.id if it.id is not None else sku_to_id.get((it.sku or "").strip())
+        if pid is None:
+            errors.append({"index": i, "id": it.id, "sku": it.sku, "error": "Không tìm thấy sản phẩm"})
+            continue
+        change = changes.setdefault(pid, {"price": None, "market_price": None, "stock": None})
+        change.update({"index": i, "sku": it.sku})
+        change.update({k: getattr(it, k) for k in ("price", "market_price", "stock") if getattr(it, k) is not None})
+    return changes, errors
+
+
+def apply_updates(db: Session, store_id: int, items: List[ProductBulkUpdateItem]) -> Dict[str, Any]:
+    """Chưa commit. Trả về {"updated": [id...], "errors": [...]}."""
+    changes, errors = _resolve(db, store_id, items)
+    if not changes:
+        return {"updated": [], "errors": errors}
+
+    v = values(
+        column("id", Integer),
+        column("price", PRICE),
+        column("market_price", PRICE),
+        column("stock", Integer),
+        name="v",
+    ).data([
+        (pid, _typed(c["price"], PRICE), _typed(c["market_price"], PRICE), _typed(c["stock"], Integer()))
+        for pid, c in sorted(changes.items())
+    ])
+
+    stmt = (
+        update(Product)
+        .where(
+            Product.id == v.c.id,
+            Product.store_id == store_id,
+            or_(v.c.stock.is_(None), v.c.stock >= func.coalesce(Product.reserved_stock, 0)),
+        )
+        .values(
+            price=func.coalesce(v.c.price, Product.price),
+            market_price=func.coalesce(v.c.market_price, Product.market_price),
+            stock=func.coalesce(v.c.stock, Product.stock),
+            updated_at=func.now(),
+        )
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+    updated = {row[0] for row in db.execute(stmt)}
+
+    missing = [pid for pid in changes if pid not in updated]
+    if missing:
+        # Phân biệt "không thuộc store" với "tồn kho < số đang giữ" cho báo cáo lỗi
+        reserved = dict(
+            db.query(Product.id, Product.reserved_stock)
+            .filter(Product.id.in_(missing), Product.store_id == store_id)
+            .all()
+        )
+        for pid in missing:
+            c = changes[pid]
+            if pid in reserved:
+                error = f"Tồn kho không được thấp hơn số đang giữ cho đơn chờ thanh toán ({reserved[pid] or 0})"
+            else:
+                error = "Không tìm thấy sản phẩm"
+            errors.append({"index": c["index"], "id": pid, "sku": c["sku"], "error": error})
+
+    errors.sort(key=lambda e: e["index"])
+    return {"updated": sorted(updated), "errors": errors}
@@ -0,0 +1,132 @@
+# app/services/product_facets.py
+"""
+Đếm facet (danh mục, thương hiệu, xuất xứ, khoảng giá) cho thanh lọc sản phẩm.
+
+Toàn bộ facet được tính bằng MỘT câu GROUP BY GROUPING SETS thay vì mỗi giá trị
+một câu COUNT. Mỗi facet đếm theo mọi bộ lọc KHÁC nó (kiểu "disjunctive"), để
+khi đã chọn 1 danh mục thì sidebar vẫn hiện số lượng của các danh mục còn lại.
+
+Kết quả được cache (namespace `product_facets`, xem app/services/catalog_cache.py)
+theo bộ lọc đã chuẩn hóa; seller thêm / sửa / xóa sản phẩm thì namespace bị xóa.
+"""
+from typing import Any, Dict, Hashable, List, Optional
+
+from sqlalchemy import select, func, case, and_, true, literal_column, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.product import Product, PRICE_SORT_KEY
+from app.models.store import Store
+from app.core import cache
+from app.services.catalog_cache import PRODUCT_FACETS
+
+# (key, nhãn, giá từ, giá đến) - đơn vị VNĐ, đến = None nghĩa là không giới hạn
+PRICE_BUCKETS = [
+    ("duoi-1-trieu", "Dưới 1 triệu", 0, 1_000_000),
+    ("1-5-trieu", "1 - 5 triệu", 1_000_000, 5_000_000),
+    ("5-20-trieu", "5 - 20 triệu", 5_000_000, 20_000_000),
+    ("20-100-trieu", "20 - 100 triệu", 20_000_000, 100_000_000),
+    ("tren-100-trieu", "Trên 100 triệu", 100_000_000, None),
+]
+
+FACET_DIMENSIONS = ("category", "brand", "origin", "price")
+
+CACHE_TTL_SECONDS = 300
+
+
+def _price_bucket_expr():
+    # Hằng số render thẳng vào SQL để biểu thức không phụ thuộc bind param
+    whens = [
+        (PRICE_SORT_KEY < literal_column(str(upper)), key)
+        for key, _, _, upper in PRICE_BUCKETS
+        if upper is not None
+    ]
+    return case(*whens, else_=PRICE_BUCKETS[-1][0])
+
+
+def compute_facets(
+    db: Session,
+    base_conditions: List[Any],
+    facet_conditions: Dict[str, Optional[Any]],
+    cache_key: Optional[Hashable] = None,
+) -> Dict[str, Any]:
+    """
+    base_conditions: điều kiện áp dụng cho mọi facet (đang bán, từ khóa tìm kiếm...)
+    facet_conditions: {"category" | "brand" | "origin" | "price": điều kiện hoặc None}
+    """
+    if cache_key is not None:
+        return cache.get_or_set(
+            PRODUCT_FACETS, cache_key,
+            lambda: _compute(db, base_conditions, facet_conditions),
+            ttl=CACHE_TTL_SECONDS,
+        )
+    return _compute(db, base_conditions, facet_conditions)
+
+
+def _compute(db: Session, base_conditions: List[Any], facet_conditions: Dict[str, Optional[Any]]) -> Dict[str, Any]:
+    conds = {dim: (facet_conditions.get(dim) if facet_conditions.get(dim) is not None else true())
+             for dim in FACET_DIMENSIONS}
+
+    # 1. Subquery: mỗi sản phẩm kèm bucket giá + cờ "khớp bộ lọc" của từng facet
+    base = (
+        select(
+            Product.category.label("category"),
+            Product.brand.label("brand"),
+            Product.origin.label("origin"),
+            _price_bucket_expr().label("price_bucket"),
+            *[conds[dim].label(f"m_{dim}") for dim in FACET_DIMENSIONS],
+        )
+        .join(Store, Product.store_id == Store.id)
+        .where(*base_conditions)
+        .subquery()
+    )
+
+    def count_except(dim: Optional[str]):
+        # Đếm theo mọi bộ lọc trừ chính facet `dim` (dim=None -> áp tất cả)
+        flags = [base.c[f"m_{d}"] for d in FACET_DIMENSIONS if d != dim]
+        return func.count().filter(and_(*flags))
+
+    group_cols = {
+        "category": base.c.category,
+        "brand": base.c.brand,
+        "origin": base.c.origin,
+        "price": base.c.price_bucket,
+    }
+
+    # 2. Một câu GROUPING SETS cho cả 4 facet + tổng
+    stmt = select(
+        *group_cols.values(),
+        *[func.grouping(col).label(f"g_{dim}") for dim, col in group_cols.items()],
+        *[count_except(dim).label(f"c_{dim}") for dim in FACET_DIMENSIONS],
+        count_except(None).label("c_total"),
+    ).group_by(
+        func.grouping_sets(*[tuple_(col) for col in group_cols.values()], tuple_())
+    )
+
+    facets: Dict[str, Dict[Any, int]] = {dim: {} for dim in FACET_DIMENSIONS}
+    total = 0
+    for row in db.execute(stmt).mappings():
+        grouped = [dim for dim in FACET_DIMENSIONS if row[f"g_{dim}"] == 0]
+        if not grouped:
+            total = int(row["c_total"] or 0)
+            continue
+        dim = grouped[0]
+        value = row["price_bucket"] if dim == "price" else row[dim]
+        count = int(row[f"c_{dim}"] or 0)
+        if value in (None, "") or count == 0:
+            continue
+        facets[dim][value] = count
+
+    def ordered(counts: Dict[Any, int]):
+        return [{"value": v, "count": c} for v, c in sorted(counts.items(), key=lambda x: (-x[1], str(x[0])))]
+
+    result = {
+        "total": total,
+        "categories": ordered(facets["category"]),
+        "brands": ordered(facets["brand"]),
+        "origins": ordered(facets["origin"]),
+        "price_ranges": [
+            {"key": key, "label": label, "min": low, "max": high, "count": facets["price"].get(key, 0)}
+            for key, label, low, high in PRICE_BUCKETS
+        ],
+    }
+    return result
@@ -0,0 +1,144 @@
+# app/services/product_images.py
+"""
+Ảnh hiển thị (thumbnail) của sản phẩm được tính sẵn vào `Product.display_image_url`:
+ưu tiên `image_url` seller nhập, không có thì lấy ảnh đầu tiên của gallery.
+Trang danh sách chỉ đọc cột này, không phải JOIN bảng product_images nữa.
+
+Sửa gallery theo kiểu diff (`apply_gallery`): chỉ xóa ảnh bị bỏ, chèn ảnh mới và
+đổi display_order của ảnh giữ lại bằng 1 câu UPDATE ... FROM (VALUES ...);
+ảnh không đổi vị trí không bị chạm tới.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, update, delete, insert, values, column, literal_column, Integer
+from sqlalchemy.orm import Session
+
+from app.models.product import Product, ProductImage
+
+# Backfill 1 lần cho dữ liệu cũ (chỉ chạm các dòng còn NULL mà có ảnh để điền)
+DISPLAY_IMAGE_DDL: List[str] = [
+    """
+    UPDATE products p
+    SET display_image_url = COALESCE(
+        NULLIF(p.image_url, ''),
+        (SELECT pi.image_url FROM product_images pi
+         WHERE pi.product_id = p.id
+         ORDER BY pi.display_order, pi.id LIMIT 1)
+    )
+    WHERE p.display_image_url IS NULL
+      AND (NULLIF(p.image_url, '') IS NOT NULL
+           OR EXISTS (SELECT 1 FROM product_images pi WHERE pi.product_id = p.id))
+    """,
+]
+
+
+def sync_display_image(db: Session, product: Product, gallery: Optional[List[str]] = None) -> None:
+    """
+    Cập nhật `product.display_image_url` (chưa commit).
+    `gallery`: danh sách URL gallery mới nếu vừa thay đổi; None thì đọc ảnh đầu tiên từ DB.
+    """
+    if product.image_url:
+        product.display_image_url = product.image_url
+        return
+
+    if gallery is not None:
+        product.display_image_url = gallery[0] if gallery else None
+        return
+
+    product.display_image_url = (
+        db.query(ProductImage.image_url)
+        .filter(ProductImage.product_id == product.id)
+        .order_by(ProductImage.display_order, ProductImage.id)
+        .limit(1)
+        .scalar()
+    )
+
+
+def sync_display_images(db: Session, product_ids: Iterable[int]) -> None:
+    """Tính lại display_image_url cho nhiều sản phẩm bằng 1 câu UPDATE (chưa commit)."""
+    ids = sorted(set(product_ids))
+    if not ids:
+        return
+    first_image = (
+        select(ProductImage.image_url)
+        .where(ProductImage.product_id == Product.id)
+        .order_by(ProductImage.display_order, ProductImage.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(Product)
+        .where(Product.id.in_(ids))
+        .values(display_image_url=func.coalesce(func.nullif(Product.image_url, literal_column("''")), first_image))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _set_orders(db: Session, orders: Dict[int, int]) -> None:
+    """{image_id: display_order} -> 1 câu UPDATE ... FROM (VALUES ...)."""
+    if not orders:
+        return
+    v = values(column("id", Integer), column("ord", Integer), name="v").data(sorted(orders.items()))
+    db.execute(
+        update(ProductImage)
+        .where(ProductImage.id == v.c.id)
+        .values(display_order=v.c.ord)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def apply_gallery(db: Session, product_id: int, urls: List[str]) -> Dict[str, int]:
+    """
+    Đưa gallery về đúng danh sách `urls` (theo thứ tự) bằng diff với ảnh hiện có. Chưa commit.
+    Trả về số ảnh đã {"added", "removed", "reordered"}.
+    """
+    existing: List[Tuple[int, str, Optional[int]]] = (
+        db.query(ProductImage.id, ProductImage.image_url, ProductImage.display_order)
+        .filter(ProductImage.product_id == product_id)
+        .order_by(ProductImage.display_order, ProductImage.id)
+        .all()
+    )
+
+    # URL lặp lại được ghép lần lượt với từng dòng cũ cùng URL
+    unused: Dict[str, List[Tuple[int, Optional[int]]]] = {}
+    for image_id, url, order in existing:
+        unused.setdefault(url, []).append((image_id, order))
+
+    to_insert: List[dict] = []
+    new_orders: Dict[int, int] = {}
+    for index, url in enumerate(urls):
+        matches = unused.get(url)
+        if matches:
+            image_id, order = matches.pop(0)
+            if order != index:
+                new_orders[image_id] = index
+        else:
+            to_insert.append({"product_id": product_id, "image_url": url, "display_order": index})
+
+    to_delete = [image_id for rows in unused.values() for image_id, _ in rows]
+    if to_delete:
+        db.execute(
+            delete(ProductImage)
+            .where(ProductImage.id.in_(to_delete))
+            .execution_options(synchronize_session=False)
+        )
+    _set_orders(db, new_orders)
+    if to_insert:
+        db.execute(insert(ProductImage), to_insert)
+    return {"added": len(to_insert), "removed": len(to_delete), "reordered": len(new_orders)}
+
+
+def reorder_gallery(db: Session, product_id: int, image_ids: List[int]) -> bool:
+    """
+    Sắp xếp lại gallery theo `image_ids` (phải đúng bằng tập ảnh hiện có). Chưa commit.
+    Trả về False nếu danh sách không khớp.
+    """
+    current = dict(
+        db.query(ProductImage.id, ProductImage.display_order)
+        .filter(ProductImage.product_id == product_id)
+        .all()
+    )
+    if len(image_ids) != len(current) or set(image_ids) != set(current):
+        return False
+    _set_orders(db, {image_id: i for i, image_id in enumerate(image_ids) if current[image_id] != i})
+    return True
@@ -0,0 +1,280 @@
+# app/services/product_import.py
+"""
+Import hàng loạt sản phẩm của 1 gian hàng từ file CSV / XLSX (chạy nền, xem app/services/jobs.py).
+
+- Đọc file từng dòng (csv.DictReader / openpyxl read_only), không nạp cả file vào RAM.
+- Mỗi dòng được kiểm tra bằng đúng schema `ProductCreate` của API tạo sản phẩm;
+  dòng lỗi được ghi vào báo cáo (số dòng, SKU, lỗi) và bỏ qua, không làm hỏng cả file.
+- Ghi theo lô `BATCH_SIZE` dòng: 1 câu INSERT ... ON CONFLICT (store_id, sku) DO UPDATE
+  cho sản phẩm + 1 câu xóa / 1 câu chèn ảnh gallery + 1 câu tính lại ảnh hiển thị,
+  commit từng lô. Chỉ các cột CÓ trong file mới bị ghi đè khi SKU đã tồn tại.
+
+Cột nhận được (dòng tiêu đề, không phân biệt hoa thường):
+    sku*, name*, price*, market_price, stock, description, category, brand, origin,
+    warranty, unit, image_url, tags, images, specifications, is_active
+tags / images: nhiều giá trị cách nhau bởi "|" hoặc ";". specifications: chuỗi JSON.
+
+File .xlsx cần thư viện tùy chọn `openpyxl`.
+"""
+import csv
+import json
+import os
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import and_, func, delete, insert as sa_insert, literal_column, null
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.product import Product, ProductImage
+from app.models.store import Store
+from app.schemas.product import ProductCreate
+from app.services import jobs, catalog_cache, store_stats, suggest_index
+from app.services.product_images import sync_display_images
+
+BATCH_SIZE = 500
+ALLOWED_EXTENSIONS = (".csv", ".xlsx")
+
+# Partial unique index cho upsert theo SKU. Để ở DDL (không khai báo trong model) vì DB cũ
+# có thể đang có SKU trùng: tạo index lỗi chỉ bỏ qua câu này chứ không chặn khởi động.
+PRODUCT_IMPORT_DDL: List[str] = [
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_products_store_sku
+    ON products (store_id, sku) WHERE sku IS NOT NULL AND sku <> ''
+    """,
+]
+SKU_INDEX_WHERE = and_(Product.sku.isnot(None), Product.sku != literal_column("''"))
+
+FIELDS = (
+    "sku", "name", "price", "market_price", "stock", "description", "category", "brand",
+    "origin", "warranty", "unit", "image_url", "tags", "images", "specifications", "is_active",
+)
+# Cột của bảng products (mọi field trừ gallery)
+PRODUCT_COLUMNS = tuple(f for f in FIELDS if f != "images")
+# Cột JSON: None được bind thành JSON 'null' (không phải SQL NULL) -> coalesce không giữ được giá trị cũ
+JSON_COLUMNS = ("tags", "specifications")
+
+_TRUE = {"1", "true", "yes", "y", "x", "co", "có", "active"}
+_FALSE = {"0", "false", "no", "n", "khong", "không", "inactive"}
+
+
+# --- ĐỌC FILE ---
+def _iter_csv(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        for i, row in enumerate(csv.DictReader(f, dialect=dialect), start=2):
+            yield i, row
+
+
+def _iter_xlsx(path: str, job: Optional[jobs.Job] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    if not jobs.xlsx_supported():
+        raise ValueError("Máy chủ chưa cài openpyxl nên chưa đọc được file .xlsx, vui lòng dùng .csv")
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        if job is not None and ws.max_row:
+            jobs.progress(job, 0, max(ws.max_row - 1, 0))
+        rows = ws.iter_rows(values_only=True)
+        header = [str(c) if c is not None else "" for c in next(rows, [])]
+        for i, values in enumerate(rows, start=2):
+            if values is None or all(v is None for v in values):
+                continue
+            yield i, dict(zip(header, values))
+    finally:
+        wb.close()
+
+
+def iter_rows(path: str, filename: str, job: Optional[jobs.Job] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(số dòng trong file, {tên cột: giá trị})."""
+    if filename.lower().endswith(".xlsx"):
+        return _iter_xlsx(path, job)
+    return _iter_csv(path)
+
+
+# --- KIỂM TRA TỪNG DÒNG ---
+def _split_list(value: Any) -> List[str]:
+    return [x.strip() for x in re.split(r"[|;]", str(value)) if x.strip()]
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"is_active không hợp lệ: {value}")
+
+
+def parse_row(raw: Dict[str, Any]) -> Tuple[ProductCreate, set]:
+    """Dòng thô -> (ProductCreate, tập cột có giá trị). Lỗi -> ValueError / ValidationError."""
+    data: Dict[str, Any] = {}
+    for key, value in raw.items():
+        key = (key or "").strip().lower()
+        if key not in FIELDS or value is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if not value:
+                continue
+        if key in ("tags", "images"):
+            value = _split_list(value)
+        elif key == "specifications" and isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise ValueError("specifications phải là chuỗi JSON")
+        elif key == "is_active":
+            value = _parse_bool(value)
+        elif key == "sku":
+            value = str(value).strip()
+        data[key] = value
+
+    if not data.get("sku"):
+        raise ValueError("Thiếu SKU")
+    product = ProductCreate(**data)
+    if product.price < 0 or (product.market_price is not None and product.market_price < 0):
+        raise ValueError("Giá không được âm")
+    if product.stock < 0:
+        raise ValueError("Tồn kho không được âm")
+    return product, set(data)
+
+
+def _error_text(e: Exception) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(f"{'.'.join(str(x) for x in err['loc'])}: {err['msg']}" for err in e.errors())
+    return str(e)
+
+
+# --- GHI THEO LÔ ---
+def upsert_batch(db: Session, store: Store, batch: List[Tuple[ProductCreate, set]]) -> Dict[str, Any]:
+    """
+    Upsert 1 lô sản phẩm theo (store_id, sku). Chưa commit.
+    SKU đã có: ô trống / cột không có trong file giữ nguyên giá trị cũ.
+    Trả về {"created", "updated", "product_ids"}.
+    """
+    # SKU lặp trong cùng lô: dòng sau thắng (1 câu ON CONFLICT không được chạm 1 dòng 2 lần)
+    by_sku: Dict[str, Tuple[ProductCreate, set]] = {}
+    for product, present in batch:
+        by_sku[product.sku] = (product, present)
+    if not by_sku:
+        return {"created": 0, "updated": 0, "product_ids": []}
+
+    before = dict(
+        db.query(Product.sku, Product.is_active)
+        .filter(Product.store_id == store.id, Product.sku.in_(list(by_sku)))
+        .all()
+    )
+
+    rows = []
+    active_delta = 0
+    for sku, (product, present) in by_sku.items():
+        exists = sku in before
+        row = {c: (getattr(product, c) if c in present else None) for c in PRODUCT_COLUMNS}
+        if not exists:
+            # Sản phẩm mới: cột không nhập lấy mặc định của ProductCreate
+            row["stock"] = product.stock
+            row["is_active"] = product.is_active
+        for c in JSON_COLUMNS:
+            if row[c] is None:
+                row[c] = null()
+        rows.append({"store_id": store.id, **row})
+
+        was_active = bool(before.get(sku)) if exists else False
+        is_active = product.is_active if "is_active" in present else (was_active if exists else product.is_active)
+        active_delta += int(is_active) - int(was_active)
+
+    t = Product.__table__
+    stmt = insert(Product).values(rows)
+    set_ = {c: func.coalesce(stmt.excluded[c], t.c[c]) for c in PRODUCT_COLUMNS if c != "sku"}
+    set_["updated_at"] = func.now()
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[t.c.store_id, t.c.sku],
+        index_where=SKU_INDEX_WHERE,
+        set_=set_,
+    ).returning(t.c.id, t.c.sku)
+    ids = {sku: pid for pid, sku in db.execute(stmt)}
+
+    # Gallery: dòng có cột images thì thay toàn bộ gallery của sản phẩm đó
+    gallery = {ids[sku]: product.images for sku, (product, present) in by_sku.items() if "images" in present}
+    if gallery:
+        db.execute(delete(ProductImage).where(ProductImage.product_id.in_(list(gallery))))
+        images = [
+            {"product_id": pid, "image_url": url, "display_order": i}
+            for pid, urls in gallery.items()
+            for i, url in enumerate(urls or [])
+        ]
+        if images:
+            db.execute(sa_insert(ProductImage), images)
+    sync_display_images(db, list(ids.values()))
+    store_stats.on_active_count_delta(db, store.id, active_delta)
+
+    created = sum(1 for sku in ids if sku not in before)
+    return {"created": created, "updated": len(ids) - created, "product_ids": list(ids.values())}
+
+
+def _flush(db: Session, store: Store, job: jobs.Job, batch: List[Tuple[int, ProductCreate, set]],
+           totals: Dict[str, int]) -> None:
+    if not batch:
+        return
+    try:
+        res = upsert_batch(db, store, [(p, present) for _, p, present in batch])
+        db.commit()
+    except Exception as e:
+        # Lỗi cả lô (vd. vi phạm ràng buộc): báo lỗi cho từng dòng của lô, lô sau vẫn chạy tiếp
+        db.rollback()
+        for row_no, product, _ in batch:
+            jobs.add_error(job, row=row_no, sku=product.sku, error=f"Không lưu được: {e.__class__.__name__}")
+        print(f"⚠️ Import lô lỗi (store {store.id}): {e}")
+        return
+
+    totals["created"] += res["created"]
+    totals["updated"] += res["updated"]
+    catalog_cache.invalidate_products(res["product_ids"], store.id)
+    for product in db.query(Product).filter(Product.id.in_(res["product_ids"])).all():
+        suggest_index.upsert_product(product, store)
+
+
+def run_import(job: jobs.Job, store_id: int, path: str, filename: str) -> Dict[str, Any]:
+    """Hàm chạy nền của job import (tự mở session riêng, xóa file tạm khi xong)."""
+    from app.services.cli import open_session
+
+    db = open_session()
+    totals = {"created": 0, "updated": 0}
+    processed = 0
+    try:
+        store = db.get(Store, store_id)
+        if store is None:
+            raise ValueError("Không tìm thấy cửa hàng")
+
+        batch: List[Tuple[int, ProductCreate, set]] = []
+        for row_no, raw in iter_rows(path, filename, job):
+            processed += 1
+            try:
+                product, present = parse_row(raw)
+                batch.append((row_no, product, present))
+            except (ValueError, ValidationError) as e:
+                jobs.add_error(job, row=row_no, sku=str(raw.get("sku") or "").strip() or None, error=_error_text(e))
+
+            if len(batch) >= BATCH_SIZE:
+                _flush(db, store, job, batch, totals)
+                batch = []
+                jobs.progress(job, processed)
+        _flush(db, store, job, batch, totals)
+        jobs.progress(job, processed, processed)
+        return {**totals, "rows": processed, "failed": job.error_count}
+    finally:
+        db.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,94 @@
+# app/services/product_search.py
+"""
+Tìm kiếm sản phẩm bằng Postgres full-text + trigram.
+
+- `products.search_vector` (tsvector) do trigger trong DB tự duy trì từ name,
+  brand, category, tags, description, specifications (có trọng số A > B > C > D).
+- Bỏ dấu tiếng Việt bằng extension `unaccent` (bọc trong hàm IMMUTABLE
+  `f_unaccent` để dùng được trong index), nên "pin mat troi" khớp "Pin mặt trời".
+- Gõ sai chính tả được bù bằng `pg_trgm` (toán tử word similarity `<%`) trên tên.
+Cả hai nhánh đều có GIN index nên không còn sequential scan như ILIKE '%...%'.
+"""
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, literal, or_, cast, Float
+
+from app.models.product import Product
+
+# Tối đa số từ khóa đưa vào tsquery (chặn query quá dài)
+MAX_TERMS = 8
+
+SEARCH_DDL: List[str] = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent() chỉ là STABLE -> bọc lại thành IMMUTABLE để dùng trong index
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+    $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION products_search_vector_update() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector :=
+               setweight(to_tsvector('simple', f_unaccent(lower(coalesce(NEW.name, '')))), 'A')
+            || setweight(to_tsvector('simple', f_unaccent(lower(coalesce(NEW.brand, '') || ' ' || coalesce(NEW.category, '')))), 'B')
+            || setweight(to_tsvector('simple', f_unaccent(lower(coalesce(NEW.tags::text, '')))), 'B')
+            || setweight(to_tsvector('simple', f_unaccent(lower(coalesce(NEW.description, '')))), 'C')
+            || setweight(to_tsvector('simple', f_unaccent(lower(coalesce(NEW.specifications::text, '')))), 'D');
+        RETURN NEW;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_products_search_vector ON products",
+    """
+    CREATE TRIGGER trg_products_search_vector
+    BEFORE INSERT OR UPDATE OF name, brand, category, tags, description, specifications
+    ON products FOR EACH ROW EXECUTE FUNCTION products_search_vector_update()
+    """,
+    # Backfill các dòng cũ (UPDATE OF name kích hoạt trigger)
+    "UPDATE products SET name = name WHERE search_vector IS NULL",
+    """
+    CREATE INDEX IF NOT EXISTS ix_products_name_trgm
+    ON products USING gin (f_unaccent(lower(name)) gin_trgm_ops)
+    """,
+]
+
+
+def _fold(expr):
+    return func.f_unaccent(func.lower(expr))
+
+
+def search_terms(raw: str) -> List[str]:
+    # \w với str unicode giữ nguyên chữ có dấu; dấu câu / ký tự tsquery (&|!:*) bị loại
+    return re.findall(r"[^\W_]+", (raw or "").lower())[:MAX_TERMS]
+
+
+def build_search(raw: Optional[str]) -> Optional[Tuple[object, object]]:
+    """
+    Trả về (điều kiện WHERE, biểu thức điểm liên quan) cho chuỗi tìm kiếm,
+    hoặc None nếu chuỗi không có từ khóa hợp lệ.
+    """
+    terms = search_terms(raw)
+    if not terms:
+        return None
+
+    # "pin mat" -> "pin:* & mat:*" : khớp tiền tố để gõ dở vẫn ra kết quả
+    tsquery = func.to_tsquery("simple", _fold(literal(" & ".join(f"{t}:*" for t in terms))))
+    folded_q = _fold(literal(" ".join(terms)))
+    folded_name = _fold(Product.name)
+
+    condition = or_(
+        Product.search_vector.op("@@")(tsquery),
+        folded_q.op("<%")(folded_name),  # chịu lỗi chính tả trên tên sản phẩm
+    )
+    # ts_rank_cd chuẩn hóa về [0, 1) (flag 32) + độ giống theo từ của tên.
+    # Tổng là real (float4): ép sang double precision để giá trị ghi vào cursor (float Python)
+    # so sánh lại đúng bằng giá trị đã sắp xếp, không bỏ sót / lặp dòng bằng điểm ở mép trang.
+    rank = cast(
+        func.ts_rank_cd(Product.search_vector, tsquery, 32) + func.word_similarity(folded_q, folded_name),
+        Float(53),
+    )
+    return condition, rank
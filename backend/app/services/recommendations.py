@@ -0,0 +1,152 @@
+# app/services/recommendations.py
+"""
+"Thường được mua cùng" tính offline từ bảng order_items.
+
+1. Lấy các cặp (order_id, product_id) riêng biệt của đơn không bị hủy.
+2. Sinh mọi cặp sản phẩm cùng đơn bằng phép dịch mảng NumPy (không vòng lặp
+   theo đơn), gom đếm bằng `np.unique` -> ma trận đồng xuất hiện dạng thưa.
+3. Chấm điểm cosine: co(a, b) / sqrt(n(a) * n(b)) để sản phẩm bán chạy
+   không lấn át mọi gợi ý, giữ top-K mỗi sản phẩm.
+4. Thay toàn bộ bảng product_recommendations trong 1 transaction.
+
+Chạy định kỳ bằng scheduler (xem app/main.py) hoặc thủ công:
+    python -m app.services.recommendations
+"""
+from typing import Tuple
+
+import numpy as np
+from sqlalchemy import select, delete, insert
+from sqlalchemy.orm import Session
+
+from app.models.order import Order, OrderItem, OrderStatus
+from app.models.recommendation import ProductRecommendation
+
+TOP_K = 12
+# Đơn quá nhiều món (mua sỉ) sinh O(n²) cặp mà ít ý nghĩa -> chỉ lấy N món đầu
+MAX_ITEMS_PER_ORDER = 50
+# Số đơn chung tối thiểu để giữ 1 cặp (tăng lên khi dữ liệu nhiều để lọc nhiễu)
+MIN_CO_COUNT = 1
+REFRESH_HOURS = 6
+
+
+def _load_baskets(db: Session) -> Tuple[np.ndarray, np.ndarray]:
+    stmt = (
+        select(OrderItem.order_id, OrderItem.product_id)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.status != OrderStatus.CANCELLED.value, OrderItem.product_id.isnot(None))
+        .distinct()
+    )
+    rows = db.execute(stmt).all()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    data = np.asarray(rows, dtype=np.int64)
+    return data[:, 0], data[:, 1]
+
+
+def co_occurrence(orders: np.ndarray, products: np.ndarray, max_items: int = MAX_ITEMS_PER_ORDER):
+    """
+    Trả về (product_ids, a, b, counts, basket_count):
+      - a, b: chỉ số (trong product_ids) của các cặp có hướng cùng nằm trong ít nhất 1 đơn
+      - counts: số đơn chứa cả a và b
+      - basket_count: số đơn chứa từng sản phẩm
+    """
+    # Bỏ dòng trùng (order, product): 1 sản phẩm không tự ghép cặp với chính nó
+    if len(orders):
+        pairs = np.unique(np.stack([orders, products], axis=1), axis=0)
+        orders, products = pairs[:, 0], pairs[:, 1]
+
+    # Đánh số lại product -> 0..P-1 để mã hóa cặp thành 1 số int64
+    product_ids, product_idx = np.unique(products, return_inverse=True)
+    n_products = len(product_ids)
+
+    order_sorted = np.argsort(orders, kind="stable")
+    orders = orders[order_sorted]
+    product_idx = product_idx[order_sorted]
+
+    # Vị trí của mỗi dòng trong đơn của nó -> cắt đơn quá dài
+    starts = np.r_[0, np.flatnonzero(np.diff(orders)) + 1]
+    sizes = np.diff(np.r_[starts, len(orders)])
+    position = np.arange(len(orders)) - np.repeat(starts, sizes)
+    keep = position < max_items
+    orders, product_idx = orders[keep], product_idx[keep]
+
+    basket_count = np.bincount(product_idx, minlength=n_products)
+
+    # Dịch mảng k bước: dòng i và i+k cùng đơn <=> 1 cặp. Lặp theo k (<= max_items), không theo đơn.
+    pair_codes = []
+    longest = int(min(sizes.max(initial=0), max_items))
+    for k in range(1, longest):
+        same = orders[:-k] == orders[k:]
+        if not same.any():
+            break
+        a = product_idx[:-k][same]
+        b = product_idx[k:][same]
+        pair_codes.append(a * n_products + b)
+        pair_codes.append(b * n_products + a)
+
+    if not pair_codes:
+        empty = np.empty(0, dtype=np.int64)
+        return product_ids, empty, empty, empty, basket_count
+
+    codes, counts = np.unique(np.concatenate(pair_codes), return_counts=True)
+    return product_ids, codes // n_products, codes % n_products, counts, basket_count
+
+
+def top_k(a: np.ndarray, b: np.ndarray, counts: np.ndarray, basket_count: np.ndarray, k: int = TOP_K):
+    """Chấm điểm cosine rồi giữ k cặp điểm cao nhất cho mỗi `a`. Trả về (a, b, counts, score, rank)."""
+    mask = counts >= MIN_CO_COUNT
+    a, b, counts = a[mask], b[mask], counts[mask]
+    score = counts / np.sqrt(basket_count[a].astype(np.float64) * basket_count[b])
+
+    # Sắp theo a tăng, điểm giảm, số đơn chung giảm, b tăng (thứ tự ổn định)
+    order = np.lexsort((b, -counts, -score, a))
+    a, b, counts, score = a[order], b[order], counts[order], score[order]
+
+    starts = np.r_[0, np.flatnonzero(np.diff(a)) + 1] if len(a) else np.empty(0, dtype=np.int64)
+    sizes = np.diff(np.r_[starts, len(a)])
+    rank = np.arange(len(a)) - np.repeat(starts, sizes)
+    keep = rank < k
+    return a[keep], b[keep], counts[keep], score[keep], rank[keep]
+
+
+def rebuild(db: Session, k: int = TOP_K) -> int:
+    orders, products = _load_baskets(db)
+    product_ids, a, b, counts, basket_count = co_occurrence(orders, products)
+    a, b, counts, score, rank = top_k(a, b, counts, basket_count, k)
+
+    rows = [
+        {
+            "product_id": int(pid),
+            "rank": int(r),
+            "related_product_id": int(rid),
+            "co_count": int(c),
+            "score": float(s),
+        }
+        for pid, rid, c, s, r in zip(product_ids[a], product_ids[b], counts, score, rank)
+    ]
+
+    # Thay toàn bộ trong 1 transaction: API không bao giờ thấy bảng rỗng giữa chừng
+    db.execute(delete(ProductRecommendation))
+    if rows:
+        db.execute(insert(ProductRecommendation), rows)
+    db.commit()
+    return len(rows)
+
+
+def refresh() -> None:
+    """Job định kỳ: tự mở session riêng (chạy ngoài request)."""
+    from app.services.cli import open_session
+
+    db = open_session()
+    try:
+        n = rebuild(db)
+        print(f"🧮 Recommendations: {n} cặp gợi ý")
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Recommendations lỗi: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    refresh()
@@ -0,0 +1,108 @@
+# app/services/review_stats.py
+"""
+Duy trì `Product.rating_average` / `Product.review_count` theo kiểu cộng dồn.
+
+Mỗi lần thêm / sửa / xóa review chỉ cập nhật đúng 1 dòng products trong cùng
+transaction với review, nên trang danh sách sản phẩm đọc thẳng 2 cột này thay
+vì GROUP BY toàn bộ bảng reviews.
+
+Đối soát lại toàn bộ (khi mới triển khai hoặc nghi dữ liệu lệch):
+    python -m app.services.review_stats
+"""
+from sqlalchemy import update, func, case, select
+from sqlalchemy.orm import Session
+
+from app.models.product import Product
+from app.models.review import Review
+from app.services import store_stats
+
+
+def apply_review_delta(db: Session, product_id: int, count_delta: int, rating_sum_delta: float) -> None:
+    """
+    Cộng dồn thay đổi vào aggregate của 1 sản phẩm (chưa commit).
+
+    Postgres tính mọi biểu thức SET trên giá trị CŨ của dòng, và UPDATE giữ
+    row lock tới hết transaction, nên 2 review đồng thời không ghi đè nhau.
+    """
+    old_count = func.coalesce(Product.review_count, 0)
+    old_avg = func.coalesce(Product.rating_average, 0.0)
+    new_count = old_count + count_delta
+
+    db.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(
+            review_count=func.greatest(new_count, 0),
+            rating_average=case(
+                (new_count > 0, (old_avg * old_count + rating_sum_delta) / new_count),
+                else_=0.0,
+            ),
+            # Review thay đổi không tính là sản phẩm bị sửa
+            updated_at=Product.updated_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    # Rating của gian hàng cộng dồn cùng lúc
+    store_stats.on_review_delta(db, product_id, count_delta, int(rating_sum_delta))
+
+
+def on_review_created(db: Session, review: Review) -> None:
+    apply_review_delta(db, review.product_id, 1, review.rating)
+
+
+def on_review_rating_changed(db: Session, review: Review, old_rating: int) -> None:
+    if review.rating != old_rating:
+        apply_review_delta(db, review.product_id, 0, review.rating - old_rating)
+
+
+def on_review_deleted(db: Session, review: Review) -> None:
+    apply_review_delta(db, review.product_id, -1, -review.rating)
+
+
+def reconcile_all(db: Session) -> int:
+    """
+    Tính lại aggregate cho toàn bộ sản phẩm bằng 1 câu UPDATE ... FROM.
+    Trả về số sản phẩm đã được ghi.
+    """
+    stats = (
+        select(
+            Review.product_id.label("product_id"),
+            func.count(Review.id).label("cnt"),
+            func.avg(Review.rating).label("avg"),
+        )
+        .group_by(Review.product_id)
+        .subquery()
+    )
+
+    # 1. Sản phẩm có review
+    res = db.execute(
+        update(Product)
+        .where(Product.id == stats.c.product_id)
+        .values(review_count=stats.c.cnt, rating_average=stats.c.avg)
+        .execution_options(synchronize_session=False)
+    )
+    touched = res.rowcount or 0
+
+    # 2. Sản phẩm không còn review nào -> đưa về 0
+    res = db.execute(
+        update(Product)
+        .where(~Product.id.in_(select(Review.product_id)))
+        .where((Product.review_count != 0) | (Product.review_count.is_(None)))
+        .values(review_count=0, rating_average=0.0)
+        .execution_options(synchronize_session=False)
+    )
+    touched += res.rowcount or 0
+
+    db.commit()
+    return touched
+
+
+if __name__ == "__main__":
+    from app.services.cli import open_session
+
+    db = open_session()
+    try:
+        n = reconcile_all(db)
+        print(f"✅ Đã đối soát rating cho {n} sản phẩm")
+    finally:
+        db.close()
@@ -0,0 +1,172 @@
+# app/services/sales_rollup.py
+"""
+Bảng tổng hợp `store_daily_sales` cho biểu đồ doanh thu của seller.
+
+Mỗi đơn được cộng vào ngày đặt đơn (giờ Việt Nam) của từng store có hàng
+trong đơn: 1 dòng cho mỗi sản phẩm + 1 dòng tổng (product_id = 0). Đơn bị
+hủy thì trừ ra, mở lại thì cộng vào (giống store_stats.order_count).
+Cộng / trừ là 1 câu INSERT ... SELECT ... GROUP BY GROUPING SETS ... ON CONFLICT
+chạy cùng transaction với thao tác đặt / đổi trạng thái đơn.
+
+API biểu đồ chỉ đọc tối đa 365 dòng theo khóa chính, không chạm order_items.
+
+Dựng lại toàn bộ từ orders (khi mới triển khai hoặc nghi dữ liệu lệch):
+    python -m app.services.sales_rollup
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import select, delete, func, cast, tuple_, literal_column, Date
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.order import Order, OrderItem, OrderStatus
+from app.models.sales import StoreDailySales
+
+TIMEZONE = "Asia/Ho_Chi_Minh"
+VN_TZ = timezone(timedelta(hours=7))  # Việt Nam không đổi giờ mùa hè
+STORE_TOTAL = 0
+MAX_DAYS = 365
+
+# Dựng lần đầu cho DB cũ (chỉ chạy khi bảng còn trống)
+SALES_ROLLUP_DDL: List[str] = [
+    f"""
+    INSERT INTO store_daily_sales (store_id, day, product_id, revenue, units, order_count)
+    SELECT oi.store_id, (o.created_at AT TIME ZONE '{TIMEZONE}')::date,
+           coalesce(oi.product_id, {STORE_TOTAL}),
+           sum(oi.price * oi.quantity), sum(oi.quantity), count(DISTINCT o.id)
+    FROM orders o JOIN order_items oi ON oi.order_id = o.id
+    WHERE o.status <> 'CANCELLED' AND o.created_at IS NOT NULL
+      AND oi.store_id IS NOT NULL AND oi.product_id IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM store_daily_sales)
+    GROUP BY GROUPING SETS (
+        (oi.store_id, (o.created_at AT TIME ZONE '{TIMEZONE}')::date, oi.product_id),
+        (oi.store_id, (o.created_at AT TIME ZONE '{TIMEZONE}')::date)
+    )
+    """,
+]
+
+
+def _rollup_select(sign: int = 1):
+    """SELECT (store_id, day, product_id, revenue, units, order_count) gộp theo sản phẩm + tổng store."""
+    # Hằng số viết thẳng vào SQL (không bind param) để biểu thức ngày ở SELECT và GROUP BY trùng khớp
+    day = cast(func.timezone(literal_column(f"'{TIMEZONE}'"), Order.created_at), Date)
+    sign = literal_column(str(int(sign)))
+    return (
+        select(
+            OrderItem.store_id,
+            day,
+            func.coalesce(OrderItem.product_id, literal_column(str(STORE_TOTAL))),
+            sign * func.sum(OrderItem.price * OrderItem.quantity),
+            sign * func.sum(OrderItem.quantity),
+            sign * func.count(func.distinct(Order.id)),
+        )
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(
+            Order.created_at.isnot(None),
+            OrderItem.store_id.isnot(None),
+            OrderItem.product_id.isnot(None),
+        )
+        .group_by(func.grouping_sets(
+            tuple_(OrderItem.store_id, day, OrderItem.product_id),
+            tuple_(OrderItem.store_id, day),
+        ))
+    )
+
+
+_COLUMNS = ["store_id", "day", "product_id", "revenue", "units", "order_count"]
+
+
+def apply_order(db: Session, order_id: int, sign: int) -> None:
+    """Cộng (sign=1) hoặc trừ (sign=-1) toàn bộ đơn vào bảng tổng hợp. Chưa commit."""
+    db.flush()  # order_items vừa add phải có trong DB trước câu INSERT ... SELECT
+    stmt = insert(StoreDailySales).from_select(
+        _COLUMNS, _rollup_select(sign).where(Order.id == order_id)
+    )
+    t = StoreDailySales.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[t.c.store_id, t.c.day, t.c.product_id],
+        set_={
+            "revenue": t.c.revenue + stmt.excluded.revenue,
+            "units": t.c.units + stmt.excluded.units,
+            "order_count": t.c.order_count + stmt.excluded.order_count,
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt)
+
+
+def on_order_placed(db: Session, order: Order) -> None:
+    if order.status != OrderStatus.CANCELLED.value:
+        apply_order(db, order.id, 1)
+
+
+def on_order_status_changed(db: Session, order: Order, old_status: str) -> None:
+    cancelled = OrderStatus.CANCELLED.value
+    if (old_status == cancelled) == (order.status == cancelled):
+        return
+    apply_order(db, order.id, -1 if order.status == cancelled else 1)
+
+
+# --- ĐỌC ---
+def today() -> date:
+    return datetime.now(VN_TZ).date()
+
+
+def series(db: Session, store_id: int, days: int, product_id: int = STORE_TOTAL) -> Dict[str, Any]:
+    """Chuỗi `days` ngày gần nhất (tính cả hôm nay), ngày không có đơn điền 0."""
+    days = max(1, min(days, MAX_DAYS))
+    end = today()
+    start = end - timedelta(days=days - 1)
+
+    rows = (
+        db.query(StoreDailySales.day, StoreDailySales.revenue, StoreDailySales.units, StoreDailySales.order_count)
+        .filter(
+            StoreDailySales.store_id == store_id,
+            StoreDailySales.product_id == product_id,
+            StoreDailySales.day >= start,
+            StoreDailySales.day <= end,
+        )
+        .all()
+    )
+    by_day = {d: (float(revenue or 0), int(units or 0), int(orders or 0)) for d, revenue, units, orders in rows}
+
+    points = []
+    totals = {"revenue": 0.0, "units": 0, "orders": 0}
+    for i in range(days):
+        d = start + timedelta(days=i)
+        revenue, units, orders = by_day.get(d, (0.0, 0, 0))
+        points.append({"date": d.isoformat(), "revenue": revenue, "units": units, "orders": orders})
+        totals["revenue"] += revenue
+        totals["units"] += units
+        totals["orders"] += orders
+
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "days": days,
+        "product_id": product_id or None,
+        "points": points,
+        "totals": totals,
+    }
+
+
+# --- DỰNG LẠI TOÀN BỘ ---
+def rebuild(db: Session) -> int:
+    """Xóa và tính lại toàn bộ bảng trong 1 transaction."""
+    source = _rollup_select().where(Order.status != OrderStatus.CANCELLED.value)
+    db.execute(delete(StoreDailySales))
+    res = db.execute(insert(StoreDailySales).from_select(_COLUMNS, source))
+    db.commit()
+    return res.rowcount or 0
+
+
+if __name__ == "__main__":
+    from app.services.cli import open_session
+
+    db = open_session()
+    try:
+        n = rebuild(db)
+        print(f"✅ Đã dựng lại {n} dòng doanh thu theo ngày")
+    finally:
+        db.close()
@@ -0,0 +1,129 @@
+# app/services/store_orders.py
+"""
+Duy trì bảng `store_orders`: mỗi đơn có 1 dòng cho từng store có hàng trong đơn
+(trạng thái, ngày đặt, tiền hàng của store, chuỗi tìm kiếm khách hàng).
+
+- Ghi lúc đặt đơn và cập nhật trạng thái cùng transaction (qua app/services/order_status.py).
+- Tìm kiếm: `search_text` đã bỏ dấu + chữ thường, có GIN trigram index nên
+  ILIKE '%...%' không còn quét toàn bảng.
+- Trang đơn của seller = 1 câu trên index (store_id, [status,] created_at, order_id).
+"""
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.order import Order, OrderItem, StoreOrder
+from app.services.suggest_index import fold
+
+# Chạy sau SEARCH_DDL (cần pg_trgm + f_unaccent)
+STORE_ORDERS_DDL: List[str] = [
+    """
+    CREATE INDEX IF NOT EXISTS ix_store_orders_search_trgm
+    ON store_orders USING gin (search_text gin_trgm_ops)
+    """,
+    # Dựng lần đầu cho DB cũ (chỉ chạy khi bảng còn trống)
+    """
+    INSERT INTO store_orders (store_id, order_id, status, created_at, subtotal, item_count, search_text)
+    SELECT oi.store_id, o.id, coalesce(o.status, 'PENDING'), coalesce(o.created_at, now()),
+           sum(oi.price * oi.quantity), count(*),
+           trim(regexp_replace(
+               f_unaccent(lower(concat_ws(' ', o.id::text, u.full_name, u.phone_number, o.shipping_address))),
+               '[^[:alnum:]]+', ' ', 'g'))
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    LEFT JOIN users u ON u.id = o.user_id
+    WHERE oi.store_id IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM store_orders)
+    GROUP BY oi.store_id, o.id, u.full_name, u.phone_number
+    """,
+]
+
+
+def search_text(order: Order, customer_name: Optional[str], customer_phone: Optional[str]) -> str:
+    return fold(" ".join(str(x) for x in (order.id, customer_name, customer_phone, order.shipping_address) if x))
+
+
+def on_order_placed(db: Session, order: Order) -> None:
+    """Ghi 1 dòng cho mỗi store trong đơn (sau khi order_items đã được add). Chưa commit."""
+    db.flush()
+    rows = (
+        db.query(OrderItem.store_id, func.sum(OrderItem.price * OrderItem.quantity), func.count(OrderItem.id))
+        .filter(OrderItem.order_id == order.id, OrderItem.store_id.isnot(None))
+        .group_by(OrderItem.store_id)
+        .all()
+    )
+    if not rows:
+        return
+
+    user = order.user
+    text = search_text(order, getattr(user, "full_name", None), getattr(user, "phone_number", None))
+    created_at = order.created_at or func.now()
+    stmt = insert(StoreOrder).values([
+        {
+            "store_id": sid, "order_id": order.id, "status": order.status,
+            "created_at": created_at, "subtotal": subtotal or 0, "item_count": count,
+            "search_text": text,
+        }
+        for sid, subtotal, count in sorted(rows)
+    ])
+    db.execute(stmt.on_conflict_do_nothing(index_elements=[StoreOrder.store_id, StoreOrder.order_id]))
+
+
+def on_status_changed(db: Session, order: Order) -> None:
+    db.execute(
+        update(StoreOrder)
+        .where(StoreOrder.order_id == order.id)
+        .values(status=order.status)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def keyword_filter(keyword: Optional[str]):
+    """
+    Điều kiện tìm kiếm cho trang đơn seller, None nếu không có từ khóa.
+    "#123" -> đúng mã đơn; còn lại -> mã đơn trần hoặc chứa chuỗi (tên / SĐT / địa chỉ).
+    """
+    term = (keyword or "").strip()
+    if not term:
+        return None
+    if term.startswith("#"):
+        clean_id = term.lstrip("#").strip()
+        return StoreOrder.order_id == int(clean_id) if clean_id.isdigit() else None
+
+    folded = fold(term)  # chỉ còn chữ / số / khoảng trắng -> không lọt ký tự % _ vào ILIKE
+    conds = []
+    if term.isdigit() and len(term) < 10:
+        conds.append(StoreOrder.order_id == int(term))
+    if folded:
+        conds.append(StoreOrder.search_text.ilike(f"%{folded}%"))
+    return or_(*conds) if conds else None
+
+
+def load_store_items(db: Session, store_id: int, order_ids: List[int]) -> Dict[int, List[dict]]:
+    """Item của riêng store trong nhiều đơn, 1 câu JOIN."""
+    from app.models.product import Product
+
+    if not order_ids:
+        return {}
+    rows = (
+        db.query(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity, OrderItem.price, Product.name)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .filter(OrderItem.order_id.in_(order_ids), OrderItem.store_id == store_id)
+        .order_by(OrderItem.order_id, OrderItem.id)
+        .all()
+    )
+    items: Dict[int, List[dict]] = defaultdict(list)
+    for order_id, product_id, quantity, price, name in rows:
+        price = Decimal(str(price or "0"))
+        items[order_id].append({
+            "product_id": product_id,
+            "product_name": name or f"Sản phẩm #{product_id}",
+            "quantity": quantity,
+            "price": price,
+            "line_total": price * (quantity or 0),
+        })
+    return items
@@ -0,0 +1,203 @@
+# app/services/store_stats.py
+"""
+Duy trì bảng `store_stats` (rating, số review, số sản phẩm đang bán, số đơn) của từng gian hàng.
+
+Mỗi thay đổi là 1 câu INSERT ... ON CONFLICT DO UPDATE cộng dồn delta, chạy
+trong cùng transaction với thao tác gốc (review / sản phẩm / đơn hàng), nên
+GET /api/stores chỉ cần 1 câu JOIN thay vì 2 câu aggregate cho mỗi store.
+
+Đối soát lại toàn bộ (khi mới triển khai hoặc nghi dữ liệu lệch):
+    python -m app.services.store_stats
+"""
+from typing import Iterable, List, Optional
+
+from sqlalchemy import select, func, case, cast, literal_column, Float
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.store import Store, StoreStats
+from app.models.product import Product
+from app.models.review import Review
+from app.models.order import Order, OrderItem, OrderStatus
+
+# Tạo dòng cho các store chưa có stats (DB cũ trước khi có bảng này)
+STORE_STATS_DDL: List[str] = [
+    """
+    INSERT INTO store_stats (store_id, review_count, rating_sum, rating_average, active_product_count, order_count)
+    SELECT s.id,
+           coalesce(r.cnt, 0), coalesce(r.total, 0),
+           CASE WHEN coalesce(r.cnt, 0) > 0 THEN r.total::float / r.cnt ELSE 0 END,
+           coalesce(p.cnt, 0), coalesce(o.cnt, 0)
+    FROM stores s
+    LEFT JOIN (
+        SELECT pr.store_id, count(*) AS cnt, sum(rv.rating) AS total
+        FROM reviews rv JOIN products pr ON pr.id = rv.product_id
+        GROUP BY pr.store_id
+    ) r ON r.store_id = s.id
+    LEFT JOIN (
+        SELECT store_id, count(*) AS cnt FROM products WHERE is_active GROUP BY store_id
+    ) p ON p.store_id = s.id
+    LEFT JOIN (
+        SELECT oi.store_id, count(DISTINCT oi.order_id) AS cnt
+        FROM order_items oi JOIN orders o ON o.id = oi.order_id
+        WHERE o.status <> 'CANCELLED'
+        GROUP BY oi.store_id
+    ) o ON o.store_id = s.id
+    WHERE NOT EXISTS (SELECT 1 FROM store_stats ss WHERE ss.store_id = s.id)
+    """,
+]
+
+
+def _apply(db: Session, store_id: int, review_count: int = 0, rating_sum: int = 0,
+           active_product_count: int = 0, order_count: int = 0) -> None:
+    """Cộng delta vào stats của 1 store (tạo dòng nếu chưa có). Chưa commit."""
+    if store_id is None:
+        return
+
+    t = StoreStats.__table__
+    new_count = t.c.review_count + review_count
+    new_sum = t.c.rating_sum + rating_sum
+
+    stmt = insert(StoreStats).values(
+        store_id=store_id,
+        review_count=max(review_count, 0),
+        rating_sum=max(rating_sum, 0),
+        rating_average=(rating_sum / review_count) if review_count > 0 else 0.0,
+        active_product_count=max(active_product_count, 0),
+        order_count=max(order_count, 0),
+    )
+    # Vế phải của SET đọc giá trị CŨ của dòng -> 2 request đồng thời không ghi đè nhau
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[t.c.store_id],
+        set_={
+            "review_count": func.greatest(new_count, 0),
+            "rating_sum": func.greatest(new_sum, 0),
+            "rating_average": case(
+                (new_count > 0, cast(new_sum, Float) / cast(new_count, Float)),
+                else_=literal_column("0"),
+            ),
+            "active_product_count": func.greatest(t.c.active_product_count + active_product_count, 0),
+            "order_count": func.greatest(t.c.order_count + order_count, 0),
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt)
+
+
+# --- REVIEW ---
+def on_review_delta(db: Session, product_id: int, count_delta: int, rating_sum_delta: int) -> None:
+    store_id = db.query(Product.store_id).filter(Product.id == product_id).scalar()
+    _apply(db, store_id, review_count=count_delta, rating_sum=rating_sum_delta)
+
+
+# --- SẢN PHẨM ---
+def on_product_active_changed(db: Session, store_id: int, was_active: bool, is_active: bool) -> None:
+    """Gọi khi tạo (was_active=False), sửa, hoặc xóa (is_active=False) sản phẩm."""
+    delta = int(bool(is_active)) - int(bool(was_active))
+    if delta:
+        _apply(db, store_id, active_product_count=delta)
+
+
+def on_active_count_delta(db: Session, store_id: int, delta: int) -> None:
+    """Nhiều sản phẩm đổi trạng thái bán cùng lúc (import / cập nhật hàng loạt)."""
+    if delta:
+        _apply(db, store_id, active_product_count=delta)
+
+
+# --- ĐƠN HÀNG ---
+def on_order_placed(db: Session, store_ids: Iterable[int]) -> None:
+    for sid in set(store_ids):
+        _apply(db, sid, order_count=1)
+
+
+def on_order_status_changed(db: Session, order: Order, old_status: str,
+                            store_ids: Optional[List[int]] = None) -> None:
+    """Đơn bị hủy thì không còn tính vào order_count (và ngược lại nếu mở lại)."""
+    cancelled = OrderStatus.CANCELLED.value
+    if (old_status == cancelled) == (order.status == cancelled):
+        return
+    delta = -1 if order.status == cancelled else 1
+    if store_ids is None:
+        store_ids = [
+            sid for (sid,) in db.query(OrderItem.store_id)
+            .filter(OrderItem.order_id == order.id, OrderItem.store_id.isnot(None))
+            .distinct()
+        ]
+    for sid in store_ids:
+        _apply(db, sid, order_count=delta)
+
+
+# --- ĐỌC ---
+def rating_of(stats: StoreStats) -> float:
+    return round(float(stats.rating_average), 1) if stats and stats.review_count else 0.0
+
+
+# --- ĐỐI SOÁT ---
+def reconcile_all(db: Session) -> int:
+    """Tính lại stats của mọi store từ dữ liệu gốc bằng 1 câu INSERT ... SELECT ... ON CONFLICT."""
+    reviews = (
+        select(Product.store_id.label("store_id"), func.count(Review.id).label("cnt"),
+               func.sum(Review.rating).label("total"))
+        .join(Product, Product.id == Review.product_id)
+        .group_by(Product.store_id)
+        .subquery()
+    )
+    products = (
+        select(Product.store_id.label("store_id"), func.count().label("cnt"))
+        .where(Product.is_active == True)
+        .group_by(Product.store_id)
+        .subquery()
+    )
+    orders = (
+        select(OrderItem.store_id.label("store_id"), func.count(func.distinct(OrderItem.order_id)).label("cnt"))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.status != OrderStatus.CANCELLED.value)
+        .group_by(OrderItem.store_id)
+        .subquery()
+    )
+
+    review_count = func.coalesce(reviews.c.cnt, 0)
+    rating_sum = func.coalesce(reviews.c.total, 0)
+    source = (
+        select(
+            Store.id,
+            review_count,
+            rating_sum,
+            case((review_count > 0, cast(rating_sum, Float) / cast(review_count, Float)), else_=0.0),
+            func.coalesce(products.c.cnt, 0),
+            func.coalesce(orders.c.cnt, 0),
+        )
+        .outerjoin(reviews, reviews.c.store_id == Store.id)
+        .outerjoin(products, products.c.store_id == Store.id)
+        .outerjoin(orders, orders.c.store_id == Store.id)
+    )
+
+    stmt = insert(StoreStats).from_select(
+        ["store_id", "review_count", "rating_sum", "rating_average", "active_product_count", "order_count"],
+        source,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[StoreStats.store_id],
+        set_={
+            "review_count": stmt.excluded.review_count,
+            "rating_sum": stmt.excluded.rating_sum,
+            "rating_average": stmt.excluded.rating_average,
+            "active_product_count": stmt.excluded.active_product_count,
+            "order_count": stmt.excluded.order_count,
+            "updated_at": func.now(),
+        },
+    )
+    res = db.execute(stmt)
+    db.commit()
+    return res.rowcount or 0
+
+
+if __name__ == "__main__":
+    from app.services.cli import open_session
+
+    db = open_session()
+    try:
+        n = reconcile_all(db)
+        print(f"✅ Đã đối soát stats cho {n} gian hàng")
+    finally:
+        db.close()
@@ -0,0 +1,216 @@
+# app/services/suggest_index.py
+"""
+Chỉ mục gợi ý (typeahead) cho ô tìm kiếm: tên sản phẩm, tên gian hàng, tiêu đề tin tức.
+
+Toàn bộ nằm trong RAM của process: mỗi loại 1 mảng đã sắp xếp các cặp
+(khóa, id). Khóa là chuỗi đã bỏ dấu + chữ thường ("Pin mặt trời" ->
+"pin mat troi"), kèm các hậu tố bắt đầu từ mỗi từ ("mat troi", "troi") để gõ
+từ giữa tên vẫn ra. Tra cứu = bisect tới tiền tố rồi quét tiếp các khóa cùng
+tiền tố -> O(log n + k), không chạm Postgres.
+
+- Dựng lại toàn bộ khi khởi động và định kỳ (job `suggest_index_refresh`).
+- Cập nhật từng phần ngay khi seller / admin / crawler ghi dữ liệu.
+"""
+import threading
+import unicodedata
+import re
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+PRODUCT = "product"
+STORE = "store"
+NEWS = "news"
+KINDS = (PRODUCT, STORE, NEWS)
+
+# Chỉ sinh hậu tố cho tối đa N từ đầu của mỗi tên (giới hạn bộ nhớ)
+MAX_WORD_SUFFIXES = 8
+REFRESH_MINUTES = 15
+
+_entries: Dict[str, List[Tuple[str, int]]] = {kind: [] for kind in KINDS}  # loại -> [(khóa, id)] đã sắp xếp
+_docs: Dict[Tuple[str, int], Dict[str, Any]] = {}  # (loại, id) -> payload trả về
+_lock = threading.Lock()
+
+
+def fold(text: Optional[str]) -> str:
+    """Bỏ dấu tiếng Việt, chữ thường, gom ký tự không phải chữ/số thành 1 khoảng trắng."""
+    text = (text or "").lower().replace("đ", "d")
+    text = "".join(ch for ch in unicodedata.normalize("NFD", text) if not unicodedata.combining(ch))
+    return " ".join(re.findall(r"[^\W_]+", text))
+
+
+def _keys_for(label: str) -> List[str]:
+    words = fold(label).split()
+    return [" ".join(words[i:]) for i in range(min(len(words), MAX_WORD_SUFFIXES))]
+
+
+def _doc(kind: str, item_id: int, label: str, **extra: Any) -> Dict[str, Any]:
+    # _key_len: độ dài khóa đầy đủ, để nhận ra khớp "từ đầu tên" khi xếp hạng
+    return {"type": kind, "id": item_id, "label": label, **extra, "_key_len": len(fold(label))}
+
+
+def _remove_locked(kind: str, item_id: int) -> None:
+    doc = _docs.pop((kind, item_id), None)
+    if doc is None:
+        return
+    entries = _entries[kind]
+    for key in _keys_for(doc["label"]):
+        pos = bisect_left(entries, (key, item_id))
+        if pos < len(entries) and entries[pos] == (key, item_id):
+            del entries[pos]
+
+
+# --- GHI ---
+def upsert(kind: str, item_id: int, label: Optional[str], **extra: Any) -> None:
+    if not label:
+        remove(kind, item_id)
+        return
+    with _lock:
+        _remove_locked(kind, item_id)
+        keys = _keys_for(label)
+        _docs[(kind, item_id)] = _doc(kind, item_id, label, **extra)
+        for key in keys:
+            insort(_entries[kind], (key, item_id))
+
+
+def remove(kind: str, item_id: int) -> None:
+    with _lock:
+        _remove_locked(kind, item_id)
+
+
+def upsert_product(product, store=None) -> None:
+    """Sản phẩm chỉ được gợi ý khi đang bán và gian hàng đang hoạt động."""
+    store = store if store is not None else product.store
+    if not product.is_active or store is None or not store.is_active:
+        remove(PRODUCT, product.id)
+        return
+    upsert(
+        PRODUCT, product.id, product.name,
+        slug=product.slug or f"product-{product.id}",
+        image_url=product.display_image_url or product.image_url,
+        store_id=product.store_id,
+    )
+
+
+def upsert_store(db: Session, store) -> None:
+    """Store đổi trạng thái: cập nhật chính nó và toàn bộ sản phẩm của nó."""
+    from app.models.product import Product
+
+    if store.is_active:
+        upsert(STORE, store.id, store.store_name)
+    else:
+        remove(STORE, store.id)
+    for product in db.query(Product).filter(Product.store_id == store.id).all():
+        upsert_product(product, store)
+
+
+def remove_store(store_id: int) -> None:
+    with _lock:
+        _remove_locked(STORE, store_id)
+        for kind, item_id in [k for k, doc in _docs.items() if k[0] == PRODUCT and doc.get("store_id") == store_id]:
+            _remove_locked(kind, item_id)
+
+
+def upsert_news(news) -> None:
+    if not news.is_published:
+        remove(NEWS, news.id)
+        return
+    upsert(NEWS, news.id, news.title, slug=news.slug, image_url=news.image_url)
+
+
+# --- ĐỌC ---
+def suggest(query: str, limit: int = 5, kinds: Tuple[str, ...] = KINDS) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Gợi ý theo tiền tố, nhóm theo loại (tối đa `limit` mỗi loại).
+    Tên bắt đầu bằng đúng chuỗi gõ vào được ưu tiên hơn khớp từ giữa tên; sau đó tên ngắn trước.
+    """
+    q = fold(query)
+    results: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in kinds}
+    if not q:
+        return results
+
+    # Quét dư một chút để còn chỗ xếp hạng lại
+    budget = limit * 4
+    docs: Dict[str, List[Tuple[bool, Dict[str, Any]]]] = {}
+    with _lock:
+        for kind in kinds:
+            entries = _entries[kind]
+            # id -> có khớp ngay từ đầu tên không
+            bucket: Dict[int, bool] = {}
+            pos = bisect_left(entries, (q,))
+            while pos < len(entries) and len(bucket) < budget:
+                key, item_id = entries[pos]
+                pos += 1
+                if not key.startswith(q):
+                    break
+                is_head = len(key) == _docs[(kind, item_id)]["_key_len"]
+                bucket[item_id] = bucket.get(item_id, False) or is_head
+            docs[kind] = [(is_head, _docs[(kind, i)]) for i, is_head in bucket.items()]
+
+    for kind, items in docs.items():
+        items.sort(key=lambda x: (not x[0], len(x[1]["label"]), x[1]["label"]))
+        results[kind] = [{k: v for k, v in doc.items() if k != "_key_len"} for _, doc in items[:limit]]
+    return results
+
+
+def size() -> int:
+    with _lock:
+        return len(_docs)
+
+
+# --- DỰNG LẠI TOÀN BỘ ---
+def rebuild(db: Session) -> int:
+    """Đọc lại toàn bộ từ DB rồi tráo mảng mới vào (request đang đọc không bị chặn lâu)."""
+    from app.models.product import Product
+    from app.models.store import Store
+    from app.models.news import News
+
+    docs: Dict[Tuple[str, int], Dict[str, Any]] = {}
+
+    rows = (
+        db.query(Product.id, Product.name, Product.slug, Product.display_image_url, Product.image_url, Product.store_id)
+        .join(Store, Product.store_id == Store.id)
+        .filter(Product.is_active == True, Store.is_active == True)
+        .all()
+    )
+    for pid, name, slug, display_image, image, store_id in rows:
+        if name:
+            docs[(PRODUCT, pid)] = _doc(
+                PRODUCT, pid, name, slug=slug or f"product-{pid}",
+                image_url=display_image or image, store_id=store_id,
+            )
+
+    for sid, name in db.query(Store.id, Store.store_name).filter(Store.is_active == True).all():
+        if name:
+            docs[(STORE, sid)] = _doc(STORE, sid, name)
+
+    news_rows = db.query(News.id, News.title, News.slug, News.image_url).filter(News.is_published == True).all()
+    for nid, title, slug, image in news_rows:
+        if title:
+            docs[(NEWS, nid)] = _doc(NEWS, nid, title, slug=slug, image_url=image)
+
+    entries: Dict[str, List[Tuple[str, int]]] = {kind: [] for kind in KINDS}
+    for (kind, item_id), doc in docs.items():
+        entries[kind].extend((key, item_id) for key in _keys_for(doc["label"]))
+    for kind_entries in entries.values():
+        kind_entries.sort()
+
+    global _entries, _docs
+    with _lock:
+        _entries, _docs = entries, docs
+    return len(docs)
+
+
+def refresh() -> None:
+    """Job định kỳ: tự mở session riêng (chạy ngoài request)."""
+    from app.services.cli import open_session
+
+    db = open_session()
+    try:
+        count = rebuild(db)
+        print(f"🔤 Suggest index: {count} mục")
+    except Exception as e:
+        print(f"⚠️ Suggest index lỗi: {e}")
+    finally:
+        db.close()
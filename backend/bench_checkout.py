@@ -0,0 +1,108 @@
+"""
+Benchmark khóa tồn kho khi checkout dưới tải tranh chấp.
+
+So sánh 2 cách trên CÙNG một tập sản phẩm có sẵn trong DB:
+  - legacy : khóa từng sản phẩm (SELECT ... FOR UPDATE) theo thứ tự giỏ hàng rồi UPDATE từng dòng
+  - bulk   : app/services/inventory.py (1 câu khóa theo id + 1 câu UPDATE ... FROM VALUES)
+
+Mỗi "checkout" chọn ngẫu nhiên vài sản phẩm theo thứ tự ngẫu nhiên, giữ khóa thêm
+--hold-ms (giả lập phần việc còn lại của create_order) rồi ROLLBACK, nên dữ liệu
+thật không bị thay đổi.
+
+Chạy trong thư mục backend/:
+    python bench_checkout.py --products 1,2,3,4,5 --workers 16 --seconds 10
+"""
+import argparse
+import random
+import sys
+import os
+import threading
+import time
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core.database import SessionLocal
+from app.services.cli import load_models
+from app.services import inventory
+
+
+def legacy_checkout(db, cart):
+    for pid, qty in cart:
+        db.execute(text("SELECT id, stock FROM products WHERE id = :id FOR UPDATE"), {"id": pid})
+    for pid, qty in cart:
+        db.execute(text("UPDATE products SET stock = stock - :q WHERE id = :id"), {"id": pid, "q": qty})
+
+
+def bulk_checkout(db, cart):
+    quantities = dict(cart)
+    inventory.lock_products(db, quantities.keys())
+    inventory.decrement_stock(db, quantities)
+
+
+MODES = {"legacy": legacy_checkout, "bulk": bulk_checkout}
+
+
+def run(mode, product_ids, workers, seconds, cart_size, hold_ms):
+    checkout = MODES[mode]
+    stats = {"ok": 0, "deadlock": 0, "error": 0}
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker(seed):
+        rnd = random.Random(seed)
+        while time.monotonic() < deadline:
+            cart = [(pid, 1) for pid in rnd.sample(product_ids, min(cart_size, len(product_ids)))]
+            db = SessionLocal()
+            started = time.perf_counter()
+            outcome = "ok"
+            try:
+                checkout(db, cart)
+                time.sleep(hold_ms / 1000)
+            except OperationalError as e:
+                outcome = "deadlock" if "deadlock" in str(e).lower() else "error"
+            finally:
+                db.rollback()
+                db.close()
+            with lock:
+                stats[outcome] += 1
+                if outcome == "ok":
+                    latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+    print(
+        f"{mode:7s} | {stats['ok'] / seconds:8.1f} checkout/s | deadlock {stats['deadlock']:4d} | "
+        f"lỗi khác {stats['error']:4d} | p50 {p50:6.1f} ms | p95 {p95:6.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark khóa tồn kho khi checkout")
+    parser.add_argument("--products", required=True, help="Danh sách product id có sẵn, vd: 1,2,3,4,5")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--cart-size", type=int, default=3)
+    parser.add_argument("--hold-ms", type=float, default=5, help="Thời gian giữ khóa sau khi trừ tồn")
+    parser.add_argument("--mode", choices=[*MODES, "all"], default="all")
+    args = parser.parse_args()
+
+    load_models()
+    product_ids = [int(x) for x in args.products.split(",") if x.strip()]
+    modes = list(MODES) if args.mode == "all" else [args.mode]
+    for mode in modes:
+        run(mode, product_ids, args.workers, args.seconds, args.cart_size, args.hold_ms)
+
+
+if __name__ == "__main__":
+    main()
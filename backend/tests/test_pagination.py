@@ -0,0 +1,44 @@
+import base64
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.pagination import decode_cursor, encode_cursor
+
+
+def test_round_trip():
+    payload = {"s": "price-asc", "k": "199000.50", "id": 42}
+    cursor = encode_cursor(payload)
+
+    # url-safe, bỏ padding -> dùng thẳng trong query string
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert decode_cursor(cursor) == payload
+
+
+def test_round_trip_non_json_keys_become_strings():
+    created = datetime(2026, 1, 2, 3, 4, 5)
+    cursor = encode_cursor({"s": "newest", "k": created, "p": Decimal("1.10"), "id": 7})
+    payload = decode_cursor(cursor)
+
+    # Khóa datetime / Decimal được ghi bằng str() và đọc lại được bằng hàm parse của kiểu sắp xếp
+    assert datetime.fromisoformat(payload["k"]) == created
+    assert Decimal(payload["p"]) == Decimal("1.10")
+    assert payload["id"] == 7
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "%%%không-phải-base64%%%",
+        base64.urlsafe_b64encode(b"{not json").decode(),
+        base64.urlsafe_b64encode(b"[1, 2, 3]").decode(),
+        base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+        "",
+    ],
+)
+def test_bad_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
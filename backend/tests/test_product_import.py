@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+import pytest
+from pydantic import ValidationError
+
+from app.services.product_import import parse_row
+
+
+def _row(**overrides):
+    row = {"sku": "PIN-01", "name": "Pin mặt trời 550W", "price": "2500000"}
+    row.update(overrides)
+    return row
+
+
+def test_parses_full_row():
+    product, present = parse_row(_row(**{
+        " Stock ": "12",
+        "tags": "solar | pin; 550W",
+        "specifications": '{"công suất": "550W"}',
+        "is_active": "Có",
+        "cột lạ": "bỏ qua",
+    }))
+
+    assert product.sku == "PIN-01"
+    assert product.price == Decimal("2500000")
+    assert product.stock == 12
+    assert product.tags == ["solar", "pin", "550W"]
+    assert product.specifications == {"công suất": "550W"}
+    assert product.is_active is True
+    # Chỉ các cột có giá trị (tên cột không phân biệt hoa thường / khoảng trắng)
+    assert present == {"sku", "name", "price", "stock", "tags", "specifications", "is_active"}
+
+
+def test_blank_cells_are_not_present():
+    product, present = parse_row(_row(description="   ", tags="", brand=None))
+
+    assert present == {"sku", "name", "price"}
+    assert product.tags is None
+
+
+@pytest.mark.parametrize("raw", [{}, {"sku": ""}, {"sku": "   "}])
+def test_missing_sku(raw):
+    with pytest.raises(ValueError, match="Thiếu SKU"):
+        parse_row({"name": "Pin", "price": "1", **raw})
+
+
+def test_sku_from_number_cell_is_text():
+    product, _ = parse_row(_row(sku=1001))
+    assert product.sku == "1001"
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("1", True), ("yes", True), ("x", True), (True, True), (1, True),
+     ("0", False), ("Không", False), ("inactive", False), (False, False)],
+)
+def test_bool_parsing(value, expected):
+    product, _ = parse_row(_row(is_active=value))
+    assert product.is_active is expected
+
+
+def test_bad_bool():
+    with pytest.raises(ValueError, match="is_active"):
+        parse_row(_row(is_active="maybe"))
+
+
+def test_bad_specifications_json():
+    with pytest.raises(ValueError, match="specifications"):
+        parse_row(_row(specifications="{công suất: 550W"))
+
+
+def test_specifications_must_be_object():
+    with pytest.raises(ValidationError):
+        parse_row(_row(specifications="[1, 2]"))
+
+
+@pytest.mark.parametrize(
+    "overrides, message",
+    [
+        ({"price": "-1"}, "Giá không được âm"),
+        ({"market_price": "-5"}, "Giá không được âm"),
+        ({"stock": "-3"}, "Tồn kho không được âm"),
+    ],
+)
+def test_negative_price_or_stock(overrides, message):
+    with pytest.raises(ValueError, match=message):
+        parse_row(_row(**overrides))
@@ -0,0 +1,68 @@
+import numpy as np
+
+from app.services.recommendations import co_occurrence, top_k
+
+# Đơn 1: 10, 20, 30 | đơn 2: 10, 20 | đơn 3: 20, 40 | đơn 4: 10 (2 dòng), 50
+ORDERS = np.array([1, 1, 1, 2, 2, 3, 3, 4, 4, 4], dtype=np.int64)
+PRODUCTS = np.array([10, 20, 30, 10, 20, 20, 40, 10, 10, 50], dtype=np.int64)
+
+
+def _related(k):
+    product_ids, a, b, counts, basket_count = co_occurrence(ORDERS, PRODUCTS)
+    a, b, counts, score, rank = top_k(a, b, counts, basket_count, k)
+    result = {}
+    for pid, rid, c, s, r in zip(product_ids[a], product_ids[b], counts, score, rank):
+        result.setdefault(int(pid), []).append((int(rid), int(c), round(float(s), 4), int(r)))
+    return result
+
+
+def test_co_occurrence_counts_pairs_without_self_pairs():
+    product_ids, a, b, counts, basket_count = co_occurrence(ORDERS, PRODUCTS)
+
+    assert product_ids.tolist() == [10, 20, 30, 40, 50]
+    # Dòng trùng của sản phẩm 10 trong đơn 4 chỉ tính 1 lần
+    assert basket_count.tolist() == [3, 3, 1, 1, 1]
+    assert not np.any(a == b)
+
+    pairs = {(int(product_ids[x]), int(product_ids[y])): int(c) for x, y, c in zip(a, b, counts)}
+    assert pairs == {
+        (10, 20): 2, (20, 10): 2,
+        (10, 30): 1, (30, 10): 1,
+        (20, 30): 1, (30, 20): 1,
+        (20, 40): 1, (40, 20): 1,
+        (10, 50): 1, (50, 10): 1,
+    }
+
+
+def test_co_occurrence_caps_long_orders():
+    orders = np.array([1, 1, 1], dtype=np.int64)
+    products = np.array([1, 2, 3], dtype=np.int64)
+    _, a, b, counts, basket_count = co_occurrence(orders, products, max_items=2)
+
+    assert sorted(zip(a.tolist(), b.tolist())) == [(0, 1), (1, 0)]
+    assert basket_count.tolist() == [1, 1, 0]
+
+
+def test_co_occurrence_empty():
+    empty = np.empty(0, dtype=np.int64)
+    product_ids, a, b, counts, basket_count = co_occurrence(empty, empty)
+
+    assert len(product_ids) == len(a) == len(b) == len(counts) == len(basket_count) == 0
+
+
+def test_top_k_orders_by_score_then_count_then_id():
+    related = _related(k=2)
+
+    # 20 có điểm cao nhất (2 / sqrt(3 * 3)); 30 và 50 hòa điểm + số đơn chung -> id nhỏ trước
+    assert related[10] == [(20, 2, 0.6667, 0), (30, 1, 0.5774, 1)]
+    assert related[20] == [(10, 2, 0.6667, 0), (30, 1, 0.5774, 1)]
+    assert related[30] == [(10, 1, 0.5774, 0), (20, 1, 0.5774, 1)]
+
+
+def test_top_k_larger_than_neighbours_keeps_all():
+    related = _related(k=10)
+
+    assert [rid for rid, *_ in related[10]] == [20, 30, 50]
+    assert [r for *_, r in related[10]] == [0, 1, 2]
+    assert related[40] == [(20, 1, 0.5774, 0)]
+    assert related[50] == [(10, 1, 0.5774, 0)]